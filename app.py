@@ -1,15 +1,18 @@
 import streamlit as st
 import os
-import tempfile
+import hashlib
 from pathlib import Path
 import base64
 import plotly.express as px
-import pandas as pd
 from lyricsRAG import inference
+from lyricsRAG.persistentIndex import DEFAULT_PERSIST_DIRECTORY
+from lyricsRAG.engineRegistry import EngineRegistry, engine_key
+from lyricsRAG.ingestionJob import IngestionJob, new_progress
+from lyricsRAG.corpusAnalytics import corpus_summary
+from lyricsRAG.themeAnalytics import theme_prevalence, artist_themes
 import time
 from datetime import datetime
 import uuid
-import numpy as np
 
 # Page configuration
 st.set_page_config(
@@ -479,15 +482,30 @@ def show_loading_animation():
     </div>
     """, unsafe_allow_html=True)
 
+def stream_chat_response(message, placeholder):
+    """Stream the assistant's answer into a placeholder and return the full text"""
+    response = ""
+    for token in st.session_state.lyrics_rag.stream_chat(message):
+        response += token
+        placeholder.markdown(f"""
+        <div class="assistant-message">
+            <strong>Lyrics Assistant:</strong><br>
+            {response}
+        </div>
+        <div style="clear: both;"></div>
+        """, unsafe_allow_html=True)
+    st.session_state.chat_stats = st.session_state.lyrics_rag.last_stream_stats
+    return response
+
 def render_stats_dashboard(songs_df):
-    """Render the stats dashboard"""
+    """Render the stats dashboard from the engine's per-song metrics"""
     st.markdown('<div class="sub-header">Dashboard Overview</div>', unsafe_allow_html=True)
     
     # Calculate stats
-    total_songs = len(songs_df)
-    total_artists = len(songs_df['artist'].unique())
-    sample_lines = [20, 25, 18, 30, 22, 28, 24, 19, 32, 26][:min(10, len(songs_df))]
-    avg_lines = round(sum(sample_lines) / len(sample_lines))
+    summary = corpus_summary(songs_df)
+    total_songs = summary["songs"]
+    total_artists = summary["artists"]
+    avg_lines = round(summary["avg_lines"])
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -531,6 +549,10 @@ if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 if 'generated_lyrics' not in st.session_state:
     st.session_state.generated_lyrics = None
+if 'generation_stats' not in st.session_state:
+    st.session_state.generation_stats = {}
+if 'chat_stats' not in st.session_state:
+    st.session_state.chat_stats = {}
 if 'search_results' not in st.session_state:
     st.session_state.search_results = None
 if 'songs_list' not in st.session_state:
@@ -539,6 +561,10 @@ if 'api_key_status' not in st.session_state:
     st.session_state.api_key_status = False
 if 'pdf_uploaded' not in st.session_state:
     st.session_state.pdf_uploaded = False
+if 'ingestion_job' not in st.session_state:
+    st.session_state.ingestion_job = None
+if 'ingestion_message' not in st.session_state:
+    st.session_state.ingestion_message = None
 if 'user_id' not in st.session_state:
     st.session_state.user_id = str(uuid.uuid4())[:8]
 if 'session_started' not in st.session_state:
@@ -555,58 +581,73 @@ def secure_api_key(api_key):
         return True
     return False
 
-def load_pdf_and_initialize(pdf_file):
-    """Load PDF and initialize LyricsRAG"""
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_file.write(pdf_file.getvalue())
-        tmp_file_path = tmp_file.name
-    
-    try:
-        # Get OpenAI API key from environment
-        api_key = os.environ.get('OPENAI_API_KEY', '')
-        if not api_key:
-            os.unlink(tmp_file_path)
-            return False, "API key not configured. Please enter your OpenAI API key in the settings."
-        
-        # Initialize LyricsRAG with progress tracking
-        progress_placeholder = st.empty()
-        progress_placeholder.markdown("""
-        <div class="progress-container">
-            <div class="progress-bar" style="width: 0%;"></div>
-        </div>
-        <p class="info-msg">Initializing LyricsRAG...</p>
-        """, unsafe_allow_html=True)
-        
-        # Progress updates
-        for i in range(5):
-            progress_placeholder.markdown(f"""
-            <div class="progress-container">
-                <div class="progress-bar" style="width: {i*20}%;"></div>
-            </div>
-            <p class="info-msg">{"Processing PDF text..." if i < 2 else "Creating embeddings..." if i < 4 else "Finalizing setup..."}</p>
-            """, unsafe_allow_html=True)
-            time.sleep(0.5)
-        
-        # Actually initialize LyricsRAG
-        st.session_state.lyrics_rag = inference.LyricsRAG(tmp_file_path, openai_api_key=api_key)
-        
-        # Final progress update
-        progress_placeholder.markdown(f"""
-        <div class="progress-container">
-            <div class="progress-bar" style="width: 100%;"></div>
-        </div>
-        <p class="success-msg">Ready! Processing complete.</p>
-        """, unsafe_allow_html=True)
-        
+@st.cache_resource
+def get_engine_registry():
+    """Engines shared by every session of this server process"""
+    return EngineRegistry(max_idle=2)
+
+def start_pdf_ingestion(pdf_file):
+    """Start building LyricsRAG for the PDF on a background thread"""
+    # Get OpenAI API key from environment
+    api_key = os.environ.get('OPENAI_API_KEY', '')
+    if not api_key:
+        return False, "API key not configured. Please enter your OpenAI API key in the settings."
+    
+    # Parsed straight from the upload's bytes, no temporary file to write, re-read and clean up
+    pdf_bytes = pdf_file.getvalue()
+    
+    # Sessions uploading the same PDF share one engine, each with its own chat memory
+    settings = {
+        "persist_directory": DEFAULT_PERSIST_DIRECTORY,
+        "response_cache": True,
+        "chat_memory": "summary"
+    }
+    key = engine_key(hashlib.sha256(pdf_bytes).hexdigest(), **settings)
+    registry = get_engine_registry()
+    
+    def build(progress_callback):
+        return registry.session(
+            key,
+            lambda: inference.LyricsRAG(
+                pdf_bytes, openai_api_key=api_key, progress_callback=progress_callback,
+                pdf_name=pdf_file.name, **settings
+            ),
+            # Another session is building this PDF; its progress events go to that session
+            on_wait=lambda: progress_callback(dict(new_progress(), stage="waiting_for_shared_build"))
+        )
+    
+    st.session_state.ingestion_job = IngestionJob(build).start()
+    return True, "Processing started"
+
+def finish_pdf_ingestion():
+    """Install the engine of a finished ingestion job in this session"""
+    job = st.session_state.ingestion_job
+    if job is None or not job.done:
+        return
+    
+    st.session_state.ingestion_job = None
+    if job.status == "done":
+        st.session_state.lyrics_rag = job.result
         st.session_state.songs_list = st.session_state.lyrics_rag.list_songs()
         st.session_state.pdf_uploaded = True
-        
-        # Clean up and return success
-        os.unlink(tmp_file_path)
-        return True, "PDF processed successfully!"
-    except Exception as e:
-        os.unlink(tmp_file_path)
-        return False, f"Error: {str(e)}"
+        st.session_state.ingestion_message = (True, f"PDF processed successfully in {job.snapshot()['elapsed_s']:.1f}s!")
+    else:
+        st.session_state.ingestion_message = (False, f"Error: {job.error}")
+
+def render_ingestion_progress(job):
+    """Progress bar and counters of a running ingestion job"""
+    progress = job.snapshot()
+    stage = progress["stage"].replace("_", " ").capitalize()
+    st.progress(progress["fraction"], text=f"{stage}... ({progress['elapsed_s']:.0f}s)")
+    
+    pages = f"{progress['pages_parsed']}/{progress['pages_total']}" if progress["pages_total"] else "-"
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Pages parsed", pages)
+    col2.metric("Chunks created", progress["chunks_created"])
+    col3.metric("Chunks embedded", progress["chunks_embedded"])
+    col4.metric("Vectors indexed", progress["vectors_indexed"])
+
+finish_pdf_ingestion()
 
 # ===== Sidebar Navigation =====
 
@@ -702,19 +743,31 @@ if page == "📤 Upload Lyrics":
             uploaded_pdf = st.file_uploader("", type="pdf", label_visibility="collapsed")
         
         with upload_col2:
-            upload_button = st.button("Process PDF", disabled=not st.session_state.api_key_status)
+            upload_button = st.button(
+                "Process PDF",
+                disabled=not st.session_state.api_key_status or st.session_state.ingestion_job is not None
+            )
         
-        # Process PDF if uploaded and button clicked
+        # Process PDF if uploaded and button clicked; ingestion runs in the background
         if uploaded_pdf is not None and upload_button:
             if not st.session_state.api_key_status:
                 show_error_message("Please configure your API key first")
             else:
-                with st.spinner():
-                    success, message = load_pdf_and_initialize(uploaded_pdf)
-                    if success:
-                        show_success_message(message)
-                    else:
-                        show_error_message(message)
+                success, message = start_pdf_ingestion(uploaded_pdf)
+                if not success:
+                    show_error_message(message)
+        
+        if st.session_state.ingestion_message:
+            success, message = st.session_state.ingestion_message
+            st.session_state.ingestion_message = None
+            if success:
+                show_success_message(message, duration=0)
+            else:
+                show_error_message(message, duration=0)
+        
+        # Poll the running job; the rest of the app stays usable meanwhile
+        if st.session_state.ingestion_job is not None:
+            render_ingestion_progress(st.session_state.ingestion_job)
         
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -738,10 +791,14 @@ Lyrics line 3
     
     # If PDF is uploaded, show quick stats
     if st.session_state.pdf_uploaded and st.session_state.songs_list:
-        songs_df = pd.DataFrame(st.session_state.songs_list)
+        songs_df = st.session_state.lyrics_rag.song_metrics
         if not songs_df.empty:
-            songs_df['lines_count'] = 20  # Placeholder for line count
             render_stats_dashboard(songs_df)
+    
+    # Redraw the progress until the background ingestion finishes
+    if st.session_state.ingestion_job is not None:
+        time.sleep(0.5)
+        st.rerun()
 
 # Generate Lyrics Page
 elif page == "✨ Generate Lyrics":
@@ -813,24 +870,36 @@ elif page == "✨ Generate Lyrics":
                 
                 full_prompt += f". {generation_prompt}"
                 
-                with st.spinner("Crafting lyrical magic..."):
-                    loading_placeholder = st.empty()
-                    loading_placeholder.markdown("""
-                    <div class="gradient-bg" style="text-align: center; padding: 30px;">
-                        <h3>Creating your lyrics...</h3>
-                        <div class="loading-animation">
-                            <div class="loading-dot"></div>
-                            <div class="loading-dot"></div>
-                            <div class="loading-dot"></div>
+                # Stream the lyrics into the page as they are generated
+                lyrics_placeholder = st.empty()
+                lyrics_placeholder.markdown("""
+                <div class="gradient-bg" style="text-align: center; padding: 30px;">
+                    <h3>Creating your lyrics...</h3>
+                    <div class="loading-animation">
+                        <div class="loading-dot"></div>
+                        <div class="loading-dot"></div>
+                        <div class="loading-dot"></div>
+                    </div>
+                    <p>Analyzing styles, finding inspiration, crafting verses...</p>
+                </div>
+                """, unsafe_allow_html=True)
+                
+                generated_lyrics = ""
+                # "Generate Again" asks the model for new lyrics instead of the cached ones
+                use_cache = not st.session_state.pop("regenerate_lyrics", False)
+                for token in st.session_state.lyrics_rag.stream_lyrics(full_prompt, use_cache=use_cache):
+                    generated_lyrics += token
+                    lyrics_placeholder.markdown(f"""
+                    <div class="card" style="background-color: #F8FAFC; border-left: 4px solid #4F46E5;">
+                        <div style="font-family: 'Georgia', serif; white-space: pre-line;">
+                            {generated_lyrics}
                         </div>
-                        <p>Analyzing styles, finding inspiration, crafting verses...</p>
                     </div>
                     """, unsafe_allow_html=True)
-                    
-                    # Generate lyrics
-                    generated_lyrics = st.session_state.lyrics_rag.generate_lyrics(full_prompt)
-                    st.session_state.generated_lyrics = generated_lyrics
-                    loading_placeholder.empty()
+                
+                st.session_state.generated_lyrics = generated_lyrics
+                st.session_state.generation_stats = st.session_state.lyrics_rag.last_stream_stats
+                lyrics_placeholder.empty()
             
             # Display generated lyrics if available
             if st.session_state.generated_lyrics:
@@ -845,6 +914,15 @@ elif page == "✨ Generate Lyrics":
                 </div>
                 """, unsafe_allow_html=True)
                 
+                # Perceived latency of the last generation
+                if st.session_state.generation_stats.get("ttft_ms") is not None:
+                    stats = st.session_state.generation_stats
+                    metric_col1, metric_col2 = st.columns([1, 1])
+                    metric_col1.metric("Time to first token", f"{stats['ttft_ms'] / 1000:.2f} s")
+                    metric_col2.metric("Total generation time", f"{stats['total_ms'] / 1000:.2f} s")
+                    if stats.get("cached"):
+                        st.caption("Served from the response cache")
+                
                 # Action buttons
                 col1, col2, col3 = st.columns([1, 1, 1])
                 
@@ -863,6 +941,7 @@ elif page == "✨ Generate Lyrics":
                 with col2:
                     if st.button("🔄 Generate Again"):
                         st.session_state.generated_lyrics = None
+                        st.session_state.regenerate_lyrics = True
                         st.rerun()
                 
                 with col3:
@@ -953,9 +1032,9 @@ elif page == "💬 Lyrics Chat":
                 <div style="clear: both;"></div>
                 """, unsafe_allow_html=True)
                 
-                # Get response from model
+                # Stream the response from the model into the typing indicator
                 try:
-                    response = st.session_state.lyrics_rag.chat(user_input)
+                    response = stream_chat_response(user_input, typing_indicator)
                     
                     # Add assistant response to chat history with timestamp
                     st.session_state.chat_history.append({
@@ -1005,8 +1084,8 @@ elif page == "💬 Lyrics Chat":
                         "timestamp": format_timestamp()
                     })
                     
-                    # Get response
-                    response = st.session_state.lyrics_rag.chat(suggestion)
+                    # Stream the response below the conversation
+                    response = stream_chat_response(suggestion, chat_container.empty())
                     
                     # Add response
                     st.session_state.chat_history.append({
@@ -1020,6 +1099,10 @@ elif page == "💬 Lyrics Chat":
             st.markdown('</div>', unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
             
+            # Perceived latency of the last answer
+            if st.session_state.chat_stats.get("ttft_ms") is not None:
+                st.metric("Time to first token", f"{st.session_state.chat_stats['ttft_ms'] / 1000:.2f} s")
+            
             # Recently discussed songs
             if len(st.session_state.chat_history) > 2:
                 st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -1086,7 +1169,9 @@ elif page == "🔍 Search Lyrics":
                     """, unsafe_allow_html=True)
                     
                     # Perform search
-                    search_results = st.session_state.lyrics_rag.search_lyrics(search_query, k=num_results)
+                    search_results = st.session_state.lyrics_rag.search_lyrics(
+                        search_query, k=num_results, search_type=search_type
+                    )
                     st.session_state.search_results = search_results
                     loading_placeholder.empty()
             
@@ -1104,6 +1189,10 @@ elif page == "🔍 Search Lyrics":
                 
                 # Display each result
                 for i, result in enumerate(st.session_state.search_results, 1):
+                    # Repeated choruses are stored once and list every song they appear in
+                    occurrences = len(result.get('sources', []))
+                    occurrences_badge = f'<span class="badge badge-success">Appears in {occurrences} places</span>' if occurrences > 1 else ''
+                    
                     with st.expander(f"{result['song']} by {result['artist']}"):
                         st.markdown(f"""
                         <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
@@ -1113,6 +1202,7 @@ elif page == "🔍 Search Lyrics":
                             </div>
                             <div>
                                 <span class="badge badge-primary">Result #{i}</span>
+                                {occurrences_badge}
                             </div>
                         </div>
                         
@@ -1142,19 +1232,9 @@ elif page == "📊 Analytics":
         </div>
         """, unsafe_allow_html=True)
     else:
-        # Create a DataFrame for analysis
-        songs_df = pd.DataFrame(st.session_state.songs_list)
+        # Per-song metrics computed once when the PDF was ingested
+        songs_df = st.session_state.lyrics_rag.song_metrics
         if not songs_df.empty:
-            # Generate metrics for all songs in the DataFrame
-            # Using random data that scales to the correct length
-            num_songs = len(songs_df)
-            songs_df['lines_count'] = np.random.randint(18, 35, size=num_songs)  # Random values between 18-35
-            songs_df['word_count'] = np.random.randint(100, 200, size=num_songs)  # Random values between 100-200
-            songs_df['complexity_score'] = np.random.uniform(0.4, 0.9, size=num_songs)  # Random values between 0.4-0.9
-            
-            # For years, create a distribution centered around recent years
-            songs_df['year'] = np.random.choice(range(2017, 2023), size=num_songs)
-            
             # Dashboard stats
             render_stats_dashboard(songs_df)
             
@@ -1170,9 +1250,9 @@ elif page == "📊 Analytics":
                 with col1:
                     # Word count by artist chart
                     fig = px.bar(
-                        songs_df.groupby('artist')['word_count'].mean().reset_index(), 
+                        songs_df.groupby('artist')['words'].mean().reset_index(), 
                         x='artist', 
-                        y='word_count',
+                        y='words',
                         title='Average Word Count by Artist',
                         color='artist',
                         color_discrete_sequence=px.colors.qualitative.Pastel
@@ -1185,69 +1265,109 @@ elif page == "📊 Analytics":
                     st.plotly_chart(fig, use_container_width=True)
                 
                 with col2:
-                    # Complexity score by artist chart
+                    # Vocabulary richness by artist chart
                     fig = px.box(
                         songs_df, 
                         x='artist', 
-                        y='complexity_score',
-                        title='Lyrical Complexity by Artist',
+                        y='unique_word_ratio',
+                        title='Vocabulary Richness by Artist',
                         color='artist',
                         color_discrete_sequence=px.colors.qualitative.Pastel
                     )
                     fig.update_layout(
                         xaxis_title="Artist",
-                        yaxis_title="Complexity Score",
+                        yaxis_title="Unique-word Ratio",
                         height=400
                     )
                     st.plotly_chart(fig, use_container_width=True)
-            
-            with tab2:
-                # Themes analysis
-                st.markdown('<div class="sub-header">Thematic Analysis</div>', unsafe_allow_html=True)
-                
-                # Theme prevalence chart (placeholder data)
-                themes = ['Love', 'Heartbreak', 'Hope', 'Nostalgia', 'Resilience', 'Freedom']
-                theme_values = [45, 30, 25, 20, 15, 10]
-                
-                fig = px.pie(
-                    names=themes,
-                    values=theme_values,
-                    title='Theme Prevalence in Lyrics',
-                    color_discrete_sequence=px.colors.sequential.Plasma_r,
-                    hole=0.4
-                )
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                fig.update_layout(height=500)
                 
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Theme distribution by artist
-                st.markdown('<div class="sub-header">Theme Distribution by Artist</div>', unsafe_allow_html=True)
+                col1, col2 = st.columns([1, 1])
                 
-                # Create dummy data for theme by artist
-                theme_data = []
-                for artist in songs_df['artist'].unique()[:5]:
-                    for theme in themes:
-                        theme_data.append({
-                            'Artist': artist,
-                            'Theme': theme,
-                            'Frequency': round(50 * (0.5 + np.random.random()/2))
-                        })
+                with col1:
+                    # Repetition by artist chart
+                    fig = px.box(
+                        songs_df, 
+                        x='artist', 
+                        y='repetition_ratio',
+                        title='Line Repetition by Artist',
+                        color='artist',
+                        color_discrete_sequence=px.colors.qualitative.Pastel
+                    )
+                    fig.update_layout(
+                        xaxis_title="Artist",
+                        yaxis_title="Share of Repeated Lines",
+                        height=400
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
                 
-                theme_df = pd.DataFrame(theme_data)
+                with col2:
+                    # Average line length by artist chart
+                    fig = px.bar(
+                        songs_df.groupby('artist')['avg_line_words'].mean().reset_index(), 
+                        x='artist', 
+                        y='avg_line_words',
+                        title='Average Line Length by Artist',
+                        color='artist',
+                        color_discrete_sequence=px.colors.qualitative.Pastel
+                    )
+                    fig.update_layout(
+                        xaxis_title="Artist",
+                        yaxis_title="Words per Line",
+                        height=400
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
                 
-                fig = px.bar(
-                    theme_df,
-                    x='Artist', 
-                    y='Frequency',
-                    color='Theme',
-                    title='Theme Distribution by Artist',
-                    barmode='group',
-                    color_discrete_sequence=px.colors.qualitative.Bold
-                )
-                fig.update_layout(height=500)
+                # Per-song metrics table
+                st.dataframe(songs_df, use_container_width=True, hide_index=True)
+            
+            with tab2:
+                # Themes analysis
+                st.markdown('<div class="sub-header">Thematic Analysis</div>', unsafe_allow_html=True)
                 
-                st.plotly_chart(fig, use_container_width=True)
+                themes_df = st.session_state.lyrics_rag.song_themes
+                if themes_df is None or themes_df.empty:
+                    st.info("Theme analysis is not available for this collection.")
+                else:
+                    # Songs by dominant theme, classified once at ingestion from the stored chunk vectors
+                    prevalence = theme_prevalence(themes_df)
+                    
+                    fig = px.pie(
+                        prevalence,
+                        names='theme',
+                        values='songs',
+                        title='Theme Prevalence in Lyrics',
+                        color_discrete_sequence=px.colors.sequential.Plasma_r,
+                        hole=0.4
+                    )
+                    fig.update_traces(textposition='inside', textinfo='percent+label')
+                    fig.update_layout(height=500)
+                    
+                    st.plotly_chart(fig, use_container_width=True)
+                    
+                    # Theme distribution by artist
+                    st.markdown('<div class="sub-header">Theme Distribution by Artist</div>', unsafe_allow_html=True)
+                    
+                    # Artists with the most songs, so the chart stays readable for large collections
+                    top_artists = themes_df['artist'].value_counts().index[:10]
+                    theme_df = artist_themes(themes_df)
+                    theme_df = theme_df[theme_df['artist'].isin(top_artists)]
+                    
+                    fig = px.bar(
+                        theme_df,
+                        x='artist', 
+                        y='songs',
+                        color='theme',
+                        title='Theme Distribution by Artist',
+                        barmode='group',
+                        color_discrete_sequence=px.colors.qualitative.Bold
+                    )
+                    fig.update_layout(
+                        xaxis_title="Artist",
+                        yaxis_title="Songs",
+                        height=500
+                    )
+                    
+                    st.plotly_chart(fig, use_container_width=True)
             
             with tab3:
                 # Style analysis
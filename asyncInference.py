@@ -5,9 +5,14 @@ from generationPipelines import (
 )
 
 import asyncio
+from lyricsGenerator import batchRunner
+from lyricsRAG.persistentIndex import DEFAULT_PERSIST_DIRECTORY
 
 
 def generationPipeline(data_path, user_input, **kwargs) :
+    # The vector index is persisted, so later runs over the same PDF start warm
+    persist_directory = kwargs.get("persist_directory", DEFAULT_PERSIST_DIRECTORY)
+
     if kwargs["parse_function"] :
         if kwargs["generation_pipeline"] == "SingleSongLyrics" :
             print("[INFO] ----> Running the SingleSongLyrics Pipeline....\n")
@@ -16,6 +21,7 @@ def generationPipeline(data_path, user_input, **kwargs) :
                     data_path=data_path, 
                     user_input=user_input, 
                     parse_function=True,
+                    persist_directory=persist_directory,
                 )
             )
             print("[INFO] ----> Pipeline execution completed successfully.....\n")
@@ -27,6 +33,7 @@ def generationPipeline(data_path, user_input, **kwargs) :
                     data_path=data_path, 
                     song_idea=user_input,
                     parse_function=True,
+                    persist_directory=persist_directory,
                     num_variations=2,
                 )
             )
@@ -39,6 +46,20 @@ def generationPipeline(data_path, user_input, **kwargs) :
                     data_path=data_path, 
                     lyrics_title=user_input, 
                     parse_function=True,
+                    persist_directory=persist_directory,
+                )
+            )
+            print("[INFO] ----> Pipeline execution completed successfully.....\n")
+
+        elif kwargs["generation_pipeline"] == "BatchGeneration" :
+            # user_input is a JSONL file of prompts; a rerun skips the ones already in output_path
+            print("[INFO] ----> Running the BatchGeneration Pipeline....\n")
+            asyncio.run(
+                batchRunner.run_batch_file(
+                    data_path=data_path,
+                    input_path=user_input,
+                    output_path=kwargs.get("output_path", "batch-results.jsonl"),
+                    persist_directory=persist_directory,
                 )
             )
             print("[INFO] ----> Pipeline execution completed successfully.....\n")
@@ -0,0 +1,124 @@
+"""
+Concurrency scaling of AsyncLyricsRAG.generate_lyrics
+
+Fires N generations at once and measures wall-clock time for two ways of
+calling the same RetrievalQA chain:
+
+    thread pool   loop.run_in_executor(None, qa_chain.invoke, ...), the
+                  previous implementation; at most min(32, cpu + 4) calls
+                  are in flight, the rest queue for a default pool thread
+    native        generate_lyrics(), which awaits qa_chain.ainvoke and the
+                  embeddings' aembed_query without any thread handoff
+
+The chat model and query embeddings are simulated with a fixed latency
+(asyncio.sleep on the async path, time.sleep on the sync one), so the
+benchmark measures the engine's concurrency and not the provider's, and
+makes no API calls. With ideal concurrency every round takes about one LLM
+latency plus one embedding latency, whatever N is.
+
+    python experiments/AsyncConcurrencyBenchmark.py Data/Combined-Lyrics-Medium.pdf
+    python experiments/AsyncConcurrencyBenchmark.py --concurrency 8 32 64 128 --llm-latency 0.5
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from lyricsGenerator import rerankerRAG
+
+
+class LatencyEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic embeddings whose queries take a fixed time, like an API round trip"""
+
+    latency: float = 0.05
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return super().embed_query(text)
+
+
+class LatencyChatModel(BaseChatModel):
+    """Chat model answering after a fixed time, like a 512-token completion"""
+
+    latency: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency-benchmark"
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="la la la"))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+async def run_round(rag, concurrency: int, native: bool) -> float:
+    """Seconds until all of `concurrency` simultaneous generations are done"""
+    prompts = [f"Write a verse about rain number {i}" for i in range(concurrency)]
+    loop = asyncio.get_running_loop()
+
+    start = time.perf_counter()
+    if native:
+        await asyncio.gather(*(rag.generate_lyrics(prompt) for prompt in prompts))
+    else:
+        await asyncio.gather(*(
+            loop.run_in_executor(None, rag.qa_chain.invoke, {"query": prompt}) for prompt in prompts
+        ))
+    return time.perf_counter() - start
+
+
+async def run(args):
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    rerankerRAG.OpenAIEmbeddings = lambda: LatencyEmbeddings(size=1536, latency=args.embedding_latency)
+    rerankerRAG.ChatOpenAI = lambda **kwargs: LatencyChatModel(latency=args.llm_latency)
+
+    rag = rerankerRAG.AsyncLyricsRAG(args.pdf_path, cache_dir=None, embedding_cache_path=None)
+    await rag.initialize()
+
+    # Same size as the default executor of the event loop
+    default_threads = ThreadPoolExecutor()._max_workers
+    ideal = args.llm_latency + args.embedding_latency
+    print(f"\nDefault executor threads: {default_threads}, ideal round time: {ideal:.2f}s\n")
+    print(f"{'in flight':>9} {'thread pool s':>14} {'native s':>9} {'speedup':>8} {'native gen/s':>13}")
+
+    for concurrency in args.concurrency:
+        threaded = await run_round(rag, concurrency, native=False)
+        native = await run_round(rag, concurrency, native=True)
+        print(f"{concurrency:>9} {threaded:>14.2f} {native:>9.2f} {threaded / native:>7.1f}x "
+              f"{concurrency / native:>13.1f}")
+
+    await rag.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare thread-pool and native async generation")
+    parser.add_argument("pdf_path", nargs="?", default=os.path.join("Data", "Combined-Lyrics-Medium.pdf"))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 64, 128])
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Simulated seconds per completion")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Simulated seconds per query embedding")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Batch generation against a rate-limited provider, with and without the call scheduler
+
+Submits a whole batch through process_batch_generation at once. The chat
+model is a simulated provider that answers after a fixed latency and
+rejects calls with a 429 when more than --provider-concurrency calls are in
+flight or more than --provider-rpm / 60 calls started in the last second:
+
+    unbounded    scheduler limits, window and retries disabled, the
+                 previous behaviour of an unbounded asyncio.gather
+    scheduled    the default CallScheduler, told the provider's RPM (the
+                 simulated provider has no token limit, so neither has the
+                 scheduler); its concurrency window has to find the
+                 in-flight ceiling itself
+
+The ceiling is the best throughput the provider allows,
+min(provider concurrency / latency, provider RPM / 60) calls per second.
+No API calls are made.
+
+    python experiments/CallSchedulerBenchmark.py Data/Combined-Lyrics-Medium.pdf
+    python experiments/CallSchedulerBenchmark.py --prompts 500 --provider-concurrency 16
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from collections import deque
+from typing import List, Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from lyricsGenerator import rerankerRAG
+
+
+class RateLimitError(Exception):
+    """Provider rejection, shaped like an SDK error with an HTTP status"""
+
+    status_code = 429
+
+
+class SimulatedProvider:
+    """Shared limits of the simulated model endpoint"""
+
+    def __init__(self, concurrency: int, rpm: int, latency: float):
+        self.concurrency = concurrency
+        self.per_second = rpm / 60
+        self.latency = latency
+        self.in_flight = 0
+        self.started = deque()
+        self.rejected = 0
+
+    async def call(self) -> None:
+        now = time.monotonic()
+        while self.started and now - self.started[0] > 1.0:
+            self.started.popleft()
+        if self.in_flight >= self.concurrency or len(self.started) >= self.per_second:
+            self.rejected += 1
+            await asyncio.sleep(0.01)
+            raise RateLimitError("429 Too Many Requests")
+
+        self.started.append(now)
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+
+class ProviderChatModel(BaseChatModel):
+    """Chat model served by a SimulatedProvider"""
+
+    provider: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated-provider"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        raise NotImplementedError("The benchmark only uses the async path")
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await self.provider.call()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="la la la"))])
+
+
+async def run_batch(args, scheduled: bool):
+    provider = SimulatedProvider(args.provider_concurrency, args.provider_rpm, args.latency)
+    rerankerRAG.ChatOpenAI = lambda **kwargs: ProviderChatModel(provider=provider)
+
+    if scheduled:
+        limits = {"requests_per_minute": args.provider_rpm, "tokens_per_minute": None}
+    else:
+        limits = {"requests_per_minute": None, "tokens_per_minute": None, "max_retries": 0}
+    rag = rerankerRAG.AsyncLyricsRAG(args.pdf_path, cache_dir=None, embedding_cache_path=None, **limits)
+    await rag.initialize()
+    if not scheduled:
+        rag.scheduler.limit = rag.scheduler.max_concurrency = float(args.prompts)
+
+    prompts = [f"Write a verse about rain number {i}" for i in range(args.prompts)]
+    start = time.perf_counter()
+    results = await rerankerRAG.process_batch_generation(rag, prompts)
+    elapsed = time.perf_counter() - start
+
+    failed = sum(isinstance(result, Exception) for result in results.values())
+    stats = rag.call_stats()
+    await rag.close()
+    return elapsed, failed, provider.rejected, stats
+
+
+async def run(args):
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    rerankerRAG.OpenAIEmbeddings = lambda: DeterministicFakeEmbedding(size=1536)
+
+    ceiling = min(args.provider_concurrency / args.latency, args.provider_rpm / 60)
+    rows = [("unbounded", await run_batch(args, scheduled=False)), ("scheduled", await run_batch(args, scheduled=True))]
+
+    print(f"\n{args.prompts} prompts, provider ceiling {ceiling:.1f} calls/s\n")
+    print(f"{'mode':<10} {'seconds':>8} {'failed':>7} {'429s':>6} {'ok calls/s':>11} {'of ceiling':>11} {'window':>7}")
+    for name, (elapsed, failed, rejected, stats) in rows:
+        throughput = (args.prompts - failed) / elapsed
+        print(f"{name:<10} {elapsed:>8.2f} {failed:>7} {rejected:>6} {throughput:>11.1f} "
+              f"{throughput / ceiling:>10.0%} {stats['concurrency_limit'] if name == 'scheduled' else '-':>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch generation against a rate-limited provider")
+    parser.add_argument("pdf_path", nargs="?", default=os.path.join("Data", "Combined-Lyrics-Medium.pdf"))
+    parser.add_argument("--prompts", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.25, help="Simulated seconds per completion")
+    parser.add_argument("--provider-concurrency", type=int, default=16)
+    parser.add_argument("--provider-rpm", type=int, default=6000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
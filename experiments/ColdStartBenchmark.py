@@ -0,0 +1,105 @@
+"""
+Cold-start benchmark for the three generationPipelines entry points
+
+Every measurement runs in a fresh interpreter, the way asyncInference is
+launched from the command line: it imports the pipeline module and times the
+AsyncLyricsRAG construction + initialize() that the pipeline performs before
+its first generation call. Generation itself is network-bound and does not
+depend on how the index is loaded, so it is not part of the measurement.
+
+Modes:
+    in-memory    no caches, every run parses, embeds and indexes the PDF
+    ingestion    ingestion cache warm, the in-memory index is rebuilt from it
+    persistent   persisted Chroma collection warm, opened as is
+
+    python experiments/ColdStartBenchmark.py Data/Combined-Lyrics-Medium.pdf
+    python experiments/ColdStartBenchmark.py --fake-embeddings   # offline, no API calls
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PIPELINES = ["GenerateSingleLyrics", "GenerateMultipleVariations", "GenerateCompleteSongStructure"]
+MODES = ["in-memory", "ingestion", "persistent"]
+
+# Runs in the child interpreter; prints the timings as one JSON line
+CHILD = r"""
+import os, sys, json, time, asyncio, importlib
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+os.chdir({root!r})
+
+pipeline = importlib.import_module("generationPipelines.{pipeline}")
+rerankerRAG = pipeline.rerankerRAG
+if {fake!r}:
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    rerankerRAG.OpenAIEmbeddings = lambda: DeterministicFakeEmbedding(size=1536)
+imported = time.perf_counter()
+
+async def run():
+    rag = rerankerRAG.AsyncLyricsRAG({pdf_path!r}, **{engine_kwargs!r})
+    await rag.initialize()
+    ready = time.perf_counter()
+    await rag.close()
+    return ready
+
+ready = asyncio.run(run())
+print("TIMING " + json.dumps({{"import": imported - start, "initialize": ready - imported, "total": ready - start}}))
+"""
+
+
+def engine_kwargs(mode, scratch):
+    """Engine settings of a benchmark mode"""
+    return {
+        "cache_dir": os.path.join(scratch, "ingestion") if mode == "ingestion" else None,
+        "embedding_cache_path": None,
+        "persist_directory": os.path.join(scratch, "chroma") if mode == "persistent" else None,
+    }
+
+
+def run_child(pipeline, pdf_path, kwargs, fake):
+    """Start one pipeline in a fresh interpreter and return its timings"""
+    code = CHILD.format(root=ROOT, pipeline=pipeline, pdf_path=os.path.abspath(pdf_path),
+                        engine_kwargs=kwargs, fake=fake)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith("TIMING "):
+            return json.loads(line[len("TIMING "):])
+    raise RuntimeError(f"{pipeline} failed:\n{result.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold-start times of the generation pipelines")
+    parser.add_argument("pdf_path", nargs="?", default=os.path.join("Data", "Combined-Lyrics-Medium.pdf"))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Use deterministic local embeddings instead of the OpenAI API")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="lyrics-coldstart-") as scratch:
+        print(f"{'pipeline':<32} {'mode':<11} {'import s':>9} {'init s':>9} {'total s':>9}")
+        for mode in MODES:
+            kwargs = engine_kwargs(mode, scratch)
+            if mode != "in-memory":
+                # Prime the cache once; the timed runs start warm
+                run_child(PIPELINES[0], args.pdf_path, kwargs, args.fake_embeddings)
+
+            for pipeline in PIPELINES:
+                timings = [
+                    run_child(pipeline, args.pdf_path, kwargs, args.fake_embeddings)
+                    for _ in range(args.repeats)
+                ]
+                median = {key: statistics.median(t[key] for t in timings) for key in timings[0]}
+                print(f"{pipeline:<32} {mode:<11} {median['import']:>9.2f} "
+                      f"{median['initialize']:>9.2f} {median['total']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Search latency: NumPy exact index vs. Chroma similarity search
+
+Ingests a lyrics PDF once (through the ingestion cache), then builds a
+Chroma collection and NumPy indexes over the same chunk vectors and times
+k-nearest-neighbour queries by vector, so embedding latency is left out:
+
+    chroma          Chroma.similarity_search_by_vector, one query at a time
+    numpy f32/f16   NumpyVectorStore, one query at a time
+    numpy batched   NumpyVectorStore, all queries in one matrix multiply
+    + filter        the same with a metadata filter on one artist
+
+Queries are chunk vectors with a little noise added, so no API calls are
+made for them. --scale N repeats the corpus N times to mimic larger ones.
+
+    python experiments/NumpyIndexBenchmark.py Data/Combined-Lyrics-Medium.pdf --scale 10
+    python experiments/NumpyIndexBenchmark.py --fake-embeddings   # offline, no API calls
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_chroma import Chroma
+from lyricsRAG import inference
+from lyricsRAG.numpyIndex import NumpyVectorStore
+
+
+def time_per_query(search, queries, repeats):
+    """Median milliseconds per query of search(queries) over several passes"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        search(queries)
+        timings.append((time.perf_counter() - start) / len(queries) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare NumPy exact search with Chroma")
+    parser.add_argument("pdf_path", nargs="?", default=os.path.join("Data", "Combined-Lyrics-Medium.pdf"))
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the corpus this many times")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Use deterministic local embeddings instead of the OpenAI API")
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+        inference.OpenAIEmbeddings = lambda: DeterministicFakeEmbedding(size=1536)
+
+    rag = inference.LyricsRAG(args.pdf_path)
+    base_texts = rag.lyrics_chunks
+    base_vectors = rag.embeddings.matrix(base_texts)
+
+    texts = base_texts * args.scale
+    metadatas = rag.lyrics_metadatas * args.scale
+    ids = [str(i) for i in range(len(texts))]
+    vectors = np.tile(base_vectors, (args.scale, 1))
+    print(f"{len(texts)} chunks, {vectors.shape[1]} dimensions, {args.queries} queries, k={args.k}\n")
+
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(base_vectors), args.queries)
+    queries = base_vectors[picks] + rng.normal(0, 0.01, (args.queries, vectors.shape[1])).astype(np.float32)
+    artist = rag.lyrics_metadatas[0]["artist"]
+    artist_filter = {"artist": artist}
+
+    # Chunk vectors are served by the ingestion embeddings, so this makes no API calls
+    chroma = Chroma(collection_name=f"benchmark-{len(texts)}", embedding_function=rag.embeddings)
+    for start in range(0, len(texts), 4096):
+        chroma.add_texts(texts[start:start + 4096], metadatas[start:start + 4096], ids=ids[start:start + 4096])
+    numpy32 = NumpyVectorStore(rag.embeddings, texts, metadatas, ids, vectors, dtype="float32")
+    numpy16 = NumpyVectorStore(rag.embeddings, texts, metadatas, ids, vectors, dtype="float16")
+
+    def one_by_one(store, **kwargs):
+        return lambda batch: [store.similarity_search_by_vector(q.tolist(), k=args.k, **kwargs) for q in batch]
+
+    def batched(store, **kwargs):
+        return lambda batch: store.similarity_search_with_score_by_vectors(batch, k=args.k, **kwargs)
+
+    cases = [
+        ("chroma", one_by_one(chroma)),
+        ("numpy f32", one_by_one(numpy32)),
+        ("numpy f16", one_by_one(numpy16)),
+        ("numpy f32 batched", batched(numpy32)),
+        ("numpy f16 batched", batched(numpy16)),
+        ("chroma + filter", one_by_one(chroma, filter=artist_filter)),
+        ("numpy f32 + filter", one_by_one(numpy32, filter=artist_filter)),
+        ("numpy f32 batched + filter", batched(numpy32, filter=artist_filter)),
+    ]
+
+    # Chroma ranks by L2 distance; on unit-length embeddings (OpenAI) that matches cosine order
+    agree = sum(
+        c[0].page_content == n[0][0].page_content
+        for c, n in zip(one_by_one(chroma)(queries), batched(numpy32)(queries))
+    )
+    print(f"Top-1 agreement with Chroma: {agree}/{args.queries}  (filter: artist={artist!r})\n")
+
+    print(f"{'search':<28} {'ms/query':>9}")
+    for name, search in cases:
+        print(f"{name:<28} {time_per_query(search, queries, args.repeats):>9.3f}")
+    print(f"\nMatrix memory: f32 {numpy32.matrix.nbytes / 1e6:.1f} MB, f16 {numpy16.matrix.nbytes / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
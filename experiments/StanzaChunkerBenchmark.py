@@ -0,0 +1,60 @@
+"""
+Micro-benchmark: StanzaChunker vs. the RecursiveCharacterTextSplitter
+
+Parses the songs of a lyrics PDF once, then times both chunkers over the
+whole corpus and reports chunk counts, chunk sizes and throughput.
+
+    python experiments/StanzaChunkerBenchmark.py Data/Combined-Lyrics-Medium.pdf
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lyricsRAG.pdfExtractor import iter_pdf_songs
+from lyricsRAG.lyricsChunker import make_chunker
+
+
+def benchmark(chunker, songs, repeats):
+    """Return (best seconds per pass, chunks) for one chunker over all songs"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = [chunk for _, _, lyrics in songs for chunk in chunker.split_song(lyrics)]
+        timings.append(time.perf_counter() - start)
+    return min(timings), chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare lyrics chunkers on a lyrics PDF")
+    parser.add_argument("pdf_path", nargs="?", default=os.path.join("Data", "Combined-Lyrics-Medium.pdf"))
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    songs = list(iter_pdf_songs(args.pdf_path))
+    corpus_chars = sum(len(lyrics) for _, _, lyrics in songs)
+    print(f"{len(songs)} songs, {corpus_chars / 1e6:.2f}M characters\n")
+
+    print(f"{'chunker':<10} {'ms/pass':>9} {'MB/s':>8} {'chunks':>7} {'mean chars':>11} {'sections':>30}")
+    for kind in ("recursive", "stanza"):
+        chunker = make_chunker(kind, args.chunk_size, args.chunk_overlap)
+        seconds, chunks = benchmark(chunker, songs, args.repeats)
+
+        sections = {}
+        for chunk in chunks:
+            sections[chunk.section] = sections.get(chunk.section, 0) + 1
+        section_summary = ", ".join(f"{name}={count}" for name, count in sorted(sections.items()))
+
+        print(
+            f"{kind:<10} {seconds * 1000:>9.1f} {corpus_chars / seconds / 1e6:>8.1f} {len(chunks):>7} "
+            f"{statistics.mean(len(chunk.text) for chunk in chunks):>11.0f} {section_summary:>30}"
+        )
+
+
+if __name__ == "__main__":
+    main()
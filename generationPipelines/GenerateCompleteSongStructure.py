@@ -1,17 +1,25 @@
+import time
 import asyncio
 from lyricsGenerator import rerankerRAG
+from lyricsRAG.persistentIndex import DEFAULT_PERSIST_DIRECTORY
 
 
 async def generate_full_song_lyrics(data_path, lyrics_title, **kwargs) :
     if kwargs["parse_function"] :
 
-        rag = rerankerRAG.AsyncLyricsRAG(data_path)
+        rag = rerankerRAG.AsyncLyricsRAG(
+            data_path,
+            persist_directory=kwargs.get("persist_directory", DEFAULT_PERSIST_DIRECTORY)
+        )
         await rag.initialize()
         
         # Generate all song components in parallel
+        start = time.perf_counter()
         components = await rag.generate_song_components(
-            lyrics_title
+            lyrics_title,
+            chorus_first=kwargs.get("chorus_first", False)
         )
+        print(f"Song structure generated in {time.perf_counter() - start:.2f}s")
         
         # Assemble the full song
         full_song = f"""
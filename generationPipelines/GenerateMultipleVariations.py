@@ -1,11 +1,15 @@
 import asyncio
 from lyricsGenerator import rerankerRAG
+from lyricsRAG.persistentIndex import DEFAULT_PERSIST_DIRECTORY
 
 
 async def generate_variations(data_path, song_idea, **kwargs) :
     if kwargs["parse_function"] :
 
-        rag = rerankerRAG.AsyncLyricsRAG(data_path)
+        rag = rerankerRAG.AsyncLyricsRAG(
+            data_path,
+            persist_directory=kwargs.get("persist_directory", DEFAULT_PERSIST_DIRECTORY)
+        )
         await rag.initialize()
         
         # Generate 3 different variations
@@ -1,12 +1,16 @@
 import asyncio
 from lyricsGenerator import rerankerRAG
+from lyricsRAG.persistentIndex import DEFAULT_PERSIST_DIRECTORY
 
 
 async def generate_single(data_path, **kwargs) :
     if kwargs["parse_function"] :
 
         # Initialize the system
-        rag = rerankerRAG.AsyncLyricsRAG(data_path)
+        rag = rerankerRAG.AsyncLyricsRAG(
+            data_path,
+            persist_directory=kwargs.get("persist_directory", DEFAULT_PERSIST_DIRECTORY)
+        )
         await rag.initialize()
         
         # Generate lyrics
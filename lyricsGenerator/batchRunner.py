@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import hashlib
+import argparse
+import statistics
+from typing import Dict, Any, Iterator, List, Set
+
+from lyricsGenerator.rerankerRAG import AsyncLyricsRAG
+from lyricsRAG.persistentIndex import DEFAULT_PERSIST_DIRECTORY
+
+MODES = ("lyrics", "variations", "song")
+
+
+def prompt_id(prompt: str, mode: str) -> str:
+    """Stable id of a prompt that has none in the input file"""
+    return hashlib.sha1(f"{mode}\0{prompt}".encode("utf-8")).hexdigest()[:16]
+
+
+def read_prompts(input_path: str, mode: str = "lyrics", variations: int = 3) -> Iterator[Dict[str, Any]]:
+    """
+    Read the prompts of a JSONL file
+
+    Args:
+        input_path: JSONL file of prompts
+        mode: Mode of lines that do not set one
+        variations: Variation count of lines that do not set one
+
+    Yields:
+        Dicts with id, prompt, mode and variations
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt": record}
+            if not record.get("prompt"):
+                raise ValueError(f"{input_path}:{line_number} has no prompt")
+
+            record_mode = record.get("mode", mode)
+            if record_mode not in MODES:
+                raise ValueError(f"{input_path}:{line_number} has unknown mode {record_mode!r}, expected one of {MODES}")
+            yield {
+                "id": str(record.get("id") or prompt_id(record["prompt"], record_mode)),
+                "prompt": record["prompt"],
+                "mode": record_mode,
+                "variations": int(record.get("variations", variations))
+            }
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """
+    Ids that already have a result in an output file
+
+    A line cut short by an interrupted run is ignored, and an id counts as
+    done if any of its lines holds a result, so failures are retried.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "result" in record:
+                done.add(record["id"])
+    return done
+
+
+def _open_for_append(output_path: str):
+    """Open the output file for appending, after any line an interrupted run left unfinished"""
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    f = open(output_path, "a+", encoding="utf-8")
+    if f.tell() > 0:
+        f.seek(f.tell() - 1)
+        if f.read(1) != "\n":
+            f.write("\n")
+    return f
+
+
+async def _generate(rag: AsyncLyricsRAG, item: Dict[str, Any], record: Dict[str, Any]) -> Any:
+    if item["mode"] == "variations":
+        return await rag.generate_multiple_lyrics(item["prompt"], variations=item["variations"])
+    if item["mode"] == "song":
+        # Prompts run concurrently, so each keeps its own section timings in its record
+        timings = {}
+        result = await rag.generate_song_components(item["prompt"], timings=timings)
+        record["section_timings"] = timings
+        return result
+    return await rag.generate_lyrics(item["prompt"])
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, math.ceil(fraction * len(values)) - 1)] if values else 0.0
+
+
+async def run_batch(rag: AsyncLyricsRAG, input_path: str, output_path: str, mode: str = "lyrics",
+                    variations: int = 3, concurrency: int = 32) -> Dict[str, Any]:
+    """
+    Generate every prompt of a JSONL file that has no result yet
+
+    Args:
+        rag: Initialized engine shared by all prompts
+        input_path: JSONL file of prompts
+        output_path: JSONL file results are appended to, also read as the checkpoint
+        mode: Mode of prompts that do not set one
+        variations: Variation count of prompts that do not set one
+        concurrency: Largest number of prompts in progress at once; the engine's
+                     call scheduler paces the model calls below it
+
+    Returns:
+        Dict with prompt counts, elapsed seconds, prompts per second and
+        p50/p95 latency per prompt in ms
+    """
+    done = completed_ids(output_path)
+    pending = asyncio.Queue()
+    total = skipped = 0
+    for item in read_prompts(input_path, mode, variations):
+        total += 1
+        if item["id"] in done:
+            skipped += 1
+        else:
+            done.add(item["id"])
+            pending.put_nowait(item)
+
+    latencies = []
+    failed = 0
+    start = time.perf_counter()
+
+    with _open_for_append(output_path) as out:
+        async def worker():
+            nonlocal failed
+            while not pending.empty():
+                item = pending.get_nowait()
+                item_start = time.perf_counter()
+                record = {"id": item["id"], "prompt": item["prompt"], "mode": item["mode"]}
+                try:
+                    record["result"] = await _generate(rag, item, record)
+                except Exception as e:
+                    failed += 1
+                    record["error"] = f"{type(e).__name__}: {e}"
+                latency = (time.perf_counter() - item_start) * 1000
+                record["latency_ms"] = round(latency, 1)
+                if "result" in record:
+                    latencies.append(latency)
+
+                # Written and flushed as soon as it completes, so an interrupted run loses nothing finished
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+
+                finished = len(latencies) + failed
+                if finished % 50 == 0:
+                    print(f"[INFO] ----> {finished} of {total - skipped} prompts finished")
+
+        workers = min(concurrency, pending.qsize())
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "prompts": total,
+        "skipped": skipped,
+        "succeeded": len(latencies),
+        "failed": failed,
+        "elapsed_s": elapsed,
+        "prompts_per_second": (len(latencies) + failed) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": _percentile(latencies, 0.95)
+    }
+
+
+def format_batch_stats(stats: Dict[str, Any]) -> str:
+    """One-paragraph summary of run_batch's stats"""
+    return (
+        f"{stats['succeeded']} generated, {stats['failed']} failed, {stats['skipped']} skipped "
+        f"of {stats['prompts']} prompts in {stats['elapsed_s']:.1f}s\n"
+        f"{stats['prompts_per_second']:.2f} prompts/s, "
+        f"latency p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms"
+    )
+
+
+async def run_batch_file(data_path: str, input_path: str, output_path: str,
+                         persist_directory: str = DEFAULT_PERSIST_DIRECTORY, mode: str = "lyrics",
+                         variations: int = 3, concurrency: int = 32, **rag_kwargs) -> Dict[str, Any]:
+    """
+    Initialize one engine over a lyrics PDF and run_batch a prompts file through it
+
+    Args:
+        data_path: Lyrics PDF to retrieve from
+        input_path: JSONL file of prompts
+        output_path: JSONL file of results, also the checkpoint of a rerun
+        persist_directory: Directory of the persistent vector index
+        mode, variations, concurrency: As for run_batch
+        **rag_kwargs: Passed to AsyncLyricsRAG (e.g. model_name, requests_per_minute)
+
+    Returns:
+        run_batch's stats
+    """
+    rag = AsyncLyricsRAG(data_path, persist_directory=persist_directory, **rag_kwargs)
+    await rag.initialize()
+    try:
+        stats = await run_batch(rag, input_path, output_path, mode=mode,
+                                variations=variations, concurrency=concurrency)
+    finally:
+        await rag.close()
+
+    print(format_batch_stats(stats))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Resumable batch lyrics generation from a JSONL file.\n\n"
+                    "Each line is a JSON object with a \"prompt\" and optionally an \"id\", a \"mode\"\n"
+                    "and a \"variations\" count, or a bare JSON string. One engine serves the whole\n"
+                    "batch; results are appended to the output file as they finish, and a rerun\n"
+                    "skips the ids that already have one.",
+        epilog="examples:\n"
+               "  python -m lyricsGenerator.batchRunner prompts.jsonl results.jsonl\n"
+               "  python -m lyricsGenerator.batchRunner prompts.jsonl results.jsonl --mode song --concurrency 16",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("input_path", help="JSONL file of prompts")
+    parser.add_argument("output_path", help="JSONL file of results, also the checkpoint of a rerun")
+    parser.add_argument("--pdf", default=os.path.join("Data", "Combined-Lyrics-Medium.pdf"), help="Lyrics PDF to retrieve from")
+    parser.add_argument("--mode", choices=MODES, default="lyrics", help="Mode of prompts that do not set one")
+    parser.add_argument("--variations", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=32, help="Prompts in progress at once")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--persist-directory", default=DEFAULT_PERSIST_DIRECTORY)
+    parser.add_argument("--requests-per-minute", type=float, default=500)
+    parser.add_argument("--tokens-per-minute", type=float, default=200_000)
+    args = parser.parse_args()
+    stats = asyncio.run(run_batch_file(
+        args.pdf, args.input_path, args.output_path,
+        persist_directory=args.persist_directory,
+        mode=args.mode,
+        variations=args.variations,
+        concurrency=args.concurrency,
+        model_name=args.model,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute
+    ))
+    sys.exit(1 if stats["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import math
+import time
+import random
+import asyncio
+import statistics
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Callable, Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying besides 429 (timeouts and transient server errors)
+RETRYABLE_STATUSES = {408, 409, 500, 502, 503, 504, 529}
+
+# Error class names of the OpenAI and Anthropic SDKs for failures without a status
+RETRYABLE_ERRORS = {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError"}
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether the provider rejected a call for exceeding its rate limit"""
+    return _status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed call may succeed if sent again"""
+    if is_rate_limited(error) or _status_code(error) in RETRYABLE_STATUSES:
+        return True
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError)) or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the provider asked to wait before retrying, if it said so"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at a per-minute rate
+
+    Waiters are served in arrival order. The bucket holds at most
+    burst_seconds worth of tokens, so an idle period does not allow a whole
+    minute of calls to go out at once (providers enforce per-minute limits
+    over much shorter windows).
+    """
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 10.0):
+        """
+        Args:
+            rate_per_minute: Tokens added per minute
+            burst_seconds: Seconds of refill the bucket can hold
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+        self._loop = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Wait until `amount` tokens are available and take them"""
+        amount = min(amount, self.capacity)
+        # asyncio primitives belong to one event loop; a bucket reused by a later asyncio.run gets a new lock
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        async with self._lock:
+            self._refill()
+            while self.level < amount:
+                await asyncio.sleep((amount - self.level) / self.rate)
+                self._refill()
+            self.level -= amount
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the provider reported a rate limit"""
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+class CallScheduler:
+    """
+    Shared gate for outbound model calls
+
+    Every call first takes one request and its estimated tokens from two
+    token buckets (requests and tokens per minute), then waits for a slot in
+    an adaptive concurrency window. The window follows AIMD: until the first
+    congestion signal it grows by one slot per success (slow start), then by
+    about one slot per window's worth of calls, while a rate limit cuts it by
+    a quarter and a sustained latency rise by a tenth, at most once per
+    round trip. Retryable failures are sent again after a jittered
+    exponential backoff (or the provider's Retry-After); the call keeps its
+    slot while it backs off, so the excess slots of a too-wide window do
+    not keep producing 429s.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = 500, tokens_per_minute: Optional[float] = 200_000,
+                 initial_concurrency: int = 8, min_concurrency: int = 1, max_concurrency: int = 64,
+                 max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                 latency_tolerance: float = 2.0, history_size: int = 1000):
+        """
+        Args:
+            requests_per_minute: Request rate limit (None disables it)
+            tokens_per_minute: Token rate limit (None disables it)
+            initial_concurrency: Starting size of the concurrency window
+            min_concurrency: Smallest window size
+            max_concurrency: Largest window size
+            max_retries: Retries of a call before its error is raised
+            base_delay: Backoff of the first retry in seconds, doubled per retry
+            max_delay: Upper bound of a single backoff in seconds
+            latency_tolerance: Shrink the window when the smoothed latency exceeds
+                               this multiple of the best smoothed latency seen
+            history_size: Number of per-call records kept for stats()
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.history = deque(maxlen=history_size)
+        self._latency = None
+        self._best_latency = None
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._window = None
+        self._loop = None
+
+    def _window_condition(self) -> asyncio.Condition:
+        """Condition of the window on the running event loop, recreated if the scheduler moved to another loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._window, self._loop = asyncio.Condition(), loop
+        return self._window
+
+    async def _enter(self, tokens: float) -> None:
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens and tokens:
+            await self.tokens.acquire(tokens)
+        async with self._window_condition():
+            await self._window.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def _leave(self) -> None:
+        async with self._window_condition():
+            self.in_flight -= 1
+            self._window.notify_all()
+
+    def _decrease(self, factor: float) -> None:
+        """Shrink the window, at most once per smoothed round trip"""
+        now = time.monotonic()
+        if now - self._last_decrease < (self._latency or 1.0):
+            return
+        self._last_decrease = now
+        self._slow_start = False
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+
+    def _on_success(self, latency: float) -> None:
+        self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        self._best_latency = min(self._best_latency or self._latency, self._latency)
+        if self._latency > self.latency_tolerance * self._best_latency:
+            self._decrease(0.9)
+        else:
+            step = 1.0 if self._slow_start else 1.0 / self.limit
+            self.limit = min(float(self.max_concurrency), self.limit + step)
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(delay, retry_after(error) or 0.0)
+
+    def _record(self, name: str, queued: float, latency: float, attempts: int, tokens: float, ok: bool) -> None:
+        self.history.append({
+            "name": name,
+            "queued_ms": queued * 1000,
+            "latency_ms": latency * 1000,
+            "attempts": attempts,
+            "tokens": tokens,
+            "ok": ok,
+            "finished": time.monotonic()
+        })
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: float = 0, name: str = "call") -> T:
+        """
+        Run a model call under the rate limits and concurrency window
+
+        Args:
+            call: Coroutine function making the call; called again on retry
+            tokens: Estimated prompt + completion tokens of the call
+            name: Label of the call in the stats
+
+        Returns:
+            The call's result
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            # Queueing of this attempt only; the backoff before it is not queueing
+            submitted = time.perf_counter()
+            await self._enter(tokens)
+            start = time.perf_counter()
+            try:
+                try:
+                    result = await call()
+                except Exception as error:
+                    if is_rate_limited(error):
+                        self.rate_limited += 1
+                        self._decrease(0.75)
+                        if self.requests:
+                            self.requests.drain()
+                    if not is_retryable(error) or attempt > self.max_retries:
+                        self._record(name, start - submitted, time.perf_counter() - start, attempt, tokens, False)
+                        raise
+                    # The slot is held through the backoff, so it is not refilled straight into another 429
+                    self.retries += 1
+                    await asyncio.sleep(self._backoff(attempt, error))
+                    continue
+            finally:
+                await self._leave()
+
+            latency = time.perf_counter() - start
+            self._on_success(latency)
+            self._record(name, start - submitted, latency, attempt, tokens, True)
+            return result
+
+    @asynccontextmanager
+    async def slot(self, tokens: float = 0, name: str = "stream"):
+        """
+        Hold a rate-limited slot for a streamed call
+
+        A stream cannot be replayed once tokens were shown, so it is not
+        retried; it only counts against the rate limits and the window.
+        """
+        submitted = time.perf_counter()
+        await self._enter(tokens)
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            await self._leave()
+            latency = time.perf_counter() - start
+            if ok:
+                self._on_success(latency)
+            self._record(name, start - submitted, latency, 1, tokens, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-call statistics of the recent history
+
+        Returns:
+            Dict with call counts, retries, rate limits, the current window,
+            p50/p95 latency and mean queueing in ms, and completed calls per second
+        """
+        entries = list(self.history)
+        latencies = sorted(entry["latency_ms"] for entry in entries if entry["ok"])
+        span = entries[-1]["finished"] - (entries[0]["finished"] - entries[0]["latency_ms"] / 1000) if entries else 0.0
+        return {
+            "calls": len(entries),
+            "succeeded": sum(entry["ok"] for entry in entries),
+            "failed": sum(not entry["ok"] for entry in entries),
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "p50_ms": statistics.median(latencies) if latencies else 0.0,
+            "p95_ms": latencies[max(0, math.ceil(0.95 * len(latencies)) - 1)] if latencies else 0.0,
+            "mean_queued_ms": statistics.fmean(entry["queued_ms"] for entry in entries) if entries else 0.0,
+            "calls_per_second": len(latencies) / span if span > 0 else 0.0
+        }
@@ -1,23 +1,48 @@
 import os
 import sys
+import time
 from pathlib import Path
 import re
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Tuple, Union, AsyncIterator
 import asyncio
 import multiprocessing
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from functools import partial
 
 # PDF extraction
-import fitz  # PyMuPDF
+from lyricsRAG.pdfExtractor import (
+    extract_page_headers, iter_pdf_songs, aiter_prefetched, shard_page_ranges, check_pdf_source,
+    is_pdf_path, pdf_page_count, pdf_sha256, pdf_name as pdf_name_of, rereadable_pdf_source, PdfSource,
+    SongAssembler, SongRecord
+)
+from lyricsRAG.ingestionCache import (
+    IngestionCache, PrecomputedEmbeddings, corpus_fingerprint, DEFAULT_CACHE_DIR
+)
+from lyricsRAG.embeddingCache import (
+    EmbeddingCache, CachedEmbeddings, QueryEmbeddingCache, DEFAULT_EMBEDDING_CACHE_PATH
+)
+from lyricsRAG.chunkDedup import ChunkDeduplicator, chunk_sources
+from lyricsRAG.lyricsChunker import make_chunker
+from lyricsRAG.corpusAnalytics import song_metrics
+from lyricsRAG.themeAnalytics import (
+    DEFAULT_THEMES, theme_key, analyze_themes, load_song_themes, save_song_themes
+)
+from lyricsRAG.keywordIndex import BM25Index, reciprocal_rank_fusion, SEARCH_TYPES
+from lyricsRAG.reranker import FlashRankReranker, RerankingRetriever, warm_up, DEFAULT_RERANK_MODEL
+from lyricsRAG.asyncSearch import AsyncVectorRetriever, asimilarity_search
+from lyricsRAG.persistentIndex import make_index, chunk_ids, DEFAULT_PERSIST_DIRECTORY
+from lyricsRAG.streaming import (
+    stuff_messages, has_chat_history, acondense_question, aremember_exchange, new_stream_stats, atimed_tokens, cached_tokens
+)
+from lyricsRAG.responseCache import ResponseCache
+from lyricsRAG.chatMemory import make_chat_memory
+from lyricsGenerator.sectionScheduler import run_dag, format_timings
+from lyricsGenerator.callScheduler import CallScheduler
 
 # LangChain imports
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from langchain.memory.buffer import ConversationBufferMemory
 from langchain.chains.conversational_retrieval.base import ConversationalRetrievalChain
 
 # Environment variables for API keys
@@ -26,35 +51,173 @@ dotenv.load_dotenv()  # Load environment variables from .env file
 
 
 class AsyncLyricsRAG:
-    def __init__(self, pdf_path: str, openai_api_key: str = None, 
+    def __init__(self, pdf_path: PdfSource, openai_api_key: str = None, 
                 model_name: str = "gpt-4o-mini", chunk_size: int = 500, 
-                chunk_overlap: int = 50, temperature: float = 0.7):
+                chunk_overlap: int = 50, temperature: float = 0.7,
+                parallel_extraction: bool = True, min_pages_per_shard: int = 256,
+                streaming: bool = True, queue_size: int = 64, embedding_batch_size: int = 256,
+                cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                embedding_cache_path: Optional[str] = DEFAULT_EMBEDDING_CACHE_PATH,
+                embedding_cache_size: int = 500_000, deduplicate_chunks: bool = True,
+                chunker: str = "recursive", persist_directory: Optional[str] = None,
+                vector_store: str = "chroma", faiss_index_type: str = "auto",
+                numpy_dtype: str = "float32", rerank: bool = False, rerank_fetch_k: int = 40,
+                rerank_top_n: int = 5, rerank_score_threshold: float = 0.0,
+                reranker_model: str = DEFAULT_RERANK_MODEL, rerank_batch_size: int = 10,
+                rerank_cache_size: int = 10_000, max_threads: int = 4,
+                requests_per_minute: Optional[float] = 500, tokens_per_minute: Optional[float] = 200_000,
+                max_concurrency: int = 64, max_retries: int = 5, response_cache: bool = False,
+                response_cache_size: int = 1000, response_cache_ttl: Optional[float] = 3600,
+                response_similarity_threshold: Optional[float] = None, query_cache_size: int = 1024,
+                chat_memory: str = "buffer", chat_memory_tokens: int = 2000, chat_summary_tokens: int = 256,
+                pdf_name: Optional[str] = None, themes: Optional[Dict[str, List[str]]] = DEFAULT_THEMES):
         """
         Initialize the Asynchronous Lyrics RAG system
         
         Args:
-            pdf_path: Path to the PDF file containing lyrics
+            pdf_path: Path to the PDF file containing lyrics, or the PDF itself as
+                      bytes, a memoryview or a binary file object (e.g. an upload),
+                      which is parsed in place without a temporary file
             openai_api_key: OpenAI API key (if not set in environment)
             model_name: Name of the OpenAI model to use
             chunk_size: Size of text chunks for splitting
             chunk_overlap: Overlap between chunks
             temperature: Temperature for the LLM (higher = more creative)
+            parallel_extraction: Split the pages of a PDF on disk across the process pool
+            min_pages_per_shard: Smallest page range worth sending to a worker
+            streaming: Chunk and embed songs while the PDF is still being parsed
+            queue_size: Maximum number of parsed songs waiting to be embedded
+            embedding_batch_size: Number of chunks embedded and indexed per batch
+            cache_dir: Directory of the on-disk ingestion cache (None disables it)
+            embedding_cache_path: SQLite file of the persistent embedding cache (None disables it)
+            embedding_cache_size: Maximum number of vectors kept in the embedding cache
+            deduplicate_chunks: Index repeated chunks (choruses, hooks) only once
+            chunker: "recursive" for the generic character splitter, or "stanza" to cut
+                     on blank lines and section markers (only useful for PDFs
+                     that keep them; the bundled corpora have neither)
+            persist_directory: Directory of the persistent vector index; an index
+                               built earlier for the same corpus is opened instead
+                               of rebuilt (None keeps the index in memory)
+            vector_store: "chroma", "faiss", or "numpy" for exact in-process search
+            faiss_index_type: "flat", "hnsw", "ivf" or "auto" to choose by corpus size
+            numpy_dtype: Matrix dtype of the NumPy index, "float32" or "float16"
+            rerank: Over-fetch candidates and rerank them with a FlashRank cross-encoder
+            rerank_fetch_k: Number of candidates fetched from the vector store for reranking
+            rerank_top_n: Number of reranked chunks passed to the chains
+            rerank_score_threshold: Reranked chunks scoring below this are dropped
+            reranker_model: FlashRank model name
+            rerank_batch_size: Candidates scored per process pool task
+            rerank_cache_size: Maximum number of cached (query, chunk) reranker scores
+            max_threads: Size of the thread pool for blocking work (chunking, index
+                         writes, cache I/O, keyword index build, Chroma lookups); LLM
+                         and embedding calls are awaited natively and never use it
+            requests_per_minute: Provider request rate limit shared by all model calls
+                                 (None disables it)
+            tokens_per_minute: Provider token rate limit shared by all model calls
+                               (None disables it)
+            max_concurrency: Largest number of model calls in flight; the actual
+                             window adapts to rate limits and latency below it
+            max_retries: Retries of a rate-limited or transiently failing model call
+            response_cache: Answer repeated generation and chat prompts from a cache
+                            instead of the model
+            response_cache_size: Maximum number of cached responses
+            response_cache_ttl: Seconds a cached response stays valid (None keeps it until evicted)
+            response_similarity_threshold: Also answer prompts at least this cosine-similar
+                                           to a cached one (None only reuses exact repeats)
+            query_cache_size: Number of query embeddings kept in memory for every
+                              retrieval path to share (0 disables the cache)
+            chat_memory: "buffer" keeps the whole chat history, "summary" keeps the
+                         recent turns verbatim and a running summary of older ones
+                         within chat_memory_tokens, so long chats do not slow down
+            chat_memory_tokens: Token budget of the chat history in "summary" mode
+            chat_summary_tokens: Largest size of the running summary in tokens
+            pdf_name: Name of the PDF in logs and chunk metadata (defaults to the
+                      path, or the file object's name)
+            themes: Theme labels and describing phrases the Themes analytics sort chunks
+                    into, by similarity of their stored vectors (None skips it)
         """
         if openai_api_key:
             os.environ["OPENAI_API_KEY"] = openai_api_key
         elif "OPENAI_API_KEY" not in os.environ:
             raise ValueError("OpenAI API key must be provided or set as OPENAI_API_KEY environment variable")
         
-        self.pdf_path = pdf_path
+        self.pdf_path = rereadable_pdf_source(pdf_path)
+        self.pdf_name = pdf_name or pdf_name_of(pdf_path)
+        self.themes = themes
         self.lyrics_by_song = {}
         self.lyrics_chunks = []
+        self.lyrics_metadatas = []
         self.vectorstore = None
+        self.keyword_index = None
+        self.song_metrics = None
+        self.song_themes = None
         self.qa_chain = None
         self.conversation_chain = None
+        self.lyric_prompt = None
+        self.lyric_llm = None
+        self.section_timings = {}
+        self.last_stream_stats = {}
         self.model_name = model_name
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.temperature = temperature
+        self.parallel_extraction = parallel_extraction
+        self.min_pages_per_shard = min_pages_per_shard
+        self.streaming = streaming
+        self.queue_size = queue_size
+        self.embedding_batch_size = embedding_batch_size
+        self.deduplicate_chunks = deduplicate_chunks
+        self.chunker = chunker
+        self.persist_directory = persist_directory
+        self.vector_store = vector_store
+        self.faiss_index_type = faiss_index_type
+        self.numpy_dtype = numpy_dtype
+        self.chat_memory = chat_memory
+        self.chat_memory_tokens = chat_memory_tokens
+        self.chat_summary_tokens = chat_summary_tokens
+        self.rerank = rerank
+        self.rerank_fetch_k = rerank_fetch_k
+        self.rerank_top_n = rerank_top_n
+        self.rerank_score_threshold = rerank_score_threshold
+        self.reranker_model = reranker_model
+        self.rerank_batch_size = rerank_batch_size
+        self.rerank_cache_size = rerank_cache_size
+        self.max_threads = max_threads
+        
+        # Every outbound model call goes through one scheduler, so concurrent
+        # generations share the provider's rate limits instead of tripping them
+        self.scheduler = CallScheduler(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_concurrency=max_concurrency,
+            max_retries=max_retries
+        )
+        self.reranker = None
+        self.fingerprint = None
+        self.index = None
+        
+        # Chunk vectors are looked up in the persistent embedding cache before
+        # anything is sent to the embedding API
+        base_embeddings = OpenAIEmbeddings()
+        self.embedding_cache = None
+        if embedding_cache_path:
+            self.embedding_cache = EmbeddingCache(embedding_cache_path, max_entries=embedding_cache_size)
+            base_embeddings = CachedEmbeddings(base_embeddings, self.embedding_cache)
+        
+        # Search and both chains embed their queries through this one object,
+        # so a query is only sent to the embedding API once
+        self.query_embedding_cache = None
+        if query_cache_size:
+            self.query_embedding_cache = QueryEmbeddingCache(base_embeddings, max_entries=query_cache_size)
+            base_embeddings = self.query_embedding_cache
+        self.embeddings = PrecomputedEmbeddings(base_embeddings)
+        self.ingestion_cache = IngestionCache(cache_dir) if cache_dir else None
+        self.response_cache = ResponseCache(
+            max_entries=response_cache_size,
+            ttl_seconds=response_cache_ttl,
+            embeddings=self.embeddings,
+            similarity_threshold=response_similarity_threshold
+        ) if response_cache else None
         
         # Create an event loop if not existing
         try:
@@ -65,85 +228,205 @@ class AsyncLyricsRAG:
     
     async def initialize(self) -> None:
         """Asynchronously initialize the RAG system"""
-        print(f"Initializing RAG system for {self.pdf_path}...")
+        print(f"Initializing RAG system for {self.pdf_name}...")
+        
+        # Set up the process pool first so extraction can shard pages across it
+        await self._setup_processing_pool()
+        if self.rerank:
+            await self._setup_reranker()
         
-        # Run extraction and setup in parallel
-        await asyncio.gather(
-            self._extract_lyrics_from_pdf(),
-            self._setup_processing_pool()
+        # Open the persisted index of this corpus, or rebuild it from the
+        # ingestion cache, or process the PDF from scratch
+        index_options = {
+            "faiss": {"index_type": self.faiss_index_type},
+            "numpy": {"dtype": self.numpy_dtype}
+        }.get(self.vector_store, {})
+        self.index = make_index(
+            self.vector_store, await self._corpus_fingerprint(), self.persist_directory, **index_options
         )
+        if not await self._open_persisted_index():
+            if not await self._load_from_cache():
+                if self.streaming:
+                    # Chunk and embed songs as they are parsed
+                    await self._create_vector_store(self.aiter_songs())
+                else:
+                    # Create vector store after extraction is complete
+                    await self._extract_lyrics_from_pdf()
+                    await self._create_vector_store()
+                await self._save_to_cache()
+        # The index holds every chunk vector now, so the table is not kept for the engine's lifetime
+        self.embeddings.clear()
         
-        # Create vector store after extraction is complete
-        await self._create_vector_store()
+        # Keyword search answers from an inverted index built next to the vectors
+        self.keyword_index = await self.loop.run_in_executor(
+            self.thread_pool, BM25Index, self.lyrics_chunks, self.lyrics_metadatas
+        )
+        # Per-song metrics are computed once here so callers only read a table
+        self.song_metrics = await self.loop.run_in_executor(self.thread_pool, song_metrics, self.lyrics_by_song)
+        if self.themes:
+            self.song_themes = await self.loop.run_in_executor(self.thread_pool, self._analyze_themes)
         
         # Setup RAG chains after vector store is created
         await self._setup_rag_chains()
         
         print("Initialization complete!")
     
+    def _analyze_themes(self):
+        """Theme table of the corpus, read from next to the persisted index or computed from its vectors (blocking)"""
+        key = theme_key(self.themes, self.embeddings.model)
+        table = load_song_themes(self.index.themes_path, key)
+        if table is None:
+            vectors = self.index.vectors(self.lyrics_metadatas)
+            table = analyze_themes(self.embeddings.base, vectors, self.lyrics_metadatas, self.themes)
+            save_song_themes(self.index.themes_path, key, table)
+        return table
+    
+    async def _corpus_fingerprint(self) -> str:
+        """Fingerprint of this PDF and its chunking/embedding settings"""
+        if self.fingerprint is None:
+            digest = await self.loop.run_in_executor(self.thread_pool, pdf_sha256, self.pdf_path)
+            self.fingerprint = corpus_fingerprint(
+                digest,
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                embedding_model=self.embeddings.model,
+                deduplicate_chunks=self.deduplicate_chunks,
+                chunker=self.chunker
+            )
+        return self.fingerprint
+    
+    async def _open_persisted_index(self) -> bool:
+        """
+        Open the vector index persisted by an earlier run over the same corpus
+        
+        Returns:
+            True if the index was opened without parsing or embedding anything
+        """
+        opened = await self.loop.run_in_executor(self.thread_pool, self.index.open_existing, self.embeddings)
+        if opened is None:
+            return False
+        
+        self.vectorstore, manifest = opened
+        self.lyrics_by_song = manifest["songs"]
+        self.lyrics_chunks = manifest["texts"]
+        self.lyrics_metadatas = manifest["metadatas"]
+        
+        print(f"Opened persisted vector store {self.index.name} with {len(self.lyrics_chunks)} chunks "
+              f"from {len(self.lyrics_by_song)} songs")
+        return True
+    
+    async def _load_from_cache(self) -> bool:
+        """
+        Restore songs, chunks and embeddings from the ingestion cache
+        
+        Returns:
+            True if the vector store was built from a cache entry
+        """
+        if not self.ingestion_cache:
+            return False
+        
+        key = await self._corpus_fingerprint()
+        entry = await self.loop.run_in_executor(self.thread_pool, self.ingestion_cache.load, key)
+        if entry is None:
+            return False
+        
+        print(f"Loading {self.pdf_name} from the ingestion cache...")
+        self.lyrics_by_song = entry["songs"]
+        self.embeddings = PrecomputedEmbeddings(self.embeddings.base, entry["texts"], entry["embeddings"])
+        await self.loop.run_in_executor(self.thread_pool, self.index.begin, self.embeddings)
+        self.lyrics_chunks = []
+        self.lyrics_metadatas = []
+        
+        # Stored vectors are served by the embeddings table, so no API calls are made
+        texts = entry["texts"]
+        metadatas = [dict(metadata, source=self.pdf_name) for metadata in entry["metadatas"]]
+        for start in range(0, len(texts), self.embedding_batch_size):
+            stop = start + self.embedding_batch_size
+            await self._index_chunks(texts[start:stop], metadatas[start:stop])
+        await self._finish_index()
+        
+        print(f"Created vector store with {len(self.lyrics_chunks)} chunks from {len(self.lyrics_by_song)} songs")
+        return True
+    
+    async def _save_to_cache(self) -> None:
+        """Store the parsed songs, chunks and their embeddings in the ingestion cache"""
+        if not self.ingestion_cache:
+            return
+        
+        key = await self._corpus_fingerprint()
+        
+        def save():
+            # Stacking the whole corpus' vectors is as heavy as the write, so both leave the event loop
+            self.ingestion_cache.save(
+                key,
+                songs=self.lyrics_by_song,
+                texts=self.lyrics_chunks,
+                metadatas=self.lyrics_metadatas,
+                embeddings=self.embeddings.matrix(self.lyrics_chunks)
+            )
+        
+        await self.loop.run_in_executor(self.thread_pool, save)
+    
+    async def aiter_songs(self) -> AsyncIterator[SongRecord]:
+        """
+        Parse the PDF lazily, yielding each song as soon as it is complete
+        
+        Yields:
+            (song, artist, lyrics) records in page order
+        """
+        print(f"Extracting lyrics from {self.pdf_name}...")
+        
+        # Opening the document parses its cross-reference table, so keep it off the event loop
+        await self.loop.run_in_executor(self.thread_pool, check_pdf_source, self.pdf_path)
+        page_count = await self.loop.run_in_executor(self.thread_pool, pdf_page_count, self.pdf_path)
+        
+        # Skip the title page (first page)
+        page_ranges = shard_page_ranges(page_count, self._extraction_shard_count(page_count))
+        
+        if len(page_ranges) <= 1:
+            # Parse pages on a background thread, handing songs over through a bounded queue
+            async for record in aiter_prefetched(iter_pdf_songs(self.pdf_path), self.queue_size):
+                yield record
+            return
+        
+        # Parse page ranges in parallel, each worker opening its own copy of the document
+        print(f"Extracting {page_count - 1} pages in {len(page_ranges)} shards")
+        shards = [
+            self.loop.run_in_executor(self.process_pool, extract_page_headers, self.pdf_path, start, stop)
+            for start, stop in page_ranges
+        ]
+        
+        # Replay the headers of every shard in page order, so a song whose
+        # pages cross a shard edge is closed exactly as in a serial pass.
+        # Songs of a shard are released as soon as it and its predecessors finish.
+        assembler = SongAssembler()
+        try:
+            for shard in shards:
+                for header in await shard:
+                    completed = assembler.feed(header)
+                    if completed:
+                        yield completed
+        finally:
+            for shard in shards:
+                shard.cancel()
+        
+        # Store the last song
+        completed = assembler.finish()
+        if completed:
+            yield completed
+    
     async def _extract_lyrics_from_pdf(self) -> None:
         """Extract lyrics from the PDF, organizing by song and artist"""
-        print(f"Extracting lyrics from {self.pdf_path}...")
-        
-        if not os.path.exists(self.pdf_path):
-            raise FileNotFoundError(f"PDF file not found: {self.pdf_path}")
-        
-        # Run PDF extraction in a separate thread to not block the event loop
-        def extract_from_pdf():
-            # Open the PDF
-            doc = fitz.open(self.pdf_path)
-            current_song = "Unknown Song"
-            current_artist = "Unknown Artist"
-            current_lyrics = []
-            results = {}
-            
-            # Skip the title page (first page)
-            for page_num in range(1, len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text()
-                
-                # Try to extract song title and artist
-                lines = text.split('\n')
-                if len(lines) >= 2:
-                    # First line is typically the song title
-                    song_title = lines[0].strip()
-                    
-                    # Second line typically starts with "by" for the artist
-                    artist_line = lines[1].strip()
-                    if artist_line.startswith("by "):
-                        artist = artist_line[3:].strip()
-                        
-                        # Store previous song if we have one
-                        if current_lyrics and current_song != song_title:
-                            results[current_song] = {
-                                "artist": current_artist,
-                                "lyrics": "\n".join(current_lyrics)
-                            }
-                            current_lyrics = []
-                        
-                        # Update current song and artist
-                        current_song = song_title
-                        current_artist = artist
-                        
-                        # Get lyrics (everything after the second line)
-                        if len(lines) > 2:
-                            current_lyrics = lines[2:]
-            
-            # Store the last song
-            if current_lyrics:
-                results[current_song] = {
-                    "artist": current_artist,
-                    "lyrics": "\n".join(current_lyrics)
-                }
-            
-            return results
+        async for song, artist, lyrics in self.aiter_songs():
+            self.lyrics_by_song[song] = {
+                "artist": artist,
+                "lyrics": lyrics
+            }
         
-        # Run the extraction in a thread pool
-        self.lyrics_by_song = await self.loop.run_in_executor(None, extract_from_pdf)
         print(f"Extracted lyrics for {len(self.lyrics_by_song)} songs")
     
     async def _setup_processing_pool(self) -> None:
-        """Set up the process pool for multiprocessing"""
+        """Set up the process pool for multiprocessing and the thread pool for blocking I/O"""
         # Determine optimal number of workers (one per CPU core by default)
         cpu_count = multiprocessing.cpu_count()
         self.max_workers = max(1, cpu_count - 1)  # Leave one core free for system
@@ -151,61 +434,158 @@ class AsyncLyricsRAG:
         
         # Initialize the process pool executor
         self.process_pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        
+        # Blocking ingestion steps get their own threads instead of the loop's default pool
+        self.thread_pool = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="lyrics-ingest")
+        # Chroma's SQLite-backed lookup takes milliseconds, so it leaves the event loop;
+        # the in-memory FAISS and NumPy lookups stay on it
+        self._search_executor = self.thread_pool if self.vector_store == "chroma" else None
+    
+    async def _setup_reranker(self) -> None:
+        """Create the reranker and load its model in the process pool workers"""
+        self.reranker = FlashRankReranker(
+            executor=self.process_pool,
+            model_name=self.reranker_model,
+            top_n=self.rerank_top_n,
+            score_threshold=self.rerank_score_threshold,
+            batch_size=self.rerank_batch_size,
+            cache_size=self.rerank_cache_size
+        )
+        await asyncio.gather(*(
+            self.loop.run_in_executor(self.process_pool, warm_up, self.reranker_model)
+            for _ in range(self.max_workers)
+        ))
+        print(f"Loaded reranker {self.reranker_model}")
     
-    async def _create_vector_store(self) -> None:
-        """Create text chunks and embeddings for the lyrics"""
+    def _extraction_shard_count(self, page_count: int) -> int:
+        """Number of page shards to extract in parallel (1 means a serial pass)"""
+        if not self.parallel_extraction or not hasattr(self, 'process_pool'):
+            return 1
+        # Workers map a file on disk themselves; a PDF in memory would be pickled to every one of them
+        if not is_pdf_path(self.pdf_path):
+            return 1
+        
+        return max(1, min(self.max_workers, (page_count - 1) // self.min_pages_per_shard))
+    
+    async def _create_vector_store(self, songs: Optional[AsyncIterator[SongRecord]] = None) -> None:
+        """
+        Create text chunks and embeddings for the lyrics
+        
+        Args:
+            songs: Async stream of (song, artist, lyrics) records; defaults to
+                   the already extracted songs
+        """
         print("Creating vector store for lyrics...")
         
-        # Create a text splitter for chunking the lyrics
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        # Create the chunker that splits each song into tagged chunks
+        chunker = make_chunker(self.chunker, self.chunk_size, self.chunk_overlap)
+        
+        if songs is None:
+            songs = self._aiter_extracted_songs()
+        
+        # Embeddings are computed batch by batch as songs arrive, so parsing,
+        # chunking and embedding overlap instead of running phase by phase
+        await self.loop.run_in_executor(self.thread_pool, self.index.begin, self.embeddings)
+        self.lyrics_chunks = []
+        self.lyrics_metadatas = []
+        
+        # Repeated chunks are embedded once and remember every song they appear in
+        deduplicator = ChunkDeduplicator() if self.deduplicate_chunks else None
         
         # Prepare texts with metadata
         texts = []
         metadatas = []
         
-        # Process songs in parallel
-        async def process_song(song, data):
-            # Split lyrics into chunks
-            song_chunks = text_splitter.split_text(data["lyrics"])
-            song_metadata = [
-                {
-                    "song": song,
-                    "artist": data["artist"],
-                    "source": self.pdf_path
-                }
-                for _ in song_chunks
-            ]
-            return song_chunks, song_metadata
+        async for song, artist, lyrics in songs:
+            self.lyrics_by_song[song] = {
+                "artist": artist,
+                "lyrics": lyrics
+            }
+            
+            # Chunking is CPU-bound, so each song is split on the thread pool
+            song_texts, song_metadatas = await self.loop.run_in_executor(
+                self.thread_pool, self._split_song, chunker, deduplicator, song, artist, lyrics
+            )
+            texts.extend(song_texts)
+            metadatas.extend(song_metadatas)
+            
+            if len(texts) >= self.embedding_batch_size:
+                await self._index_chunks(texts, metadatas)
+                texts = []
+                metadatas = []
         
-        # Process all songs in parallel
-        tasks = [
-            process_song(song, data) 
-            for song, data in self.lyrics_by_song.items()
-        ]
-        results = await asyncio.gather(*tasks)
-        
-        # Combine results
-        for chunks, metadata in results:
-            texts.extend(chunks)
-            metadatas.extend(metadata)
-        
-        self.lyrics_chunks = texts
-        
-        # Create embeddings and vector store (runs in thread pool automatically)
-        def create_store():
-            embeddings = OpenAIEmbeddings()
-            return Chroma.from_texts(
-                texts=texts,
-                embedding=embeddings,
-                metadatas=metadatas
+        if texts:
+            await self._index_chunks(texts, metadatas)
+        
+        if deduplicator:
+            # Attach the full source list to chunks that were repeated after being indexed
+            ids, documents = await self.loop.run_in_executor(
+                self.thread_pool, deduplicator.merge_sources, self.lyrics_chunks, self.lyrics_metadatas
             )
+            if ids:
+                await self.loop.run_in_executor(self.thread_pool, self.index.update, ids, documents)
+            print(f"Collapsed {deduplicator.duplicates} duplicate chunks into {len(ids)} shared entries")
         
-        self.vectorstore = await self.loop.run_in_executor(None, create_store)
-        print(f"Created vector store with {len(texts)} chunks")
+        await self._finish_index()
+        print(f"Created vector store with {len(self.lyrics_chunks)} chunks from {len(self.lyrics_by_song)} songs")
+        
+        if self.embedding_cache:
+            stats = self.embedding_cache.stats()
+            print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses")
+    
+    def _split_song(self, chunker, deduplicator: Optional[ChunkDeduplicator], song: str, artist: str,
+                    lyrics: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Split one song into chunks with their metadata
+        
+        Args:
+            chunker: Chunker from make_chunker
+            deduplicator: Collapses chunks already seen in other songs (None keeps them all)
+            song: Song title
+            artist: Song artist
+            lyrics: Song lyrics
+            
+        Returns:
+            (texts, metadatas) of the chunks still to be indexed
+        """
+        texts = []
+        metadatas = []
+        for chunk in chunker.split_song(lyrics):
+            metadata = {
+                "song": song,
+                "artist": artist,
+                "source": self.pdf_name,
+                "section": chunk.section,
+                "chunk_index": chunk.index
+            }
+            
+            if deduplicator:
+                key = deduplicator.add(chunk.text, metadata)
+                if key is None:
+                    continue
+                metadata["chunk_id"] = key
+            
+            texts.append(chunk.text)
+            metadatas.append(metadata)
+        return texts, metadatas
+    
+    async def _aiter_extracted_songs(self) -> AsyncIterator[SongRecord]:
+        """Replay the already extracted songs as a stream"""
+        for song, data in list(self.lyrics_by_song.items()):
+            yield song, data["artist"], data["lyrics"]
+    
+    async def _index_chunks(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Embed a batch of chunks and add it to the vector store"""
+        ids = chunk_ids(metadatas, len(self.lyrics_chunks))
+        await self.loop.run_in_executor(self.thread_pool, self.index.add, texts, metadatas, ids)
+        self.lyrics_chunks.extend(texts)
+        self.lyrics_metadatas.extend(metadatas)
+    
+    async def _finish_index(self) -> None:
+        """Complete the index build and keep the resulting vector store"""
+        self.vectorstore = await self.loop.run_in_executor(self.thread_pool, partial(
+            self.index.finish, self.lyrics_by_song, self.lyrics_chunks, self.lyrics_metadatas
+        ))
     
     async def _setup_rag_chains(self) -> None:
         """Set up the RAG chains for lyric generation"""
@@ -227,35 +607,41 @@ class AsyncLyricsRAG:
             input_variables=["context", "question"]
         )
         
-        # Set up the basic QA chain (wrapped in executor to avoid blocking)
-        def setup_qa_chain():
-            return RetrievalQA.from_chain_type(
-                llm=ChatOpenAI(
-                    temperature=self.temperature, 
-                    model=self.model_name, 
-                    max_tokens=512
-                ),
-                chain_type="stuff",
-                retriever=self.vectorstore.as_retriever(search_kwargs={"k": 5}),
-                chain_type_kwargs={"prompt": lyric_prompt}
-            )
+        # Kept so variations can be generated from one retrieval without the chain
+        self.lyric_prompt = lyric_prompt
         
-        self.qa_chain = await self.loop.run_in_executor(None, setup_qa_chain)
+        # Set up the basic QA chain (building it does no I/O, so it stays on the loop)
+        # The scheduler retries, so 429s reach it instead of the client's own retry loop
+        self.lyric_llm = ChatOpenAI(
+            temperature=self.temperature, 
+            model=self.model_name, 
+            max_tokens=512,
+            max_retries=0
+        )
+        self.qa_chain = RetrievalQA.from_chain_type(
+            llm=self.lyric_llm,
+            chain_type="stuff",
+            retriever=self._make_retriever(),
+            chain_type_kwargs={"prompt": lyric_prompt}
+        )
         
         # Set up the conversational chain with memory
-        def setup_conversation_chain():
-            memory = ConversationBufferMemory(
-                memory_key="chat_history",
-                return_messages=True
-            )
-            
-            return ConversationalRetrievalChain.from_llm(
-                llm=ChatOpenAI(temperature=self.temperature, model=self.model_name),
-                retriever=self.vectorstore.as_retriever(search_kwargs={"k": 5}),
-                memory=memory
+        memory = make_chat_memory(
+            self.chat_memory,
+            llm=ChatOpenAI(temperature=0, model=self.model_name, max_tokens=self.chat_summary_tokens, max_retries=0),
+            model_name=self.model_name,
+            max_tokens=self.chat_memory_tokens,
+            summary_tokens=self.chat_summary_tokens,
+            summary_runner=lambda call: self.scheduler.run(
+                call, tokens=self.chat_memory_tokens + self.chat_summary_tokens, name="chat_summary"
             )
+        )
         
-        self.conversation_chain = await self.loop.run_in_executor(None, setup_conversation_chain)
+        self.conversation_chain = ConversationalRetrievalChain.from_llm(
+            llm=ChatOpenAI(temperature=self.temperature, model=self.model_name, max_retries=0),
+            retriever=self._make_retriever(),
+            memory=memory
+        )
         
         print("RAG pipelines set up successfully")
     
@@ -270,42 +656,112 @@ class AsyncLyricsRAG:
         Returns:
             Generated lyrics
         """
-        def invoke_chain():
-            return self.qa_chain.invoke({"query": prompt})
+        if self.response_cache is None:
+            result = await self.scheduler.run(
+                lambda: self.qa_chain.ainvoke({"query": prompt}),
+                tokens=self._estimate_tokens(prompt),
+                name="generate_lyrics"
+            )
+            return result["result"]
         
-        result = await self.loop.run_in_executor(None, invoke_chain)
-        return result["result"]
+        docs = await self.qa_chain.retriever.ainvoke(prompt)
+        return await self._cached_answer("lyrics", prompt, docs, self.qa_chain.combine_documents_chain,
+                                         name="generate_lyrics")
     
-    async def generate_multiple_lyrics(self, prompt: str, variations: int = 3) -> List[str]:
+    async def generate_multiple_lyrics(self, prompt: str, variations: int = 3,
+                                       shared_context: bool = True, use_n: bool = True) -> List[str]:
         """
         Generate multiple variations of lyrics based on the same prompt
         
+        With shared_context the prompt is embedded and the context retrieved
+        once for all variations. The completions are then requested in a single
+        call with the provider's n parameter, or concurrently from the same
+        context for any the provider did not return.
+        
         Args:
             prompt: Instructions for generating the lyrics
             variations: Number of different variations to generate
+            shared_context: Retrieve once for all variations instead of once per variation
+            use_n: Ask for all completions in one request with the n parameter
             
         Returns:
             List of generated lyrics
         """
         print(f"Generating {variations} different lyric variations...")
         
-        # Create a list of prompts with variation instructions
-        prompts = [
-            f"{prompt} (Variation {i+1})" for i in range(variations)
-        ]
+        if not shared_context:
+            # Create a list of prompts with variation instructions
+            prompts = [
+                f"{prompt} (Variation {i+1})" for i in range(variations)
+            ]
+            
+            # Generate all variations in parallel
+            tasks = [self.generate_lyrics(p) for p in prompts]
+            return await asyncio.gather(*tasks)
         
-        # Generate all variations in parallel
-        tasks = [self.generate_lyrics(p) for p in prompts]
-        results = await asyncio.gather(*tasks)
+        context = await self._retrieve_context(prompt)
         
+        results = []
+        if use_n and variations > 1:
+            messages = self.lyric_prompt.format_prompt(context=context, question=prompt).to_messages()
+            response = await self.scheduler.run(
+                lambda: self.lyric_llm.agenerate([messages], n=variations),
+                tokens=self._estimate_tokens(prompt, context, completions=variations),
+                name="generate_variations"
+            )
+            results = [generation.text for generation in response.generations[0]][:variations]
+        
+        # Providers without n return a single completion; the rest are requested concurrently
+        missing = range(len(results), variations)
+        tasks = [
+            self._generate_from_context(context, f"{prompt} (Variation {i+1})" if variations > 1 else prompt)
+            for i in missing
+        ]
+        results.extend(await asyncio.gather(*tasks))
         return results
     
-    async def generate_song_components(self, base_prompt: str) -> Dict[str, str]:
+    async def _retrieve_context(self, query: str) -> str:
+        """Retrieve the chunks for a query and join them as the "stuff" chain does"""
+        docs = await self.qa_chain.retriever.ainvoke(query)
+        return "\n\n".join(doc.page_content for doc in docs)
+    
+    async def _generate_from_context(self, context: str, prompt: str) -> str:
+        """Generate lyrics for the prompt from context that was already retrieved"""
+        messages = self.lyric_prompt.format_prompt(context=context, question=prompt).to_messages()
+        response = await self.scheduler.run(
+            lambda: self.lyric_llm.ainvoke(messages),
+            tokens=self._estimate_tokens(prompt, context),
+            name="generate_from_context"
+        )
+        return response.content
+    
+    def _estimate_tokens(self, prompt: str, context: Optional[str] = None, completions: int = 1) -> int:
+        """
+        Rough token count of a generation for the token rate limit
+        
+        About four characters per token; without the context at hand, five
+        full chunks are assumed. Each completion may use the 512 max tokens.
+        """
+        context_chars = len(context) if context is not None else 5 * self.chunk_size
+        return (len(prompt) + context_chars) // 4 + 512 * completions
+    
+    async def generate_song_components(self, base_prompt: str, chorus_first: bool = False,
+                                       timings: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, str]:
         """
         Generate different components of a song in parallel
         
+        The context is retrieved once and shared by every section. Sections
+        are scheduled as a small dependency graph: by default all of them run
+        concurrently, with chorus_first the chorus is written first and given
+        to the verses and bridge so the song hangs together. The timing of
+        each section is kept in self.section_timings and printed, unless the
+        caller passes its own timings dict, as concurrent calls must.
+        
         Args:
             base_prompt: Base prompt for the song generation
+            chorus_first: Write the chorus first and build the other sections on it
+            timings: Dict that receives this call's section timings instead of
+                     self.section_timings, without printing them
             
         Returns:
             Dictionary with different song components
@@ -317,18 +773,30 @@ class AsyncLyricsRAG:
             "verse2": f"{base_prompt} Write a second verse that develops the story.",
             "bridge": f"{base_prompt} Write a bridge that provides contrast and builds to the final chorus."
         }
+        dependencies = {
+            component: ("chorus",) for component in components if component != "chorus"
+        } if chorus_first else {}
         
-        # Generate all components in parallel
-        tasks = {
-            component: self.generate_lyrics(prompt)
-            for component, prompt in components.items()
-        }
+        context = await self._retrieve_context(base_prompt)
+        
+        def section_task(prompt):
+            async def generate(done: Dict[str, str]) -> str:
+                if "chorus" in done:
+                    prompt_with_chorus = f"{prompt}\nIt has to lead into this chorus:\n{done['chorus']}"
+                    return await self._generate_from_context(context, prompt_with_chorus)
+                return await self._generate_from_context(context, prompt)
+            return generate
+        
+        results, section_timings = await run_dag(
+            {component: section_task(prompt) for component, prompt in components.items()},
+            dependencies
+        )
+        if timings is not None:
+            timings.update(section_timings)
+        else:
+            self.section_timings = section_timings
+            print(f"Song sections generated:\n{format_timings(self.section_timings)}")
         
-        # Wait for all tasks to complete
-        results = {}
-        for component, task in tasks.items():
-            results[component] = await task
-            
         return results
     
     async def chat(self, message: str) -> str:
@@ -341,37 +809,188 @@ class AsyncLyricsRAG:
         Returns:
             Response from the model
         """
-        def invoke_chain():
-            return self.conversation_chain.invoke({"question": message})
+        # Each model call is scheduled on its own; the memory is saved outside any
+        # scheduled call, so a summary memory's summary call can take its own slot
+        chain = self.conversation_chain
+        question = await self._condense_question(chain, message)
+        docs = await chain.retriever.ainvoke(question)
+        if self.response_cache is None:
+            llm = chain.combine_docs_chain.llm_chain.llm
+            messages = stuff_messages(chain.combine_docs_chain, docs, question)
+            response = await self.scheduler.run(
+                lambda: llm.ainvoke(messages), tokens=self._estimate_tokens(question), name="chat"
+            )
+            answer = response.content
+        else:
+            # The answer only depends on the standalone question and its chunks, not on the history
+            answer = await self._cached_answer("chat", question, docs, chain.combine_docs_chain, name="chat")
+        await aremember_exchange(chain, message, answer)
+        return answer
+    
+    async def _condense_question(self, chain, message: str) -> str:
+        """Standalone question of a chat message; only follow-ups cost a scheduled model call"""
+        if not has_chat_history(chain):
+            return message
+        return await self.scheduler.run(
+            lambda: acondense_question(chain, message), tokens=self._estimate_tokens(message), name="condense_question"
+        )
+    
+    async def _cached_answer(self, kind: str, question: str, docs, chain, name: str) -> str:
+        """Run a "stuff" chain's LLM on retrieved documents unless the response cache has the answer"""
+        llm = chain.llm_chain.llm
+        answer, key = await self.response_cache.alookup(kind, question, docs, llm)
+        if answer is None:
+            messages = stuff_messages(chain, docs, question)
+            response = await self.scheduler.run(
+                lambda: llm.ainvoke(messages), tokens=self._estimate_tokens(question), name=name
+            )
+            answer = response.content
+            self.response_cache.store(key, answer)
+        return answer
+    
+    async def stream_lyrics(self, prompt: str, use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        Generate lyrics like generate_lyrics, yielding tokens as they arrive
+        
+        Retrieval happens before the first token; its duration, the time to
+        first token and the total time are kept in self.last_stream_stats.
+        
+        Args:
+            prompt: Instructions for generating the lyrics
+            use_cache: Answer from the response cache if it has this prompt;
+                       False always asks the model and caches the new lyrics
+        
+        Yields:
+            Pieces of the generated lyrics
+        """
+        started = time.perf_counter()
+        self.last_stream_stats = stats = new_stream_stats()
+        
+        docs = await self.qa_chain.retriever.ainvoke(prompt)
+        chain = self.qa_chain.combine_documents_chain
+        messages = stuff_messages(chain, docs, prompt)
+        stats["retrieval_ms"] = (time.perf_counter() - started) * 1000
+        
+        if self.response_cache is not None:
+            cached, key = await self.response_cache.alookup(
+                "lyrics", prompt, docs, chain.llm_chain.llm, refresh=not use_cache
+            )
+            if cached is not None:
+                for token in cached_tokens(cached, stats, started):
+                    yield token
+                return
+        
+        lyrics = []
+        async with self.scheduler.slot(tokens=self._estimate_tokens(prompt), name="stream_lyrics"):
+            async for token in atimed_tokens(chain.llm_chain.llm.astream(messages), stats, started):
+                lyrics.append(token)
+                yield token
+        if self.response_cache is not None:
+            self.response_cache.store(key, "".join(lyrics))
+    
+    async def stream_chat(self, message: str) -> AsyncIterator[str]:
+        """
+        Chat like chat(), yielding the answer tokens as they arrive
         
-        result = await self.loop.run_in_executor(None, invoke_chain)
-        return result["answer"]
+        The exchange is added to the conversation memory once the answer is
+        complete; timings are kept in self.last_stream_stats.
+        
+        Args:
+            message: User message about lyrics
+        
+        Yields:
+            Pieces of the response
+        """
+        started = time.perf_counter()
+        self.last_stream_stats = stats = new_stream_stats()
+        
+        chain = self.conversation_chain
+        question = await self._condense_question(chain, message)
+        docs = await chain.retriever.ainvoke(question)
+        messages = stuff_messages(chain.combine_docs_chain, docs, question)
+        stats["retrieval_ms"] = (time.perf_counter() - started) * 1000
+        
+        if self.response_cache is not None:
+            cached, key = await self.response_cache.alookup("chat", question, docs, chain.combine_docs_chain.llm_chain.llm)
+            if cached is not None:
+                for token in cached_tokens(cached, stats, started):
+                    yield token
+                await aremember_exchange(chain, message, cached)
+                return
+        
+        answer = []
+        async with self.scheduler.slot(tokens=self._estimate_tokens(question), name="stream_chat"):
+            async for token in atimed_tokens(chain.combine_docs_chain.llm_chain.llm.astream(messages), stats, started):
+                answer.append(token)
+                yield token
+        await aremember_exchange(chain, message, "".join(answer))
+        if self.response_cache is not None:
+            self.response_cache.store(key, "".join(answer))
     
-    async def search_lyrics(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+    async def search_lyrics(self, query: str, k: int = 3, search_type: str = "Semantic") -> List[Dict[str, Any]]:
         """
-        Search for lyrics similar to the query
+        Search for lyrics matching the query
         
         Args:
             query: Search query
             k: Number of results to return
+            search_type: "Semantic" for vector similarity, "Keyword" for BM25
+                         over chunk words and song titles (no embedding call),
+                         "Combined" to fuse both rankings by reciprocal rank
             
         Returns:
             List of matching lyrics with metadata
         """
-        def do_search():
-            results = self.vectorstore.similarity_search(query, k=k)
-            formatted_results = []
+        search_type = search_type.lower()
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"Unknown search type: {search_type}. Expected one of {SEARCH_TYPES}")
+        
+        if search_type == "keyword":
+            # Sub-millisecond and embedding-free, so no need to leave the event loop
+            return self._format_results(self.keyword_index.search(query, k=k))
+        
+        if search_type == "combined":
+            # Fuse deeper candidate lists so chunks ranked well by both retrievers surface
+            fetch_k = max(4 * k, 20)
+            vector_results = await asimilarity_search(self.vectorstore, query, k=fetch_k, executor=self._search_executor)
+            results = reciprocal_rank_fusion([vector_results, self.keyword_index.search(query, k=fetch_k)], k=k)
+        else:
+            results = await asimilarity_search(self.vectorstore, query, k=k, executor=self._search_executor)
+        return self._format_results(results)
+    
+    async def search_lyrics_batch(self, queries: List[str], k: int = 3) -> List[List[Dict[str, Any]]]:
+        """
+        Search for lyrics similar to each of several queries
+        
+        The NumPy index answers the whole batch with one matrix multiply;
+        other vector stores are queried concurrently.
+        
+        Args:
+            queries: Search queries
+            k: Number of results per query
             
-            for doc in results:
-                formatted_results.append({
-                    "content": doc.page_content,
-                    "song": doc.metadata.get("song", "Unknown"),
-                    "artist": doc.metadata.get("artist", "Unknown")
-                })
-                
-            return formatted_results
+        Returns:
+            One list of matching lyrics per query
+        """
+        if hasattr(self.vectorstore, "abatch_similarity_search"):
+            batches = await self.vectorstore.abatch_similarity_search(queries, k=k)
+            return [self._format_results(results) for results in batches]
         
-        return await self.loop.run_in_executor(None, do_search)
+        return list(await asyncio.gather(*(self.search_lyrics(query, k) for query in queries)))
+    
+    def _format_results(self, results) -> List[Dict[str, Any]]:
+        """Turn retrieved documents into search results with their metadata"""
+        formatted_results = []
+        
+        for doc in results:
+            formatted_results.append({
+                "content": doc.page_content,
+                "song": doc.metadata.get("song", "Unknown"),
+                "artist": doc.metadata.get("artist", "Unknown"),
+                "sources": chunk_sources(doc.metadata)
+            })
+            
+        return formatted_results
     
     def list_songs(self) -> List[Dict[str, str]]:
         """
@@ -385,17 +1004,81 @@ class AsyncLyricsRAG:
             for song, data in self.lyrics_by_song.items()
         ]
     
+    def _make_retriever(self):
+        """Retriever of the RAG chains: top 5 vectors, or over-fetch and rerank"""
+        if self.reranker is None:
+            return AsyncVectorRetriever(vectorstore=self.vectorstore, k=5, executor=self._search_executor)
+        return RerankingRetriever(
+            vectorstore=self.vectorstore,
+            reranker=self.reranker,
+            fetch_k=self.rerank_fetch_k,
+            executor=self._search_executor
+        )
+    
+    def call_stats(self) -> Dict[str, Any]:
+        """
+        Statistics of the outbound model calls
+        
+        Returns:
+            Dict with call, retry and rate-limit counts, the current concurrency
+            window, p50/p95 latency, queueing time and throughput
+        """
+        return self.scheduler.stats()
+    
+    def rerank_stats(self) -> Dict[str, Any]:
+        """
+        Latency added by reranking and reranker score cache counters
+        
+        Returns:
+            Dict with p50/p95/mean added milliseconds per query and cache hit rate,
+            empty if reranking is disabled
+        """
+        return self.reranker.stats() if self.reranker else {}
+    
+    def response_cache_stats(self) -> Dict[str, Any]:
+        """
+        Response cache hit rate and size
+        
+        Returns:
+            Dict with exact and similarity hits, misses, hit_rate, entries and
+            evictions, empty if the response cache is disabled
+        """
+        return self.response_cache.stats() if self.response_cache else {}
+    
+    def query_cache_stats(self) -> Dict[str, Any]:
+        """
+        Query embedding cache counters
+        
+        Returns:
+            Dict with hits, misses, coalesced lookups, hit_rate and entries,
+            empty if the query cache is disabled
+        """
+        return self.query_embedding_cache.stats() if self.query_embedding_cache else {}
+    
     async def close(self):
         """Clean up resources"""
         if hasattr(self, 'process_pool'):
             self.process_pool.shutdown()
+        if hasattr(self, 'thread_pool'):
+            self.thread_pool.shutdown()
+        if self.embedding_cache:
+            self.embedding_cache.close()
         print("Resources cleaned up")
 
 
 async def process_batch_generation(lyrics_rag, prompts):
-    """Process a batch of generation prompts"""
+    """
+    Process a batch of generation prompts
+    
+    The engine's call scheduler paces the batch, so any number of prompts can
+    be submitted at once. A prompt that still fails after its retries maps to
+    its exception instead of failing the whole batch.
+    """
     tasks = [lyrics_rag.generate_lyrics(prompt) for prompt in prompts]
-    results = await asyncio.gather(*tasks)
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    failed = sum(isinstance(result, Exception) for result in results)
+    if failed:
+        print(f"{failed} of {len(prompts)} generations failed")
     return {prompt: result for prompt, result in zip(prompts, results)}
 
 
@@ -417,7 +1100,7 @@ async def main_async():
     
     try:
         # Initialize the RAG system
-        lyrics_rag = AsyncLyricsRAG(pdf_path, openai_api_key=api_key)
+        lyrics_rag = AsyncLyricsRAG(pdf_path, openai_api_key=api_key, persist_directory=DEFAULT_PERSIST_DIRECTORY)
         await lyrics_rag.initialize()
         
         print("\nInteractive Lyrics Generator")
@@ -0,0 +1,79 @@
+import time
+import asyncio
+from graphlib import TopologicalSorter
+from typing import Dict, Any, Callable, Awaitable, Sequence, Optional, Tuple
+
+
+# A section task receives the results of the sections it depends on
+SectionTask = Callable[[Dict[str, str]], Awaitable[str]]
+
+
+async def run_dag(tasks: Dict[str, SectionTask],
+                  dependencies: Optional[Dict[str, Sequence[str]]] = None
+                  ) -> Tuple[Dict[str, str], Dict[str, Dict[str, float]]]:
+    """
+    Run song section tasks as soon as the sections they depend on are done
+
+    Sections without pending dependencies run concurrently; a section whose
+    dependencies are all finished starts right away instead of waiting for
+    the rest of its wave. If a task fails, the others are cancelled and the
+    error is raised.
+
+    Args:
+        tasks: Coroutine function of each section, called with the results
+               of its dependencies
+        dependencies: Sections each section has to wait for (None runs all
+                      sections concurrently)
+
+    Returns:
+        (results, timings) where timings holds the start_ms offset and
+        duration_ms of every section
+    """
+    dependencies = dependencies or {}
+    for name, needs in dependencies.items():
+        unknown = [need for need in [name, *needs] if need not in tasks]
+        if unknown:
+            raise ValueError(f"Unknown song sections in dependencies: {', '.join(unknown)}")
+
+    sorter = TopologicalSorter({name: dependencies.get(name, ()) for name in tasks})
+    sorter.prepare()  # raises graphlib.CycleError
+
+    results: Dict[str, str] = {}
+    timings: Dict[str, Dict[str, float]] = {}
+    started = time.perf_counter()
+
+    async def run(name: str) -> str:
+        start = time.perf_counter()
+        inputs = {need: results[need] for need in dependencies.get(name, ())}
+        result = await tasks[name](inputs)
+        timings[name] = {
+            "start_ms": (start - started) * 1000,
+            "duration_ms": (time.perf_counter() - start) * 1000
+        }
+        return result
+
+    running: Dict[asyncio.Task, str] = {}
+    try:
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                running[asyncio.ensure_future(run(name))] = name
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                results[name] = task.result()
+                sorter.done(name)
+    finally:
+        for task in running:
+            task.cancel()
+
+    return {name: results[name] for name in tasks}, timings
+
+
+def format_timings(timings: Dict[str, Dict[str, Any]]) -> str:
+    """One line per section with its start offset and duration, in start order"""
+    order = sorted(timings, key=lambda name: timings[name]["start_ms"])
+    return "\n".join(
+        f"{name:<10} start {timings[name]['start_ms']:>8.0f} ms   took {timings[name]['duration_ms']:>8.0f} ms"
+        for name in order
+    )
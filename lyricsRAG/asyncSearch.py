@@ -0,0 +1,61 @@
+import asyncio
+from functools import partial
+from concurrent.futures import Executor
+from typing import List, Optional
+
+from pydantic import ConfigDict
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from langchain_core.callbacks import (
+    CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+)
+
+
+async def asimilarity_search(vectorstore: VectorStore, query: str, k: int = 4,
+                             executor: Optional[Executor] = None, **kwargs) -> List[Document]:
+    """
+    Vector search that awaits the embedding API instead of a worker thread
+
+    The async search of LangChain's VectorStore base class, which Chroma and
+    FAISS inherit, runs the whole sync search on the default thread pool.
+    Only the query embedding does network I/O, so it goes through the
+    embeddings' native aembed_query. The nearest-neighbour lookup runs on
+    the event loop, or on executor when one is given, for stores whose
+    lookup blocks long enough to stall other coroutines (Chroma's goes
+    through SQLite).
+
+    Args:
+        vectorstore: Store to search
+        query: Search query
+        k: Number of results
+        executor: Executor for the lookup (None runs it on the event loop)
+        **kwargs: Passed to similarity_search_by_vector (e.g. filter)
+
+    Returns:
+        The k closest documents, best match first
+    """
+    embedding = await vectorstore.embeddings.aembed_query(query)
+    if executor is None:
+        return vectorstore.similarity_search_by_vector(embedding, k=k, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, partial(vectorstore.similarity_search_by_vector, embedding, k=k, **kwargs)
+    )
+
+
+class AsyncVectorRetriever(BaseRetriever):
+    """Top-k vector retriever whose async path is native (see asimilarity_search)"""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: VectorStore
+    k: int = 5
+    executor: Optional[Executor] = None
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.vectorstore.similarity_search(query, k=self.k)
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return await asimilarity_search(self.vectorstore, query, k=self.k, executor=self.executor)
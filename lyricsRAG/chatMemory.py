@@ -0,0 +1,144 @@
+from functools import lru_cache
+from typing import Awaitable, Callable, List, Optional
+
+import tiktoken
+from langchain_core.messages import BaseMessage
+from langchain_core.language_models import BaseLanguageModel
+from langchain.memory import ConversationBufferMemory, ConversationSummaryBufferMemory
+
+# Tokens OpenAI's chat format adds around every message
+_MESSAGE_OVERHEAD = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model_name: str) -> Optional[tiktoken.Encoding]:
+    """Tokenizer of a model, loaded once per process (None if it cannot be downloaded)"""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Could not load the tiktoken encoding ({e}), counting about four characters per token")
+        return None
+
+
+def count_tokens(text: str, model_name: str = "gpt-4o-mini") -> int:
+    """Number of tokens of a text for the model's tokenizer"""
+    encoding = _encoding(model_name)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model_name: str = "gpt-4o-mini") -> str:
+    """Cut a text down to its first max_tokens tokens"""
+    encoding = _encoding(model_name)
+    if encoding is None:
+        return text[:4 * max_tokens]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+class TokenBudgetMemory(ConversationSummaryBufferMemory):
+    """
+    Conversation memory that never exceeds a token budget
+
+    The most recent turns are kept verbatim; whenever they outgrow the
+    budget, the oldest whole turns are folded into a running summary with
+    one summarization call. The summary is capped at summary_token_limit
+    tokens and counts against the budget, so the history sent to the
+    condense-question step stays at most max_token_limit tokens however
+    long the session runs. Tokens are counted with the model's tiktoken
+    encoder, loaded once.
+    """
+
+    model_name: str = "gpt-4o-mini"
+    summary_token_limit: int = 256
+    # Runs the async summary call, e.g. under an engine's call scheduler (None calls it directly)
+    summary_runner: Optional[Callable[[Callable[[], Awaitable[str]]], Awaitable[str]]] = None
+
+    def _tokens(self, messages: List[BaseMessage]) -> int:
+        return sum(count_tokens(message.content, self.model_name) + _MESSAGE_OVERHEAD for message in messages)
+
+    def _pop_overflow(self) -> List[BaseMessage]:
+        """Remove and return the oldest turns that do not fit next to the summary"""
+        buffer = self.chat_memory.messages
+        sizes = [count_tokens(message.content, self.model_name) + _MESSAGE_OVERHEAD for message in buffer]
+        total = sum(sizes)
+        if self.moving_summary_buffer:
+            total += count_tokens(self.moving_summary_buffer, self.model_name) + _MESSAGE_OVERHEAD
+        if total <= self.max_token_limit:
+            return []
+
+        # Make room for the new summary at its largest
+        total = sum(sizes)
+        budget = self.max_token_limit - self.summary_token_limit - _MESSAGE_OVERHEAD
+        pruned = []
+        # Whole turns (question and answer) are pruned together
+        while buffer and total > budget:
+            for _ in range(min(2, len(buffer))):
+                pruned.append(buffer.pop(0))
+                total -= sizes.pop(0)
+        return pruned
+
+    def _bounded(self, summary: str) -> str:
+        return truncate_tokens(summary.strip(), self.summary_token_limit, self.model_name)
+
+    def prune(self) -> None:
+        """Fold the turns over budget into the summary"""
+        pruned = self._pop_overflow()
+        if pruned:
+            self.moving_summary_buffer = self._bounded(self.predict_new_summary(pruned, self.moving_summary_buffer))
+
+    async def aprune(self) -> None:
+        """Async version of prune, making the summary call through summary_runner"""
+        pruned = self._pop_overflow()
+        if pruned:
+            previous = self.moving_summary_buffer
+
+            def summarize():
+                return self.apredict_new_summary(pruned, previous)
+
+            summary = await (self.summary_runner(summarize) if self.summary_runner else summarize())
+            self.moving_summary_buffer = self._bounded(summary)
+
+    def history_tokens(self) -> int:
+        """Tokens of the history the next turn will send, summary included"""
+        return self._tokens(self.load_memory_variables({})[self.memory_key])
+
+
+def make_chat_memory(kind: str, llm: BaseLanguageModel, model_name: str = "gpt-4o-mini",
+                     max_tokens: int = 2000, summary_tokens: int = 256,
+                     summary_runner: Optional[Callable[[Callable[[], Awaitable[str]]], Awaitable[str]]] = None):
+    """
+    Memory of the conversational chain
+
+    Args:
+        kind: "buffer" keeps every turn, "summary" keeps recent turns plus a
+              running summary within max_tokens
+        llm: Model that writes the summary (unused by "buffer")
+        model_name: Model whose tokenizer counts the budget
+        max_tokens: Token budget of the whole history, summary included
+        summary_tokens: Largest size of the running summary
+        summary_runner: Runs the async summary call (e.g. under a CallScheduler);
+                        the sync path calls the model directly
+
+    Returns:
+        Chat memory exposing the history as messages under "chat_history"
+    """
+    if kind == "buffer":
+        return ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    if kind == "summary":
+        if summary_tokens >= max_tokens:
+            raise ValueError("summary_tokens must be smaller than max_tokens")
+        return TokenBudgetMemory(
+            llm=llm,
+            model_name=model_name,
+            max_token_limit=max_tokens,
+            summary_token_limit=summary_tokens,
+            summary_runner=summary_runner,
+            memory_key="chat_history",
+            return_messages=True
+        )
+    raise ValueError(f"Unknown chat memory: {kind}. Expected 'buffer' or 'summary'")
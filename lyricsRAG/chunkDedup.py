@@ -0,0 +1,102 @@
+import json
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+def normalize_chunk(text: str) -> str:
+    """Collapse runs of whitespace so re-wrapped repeats of a line compare equal"""
+    return " ".join(text.split())
+
+
+def chunk_id(text: str) -> str:
+    """Stable id of a chunk, shared by all of its whitespace-normalized duplicates"""
+    return hashlib.sha1(normalize_chunk(text).encode("utf-8")).hexdigest()
+
+
+def chunk_sources(metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Every place a chunk appears in the corpus
+
+    Args:
+        metadata: Metadata of an indexed chunk
+
+    Returns:
+        List of {"song", "artist", "position"} dicts, first occurrence first
+    """
+    if "sources" in metadata:
+        return json.loads(metadata["sources"])
+    return [{
+        "song": metadata.get("song", "Unknown"),
+        "artist": metadata.get("artist", "Unknown"),
+        "position": metadata.get("chunk_index", 0)
+    }]
+
+
+class ChunkDeduplicator:
+    """
+    Collapses repeated chunks (choruses, hooks) into a single indexed entry
+
+    The first occurrence of a chunk is indexed under its chunk id; later
+    exact or whitespace-only duplicates are only recorded as extra sources.
+    """
+
+    def __init__(self):
+        self.sources = {}
+        self.duplicates = 0
+
+    def add(self, text: str, metadata: Dict[str, Any]) -> Optional[str]:
+        """
+        Register one occurrence of a chunk
+
+        Args:
+            text: Chunk text
+            metadata: Chunk metadata with song, artist and chunk_index
+
+        Returns:
+            The chunk id if this is the first occurrence, None for a duplicate
+        """
+        key = chunk_id(text)
+        source = {
+            "song": metadata["song"],
+            "artist": metadata["artist"],
+            "position": metadata["chunk_index"]
+        }
+
+        if key in self.sources:
+            self.sources[key].append(source)
+            self.duplicates += 1
+            return None
+
+        self.sources[key] = [source]
+        return key
+
+    def merge_sources(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> Tuple[List[str], List[Document]]:
+        """
+        Write the source list of every repeated chunk into its metadata
+
+        Vector store metadata only holds scalar values, so the list is stored
+        as a JSON string under "sources" next to an "occurrences" count.
+
+        Args:
+            texts: Indexed chunk texts
+            metadatas: Metadata of the indexed chunks, updated in place
+
+        Returns:
+            (ids, documents) of the chunks whose stored metadata must be updated
+        """
+        positions = {metadata["chunk_id"]: i for i, metadata in enumerate(metadatas) if "chunk_id" in metadata}
+        ids = []
+        documents = []
+
+        for key, sources in self.sources.items():
+            if len(sources) < 2 or key not in positions:
+                continue
+
+            i = positions[key]
+            metadatas[i] = dict(metadatas[i], sources=json.dumps(sources), occurrences=len(sources))
+            ids.append(key)
+            documents.append(Document(page_content=texts[i], metadata=metadatas[i]))
+
+        return ids, documents
@@ -0,0 +1,88 @@
+from typing import Dict, Any
+
+import numpy as np
+import pandas as pd
+
+# Per-song metric columns, after "song" and "artist"
+METRIC_COLUMNS = ("lines", "words", "unique_words", "unique_word_ratio", "repetition_ratio", "avg_line_words")
+
+# What counts as a word: letters, digits and inner apostrophes ("don't", "rock'n'roll")
+_WORD_PATTERN = r"[^\W_]+(?:'[^\W_]+)*"
+
+
+def song_metrics(lyrics_by_song: Dict[str, Dict[str, str]]) -> pd.DataFrame:
+    """
+    Lyrical metrics of every song, computed in one vectorized pass
+
+    Lyrics are exploded into one row per non-empty line and one row per
+    word, and every metric is a grouped count over those rows, so the cost
+    is a handful of pandas operations whatever the number of songs.
+
+    Args:
+        lyrics_by_song: Songs as stored by the engines, {song: {"artist", "lyrics"}}
+
+    Returns:
+        DataFrame with one row per song: song, artist, lines (non-empty),
+        words, unique_words, unique_word_ratio (unique / total words),
+        repetition_ratio (share of lines repeating an earlier line of the
+        song) and avg_line_words
+    """
+    songs = pd.DataFrame({
+        "song": list(lyrics_by_song),
+        "artist": [data["artist"] for data in lyrics_by_song.values()],
+        "lyrics": [data["lyrics"] for data in lyrics_by_song.values()]
+    })
+    if songs.empty:
+        return pd.DataFrame(columns=["song", "artist", *METRIC_COLUMNS])
+
+    # One row per non-empty line, normalized so a repeated chorus line matches itself
+    lines = songs["lyrics"].str.split("\n").explode()
+    lines = lines.str.strip().str.lower()
+    lines = lines[lines != ""]
+    line_count = lines.groupby(level=0).size()
+    distinct_lines = lines.groupby(level=0).nunique()
+
+    # One row per word
+    words = songs["lyrics"].str.lower().str.findall(_WORD_PATTERN).explode().dropna()
+    word_count = words.groupby(level=0).size()
+    unique_words = words.groupby(level=0).nunique()
+
+    metrics = pd.DataFrame({
+        "lines": line_count,
+        "words": word_count,
+        "unique_words": unique_words,
+        "distinct_lines": distinct_lines
+    }).reindex(songs.index).fillna(0).astype(np.int64)
+
+    lines_or_nan = metrics["lines"].replace(0, np.nan)
+    songs = songs.drop(columns="lyrics")
+    songs["lines"] = metrics["lines"]
+    songs["words"] = metrics["words"]
+    songs["unique_words"] = metrics["unique_words"]
+    songs["unique_word_ratio"] = (metrics["unique_words"] / metrics["words"].replace(0, np.nan)).fillna(0.0)
+    songs["repetition_ratio"] = (1 - metrics["distinct_lines"] / lines_or_nan).fillna(0.0)
+    songs["avg_line_words"] = (metrics["words"] / lines_or_nan).fillna(0.0)
+    return songs.reset_index(drop=True)
+
+
+def corpus_summary(metrics: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Corpus-wide figures of song_metrics' table
+
+    Returns:
+        Dict with songs, artists, total lines and words, and the mean lines,
+        words, unique-word ratio and repetition ratio per song
+    """
+    if metrics.empty:
+        return {"songs": 0, "artists": 0, "lines": 0, "words": 0, "avg_lines": 0.0,
+                "avg_words": 0.0, "avg_unique_word_ratio": 0.0, "avg_repetition_ratio": 0.0}
+    return {
+        "songs": len(metrics),
+        "artists": int(metrics["artist"].nunique()),
+        "lines": int(metrics["lines"].sum()),
+        "words": int(metrics["words"].sum()),
+        "avg_lines": float(metrics["lines"].mean()),
+        "avg_words": float(metrics["words"].mean()),
+        "avg_unique_word_ratio": float(metrics["unique_word_ratio"].mean()),
+        "avg_repetition_ratio": float(metrics["repetition_ratio"].mean())
+    }
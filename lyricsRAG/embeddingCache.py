@@ -0,0 +1,323 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+# Default location of the persistent embedding cache
+DEFAULT_EMBEDDING_CACHE_PATH = os.path.join(".lyrics_cache", "embeddings.sqlite3")
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH_SIZE = 500
+
+
+def text_sha256(text: str) -> str:
+    """Hash of a chunk text, used as its key in the embedding cache"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent store of embedding vectors keyed by (model, text hash)
+
+    Vectors are stored as raw float32 blobs in SQLite and decoded straight
+    into a NumPy matrix, never into Python lists. The store keeps at most
+    max_entries vectors and evicts the least recently used ones beyond that.
+    """
+
+    def __init__(self, path: str = DEFAULT_EMBEDDING_CACHE_PATH, max_entries: int = 500_000):
+        """
+        Args:
+            path: SQLite database file
+            max_entries: Maximum number of vectors kept before evicting
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: List[str]) -> Tuple[Optional[np.ndarray], List[int]]:
+        """
+        Look up the vectors of several texts at once
+
+        Args:
+            model: Embedding model name
+            texts: Texts to look up
+
+        Returns:
+            (matrix, missing): a float32 matrix with one row per text (rows of
+            missing texts are zero, None if nothing was found) and the
+            positions of the texts that are not cached
+        """
+        hashes = [text_sha256(text) for text in texts]
+        found = {}
+        now = time.time_ns()
+
+        with self._lock:
+            for start in range(0, len(hashes), _SQL_BATCH_SIZE):
+                batch = list(dict.fromkeys(hashes[start:start + _SQL_BATCH_SIZE]))
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found]
+                )
+                self._conn.commit()
+
+        missing = [i for i, text_hash in enumerate(hashes) if text_hash not in found]
+        self.hits += len(hashes) - len(missing)
+        self.misses += len(missing)
+
+        if not found:
+            return None, missing
+
+        dim = len(next(iter(found.values()))) // 4
+        matrix = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, text_hash in enumerate(hashes):
+            blob = found.get(text_hash)
+            if blob is not None:
+                matrix[i] = np.frombuffer(blob, dtype=np.float32)
+        return matrix, missing
+
+    def put_many(self, model: str, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Store the vectors of several texts
+
+        Args:
+            model: Embedding model name
+            texts: Texts that were embedded
+            vectors: Matrix with one row per text
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        now = time.time_ns()
+        rows = [
+            (model, text_sha256(text), vectors.shape[1], vector.tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop the least recently used vectors beyond max_entries (caller holds the lock)"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute("""
+                DELETE FROM embeddings WHERE (model, text_hash) IN (
+                    SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?
+                )
+            """, (excess,))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache counters
+
+        Returns:
+            Dict with hits, misses, hit_rate and the number of stored entries
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends uncached document texts to the model
+
+    Query embeddings are passed straight through to the wrapped model.
+    """
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache):
+        """
+        Args:
+            base: Embedding model to wrap
+            cache: Persistent vector store shared across runs
+        """
+        self.base = base
+        self.cache = cache
+
+    @property
+    def model(self) -> str:
+        """Name of the wrapped embedding model"""
+        return getattr(self.base, "model", type(self.base).__name__)
+
+    def embed_documents(self, texts: List[str]) -> List[np.ndarray]:
+        matrix, missing = self.cache.get_many(self.model, texts)
+
+        if missing:
+            # Embed each distinct missing text once
+            missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+            vectors = np.asarray(self.base.embed_documents(missing_texts), dtype=np.float32)
+            self.cache.put_many(self.model, missing_texts, vectors)
+
+            if matrix is None:
+                matrix = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+            rows = {text: vector for text, vector in zip(missing_texts, vectors)}
+            for i in missing:
+                matrix[i] = rows[texts[i]]
+
+        if matrix is None:
+            return []
+        return list(matrix)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.base.aembed_query(text)
+
+
+class QueryEmbeddingCache(Embeddings):
+    """
+    Embeddings wrapper that keeps the vectors of recent queries in an in-process LRU
+
+    Search, the QA chain, the conversational chain and the response cache
+    all embed their query through the same embeddings object, so one
+    interaction that touches several of them (or a repeated prompt) pays
+    for a single embedding round trip. Concurrent async lookups of a query
+    that is still being embedded on the same event loop wait for that one
+    request. Document embeddings are passed straight through.
+    """
+
+    def __init__(self, base: Embeddings, max_entries: int = 1024):
+        """
+        Args:
+            base: Embedding model to wrap
+            max_entries: Maximum number of query vectors kept before evicting
+                         the least recently used
+        """
+        self.base = base
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._vectors = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        """Name of the wrapped embedding model"""
+        return getattr(self.base, "model", type(self.base).__name__)
+
+    def _get(self, text: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._vectors.get(text)
+            if vector is not None:
+                self._vectors.move_to_end(text)
+                self.hits += 1
+                return list(vector)
+            return None
+
+    def _put(self, text: str, vector: List[float]) -> None:
+        with self._lock:
+            self._vectors[text] = vector
+            self._vectors.move_to_end(text)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._get(text)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+            vector = self.base.embed_query(text)
+            self._put(text, vector)
+        return list(vector)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self._get(text)
+        if vector is not None:
+            return vector
+
+        # A task can only be awaited on its own event loop, so requests are shared per loop
+        key = (asyncio.get_running_loop(), text)
+        task = self._pending.get(key)
+        if task is None:
+            with self._lock:
+                self.misses += 1
+            task = asyncio.ensure_future(self.base.aembed_query(text))
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            with self._lock:
+                self.coalesced += 1
+        # Shielded, so a cancelled caller does not cancel the request other callers wait for
+        return list(await asyncio.shield(task))
+
+    def _finish(self, key: Tuple[asyncio.AbstractEventLoop, str], task: "asyncio.Future") -> None:
+        """Cache the vector of a finished query request"""
+        self._pending.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self._put(key[1], task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache counters
+
+        Returns:
+            Dict with hits, misses, coalesced (lookups that waited for an
+            identical query in flight), hit_rate and the number of cached queries
+        """
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "entries": len(self._vectors)
+        }
@@ -0,0 +1,119 @@
+import weakref
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+
+
+def engine_key(pdf_sha256: str, **settings) -> Tuple:
+    """Registry key of an engine: the PDF's hash and every setting it was built with"""
+    return (pdf_sha256,) + tuple(sorted(settings.items()))
+
+
+class EngineRegistry:
+    """
+    Process-wide engines shared by every session that loads the same corpus
+
+    Engines are built once per key and handed out as per-session forks
+    (see LyricsRAG.fork), which share the index, chains and caches but keep
+    their own chat memory. Each fork holds a reference on its engine that
+    is released when the fork is garbage collected, e.g. when a Streamlit
+    session ends or loads another PDF. Engines without sessions stay idle
+    for a quick reload; beyond max_idle of them the least recently used
+    are dropped, so memory is bounded by the corpora actually in use.
+    """
+
+    def __init__(self, max_idle: int = 2):
+        """
+        Args:
+            max_idle: Maximum number of engines kept without any session
+        """
+        self.max_idle = max_idle
+        self.builds = 0
+        self.reuses = 0
+        self.evictions = 0
+        self._engines = OrderedDict()
+        # Reentrant: a fork can be garbage collected, and release, while this thread holds it
+        self._lock = threading.RLock()
+
+    def session(self, key: Hashable, build: Callable[[], Any],
+                on_wait: Optional[Callable[[], None]] = None) -> Any:
+        """
+        Per-session fork of the engine for a key, building the engine on first use
+
+        Sessions asking for a key that is still being built wait for that
+        build instead of starting their own.
+
+        Args:
+            key: Engine key, see engine_key
+            build: Builds the engine when the registry has none for the key
+            on_wait: Called before waiting for another session's build of the key
+
+        Returns:
+            A fork of the shared engine
+        """
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry is None:
+                entry = self._engines[key] = {"engine": None, "sessions": 0, "build_lock": threading.Lock()}
+            # Counted before the build, so the entry is not evicted while it is built
+            entry["sessions"] += 1
+            self._engines.move_to_end(key)
+
+        try:
+            if not entry["build_lock"].acquire(blocking=False):
+                if on_wait:
+                    on_wait()
+                entry["build_lock"].acquire()
+            try:
+                if entry["engine"] is None:
+                    entry["engine"] = build()
+                    self.builds += 1
+                else:
+                    self.reuses += 1
+            finally:
+                entry["build_lock"].release()
+            session = entry["engine"].fork()
+        except BaseException:
+            self._release(key)
+            raise
+
+        weakref.finalize(session, self._release, key)
+        return session
+
+    def _release(self, key: Hashable) -> None:
+        """Drop one session's reference and evict idle engines beyond max_idle"""
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry is None:
+                return
+            entry["sessions"] -= 1
+            self._engines.move_to_end(key)
+
+            idle = [k for k, e in self._engines.items() if e["sessions"] == 0]
+            # A failed build leaves nothing worth keeping
+            evict = [k for k in idle if self._engines[k]["engine"] is None]
+            built = [k for k in idle if self._engines[k]["engine"] is not None]
+            evict += built[:max(0, len(built) - self.max_idle)]
+            for k in evict:
+                del self._engines[k]
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Registry counters
+
+        Returns:
+            Dict with the number of engines, active and idle ones, live
+            sessions, builds, reuses and evictions
+        """
+        with self._lock:
+            sessions = [entry["sessions"] for entry in self._engines.values()]
+        return {
+            "engines": len(sessions),
+            "active": sum(count > 0 for count in sessions),
+            "idle": sum(count == 0 for count in sessions),
+            "sessions": sum(sessions),
+            "builds": self.builds,
+            "reuses": self.reuses,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,216 @@
+import os
+import math
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from lyricsRAG.persistentIndex import PersistentIndex, chunk_ids
+
+
+# Corpus sizes up to which each index type is chosen automatically
+FLAT_MAX_VECTORS = 20_000
+HNSW_MAX_VECTORS = 200_000
+
+# IVF training wants at least this many vectors per centroid
+_MIN_POINTS_PER_CENTROID = 39
+
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivf")
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """
+    Pick the FAISS index type for a corpus size
+
+    Exact search is fastest below a few tens of thousands of vectors, HNSW
+    keeps latency low up to a few hundred thousand, and IVF bounds memory
+    and build time beyond that.
+
+    Args:
+        num_vectors: Number of chunks to index
+
+    Returns:
+        "flat", "hnsw" or "ivf"
+    """
+    if num_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if num_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivf"
+
+
+def mmap_flags(index_type: str) -> int:
+    """faiss.read_index flags that memory-map an index file of the given type"""
+    if index_type == "ivf":
+        # Inverted lists are mapped straight from the file
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    # Flat code arrays are mapped zero-copy where this faiss build supports it
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: str, hnsw_m: int = 32,
+                      ef_search: int = 64, nprobe: Optional[int] = None) -> faiss.Index:
+    """
+    Build an inner-product FAISS index over L2-normalized vectors
+
+    Args:
+        vectors: Chunk embeddings, one row per chunk
+        index_type: "flat", "hnsw" or "ivf"
+        hnsw_m: Neighbours per node of the HNSW graph
+        ef_search: HNSW candidate list size at query time
+        nprobe: IVF lists scanned per query (defaults to sqrt of the list count)
+
+    Returns:
+        The populated index
+    """
+    vectors = np.array(vectors, dtype=np.float32, order="C")
+    faiss.normalize_L2(vectors)
+    num_vectors, dim = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = ef_search
+    elif index_type == "ivf":
+        nlist = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // _MIN_POINTS_PER_CENTROID))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = nprobe or max(1, int(math.sqrt(nlist)))
+    else:
+        raise ValueError(f"Unknown FAISS index type: {index_type}. Expected one of {INDEX_TYPES}")
+
+    index.add(vectors)
+    return index
+
+
+class FaissIndex(PersistentIndex):
+    """
+    FAISS index of a corpus, saved and memory-mapped next to its manifest
+
+    Chunks are only embedded while they stream in; the index is built in one
+    go by finish(), which lets IVF train on the whole corpus. The manifest
+    doubles as the document store, so a saved index is reopened by mapping
+    the .faiss file and reading the manifest.
+    """
+
+    backend = "faiss"
+    manifest_suffix = ".faiss.json"
+
+    def __init__(self, fingerprint: str, persist_directory: Optional[str] = None,
+                 index_type: str = "auto", hnsw_m: int = 32, ef_search: int = 64,
+                 nprobe: Optional[int] = None):
+        """
+        Args:
+            fingerprint: Corpus fingerprint from corpus_fingerprint
+            persist_directory: Directory of the saved indexes (None keeps the index in memory)
+            index_type: "flat", "hnsw", "ivf" or "auto" to choose by corpus size
+            hnsw_m: Neighbours per node of the HNSW graph
+            ef_search: HNSW candidate list size at query time
+            nprobe: IVF lists scanned per query (defaults to sqrt of the list count)
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {index_type}. Expected one of {INDEX_TYPES}")
+        super().__init__(fingerprint, persist_directory)
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        self.embeddings = None
+        self.ids = []
+
+    @property
+    def index_path(self) -> Optional[str]:
+        if not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, f"{self.name}.faiss")
+
+    def _wrap(self, index: faiss.Index, embeddings: Embeddings, texts: List[str],
+              metadatas: List[Dict[str, Any]], ids: List[str]) -> FAISS:
+        """Put a LangChain vector store around a raw index"""
+        docstore = InMemoryDocstore({
+            doc_id: Document(page_content=text, metadata=metadata)
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        })
+        return FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=dict(enumerate(ids)),
+            normalize_L2=True,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+
+    def open_existing(self, embeddings: Embeddings) -> Optional[Tuple[VectorStore, Dict[str, Any]]]:
+        manifest = self.load_manifest()
+        if manifest is None:
+            return None
+        if self.index_type != "auto" and manifest.get("index_type") != self.index_type:
+            return None
+
+        try:
+            index = faiss.read_index(self.index_path, mmap_flags(manifest["index_type"]))
+        except (RuntimeError, KeyError) as e:
+            print(f"Could not open saved FAISS index {self.index_path}: {e}")
+            return None
+
+        if index.ntotal != len(manifest["texts"]):
+            return None
+        if manifest["index_type"] == "hnsw":
+            index.hnsw.efSearch = self.ef_search
+        elif manifest["index_type"] == "ivf" and self.nprobe:
+            index.nprobe = self.nprobe
+
+        texts, metadatas = manifest["texts"], manifest["metadatas"]
+        self.vectorstore = self._wrap(index, embeddings, texts, metadatas, chunk_ids(metadatas))
+        return self.vectorstore, manifest
+
+    def begin(self, embeddings: Embeddings) -> None:
+        self.embeddings = embeddings
+        self.ids = []
+        if self.persist_directory and os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+    def add(self, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> None:
+        # Vectors are kept by the (precomputed) embeddings until finish() builds the index
+        self.embeddings.embed_documents(texts)
+        self.ids.extend(ids)
+
+    def update(self, ids: List[str], documents: List[Document]) -> None:
+        # Nothing is stored before finish(), which reads the final metadata
+        pass
+
+    def vectors(self, metadatas: List[Dict[str, Any]]) -> np.ndarray:
+        index = self.vectorstore.index
+        if isinstance(index, faiss.IndexIVF):
+            # IVF lists only map vector ids to rows once asked to
+            index.make_direct_map()
+        return index.reconstruct_n(0, index.ntotal)
+
+    def finish(self, songs: Dict[str, Dict[str, str]], texts: List[str],
+               metadatas: List[Dict[str, Any]]) -> VectorStore:
+        if texts:
+            vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            index_type = self.index_type if self.index_type != "auto" else choose_index_type(len(texts))
+            index = build_faiss_index(vectors, index_type, self.hnsw_m, self.ef_search, self.nprobe)
+        else:
+            # A PDF without songs gets an empty store, as with Chroma; only a flat index needs no training data
+            index_type = "flat"
+            index = faiss.IndexFlatIP(len(self.embeddings.embed_query("lyrics")))
+        print(f"Built FAISS {index_type} index over {index.ntotal} chunks")
+
+        if self.persist_directory:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            faiss.write_index(index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+            self.save_manifest(songs, texts, metadatas, index_type=index_type)
+
+        self.vectorstore = self._wrap(index, self.embeddings, texts, metadatas, self.ids)
+        return self.vectorstore
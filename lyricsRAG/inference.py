@@ -1,20 +1,42 @@
 import os
 import sys
+import copy
+import time
 from pathlib import Path
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
 
 # PDF extraction
-import fitz  # PyMuPDF
+from lyricsRAG.pdfExtractor import (
+    iter_pdf_songs, iter_prefetched, check_pdf_source, pdf_sha256, pdf_name as pdf_name_of, rereadable_pdf_source,
+    PdfSource, SongRecord
+)
+from lyricsRAG.ingestionCache import (
+    IngestionCache, PrecomputedEmbeddings, corpus_fingerprint, DEFAULT_CACHE_DIR
+)
+from lyricsRAG.embeddingCache import (
+    EmbeddingCache, CachedEmbeddings, QueryEmbeddingCache, DEFAULT_EMBEDDING_CACHE_PATH
+)
+from lyricsRAG.chunkDedup import ChunkDeduplicator, chunk_sources
+from lyricsRAG.lyricsChunker import make_chunker
+from lyricsRAG.corpusAnalytics import song_metrics
+from lyricsRAG.themeAnalytics import (
+    DEFAULT_THEMES, theme_key, analyze_themes, load_song_themes, save_song_themes
+)
+from lyricsRAG.keywordIndex import BM25Index, reciprocal_rank_fusion, SEARCH_TYPES
+from lyricsRAG.persistentIndex import make_index, chunk_ids, DEFAULT_PERSIST_DIRECTORY
+from lyricsRAG.streaming import (
+    stuff_messages, condense_question, remember_exchange, new_stream_stats, timed_tokens, cached_tokens
+)
+from lyricsRAG.responseCache import ResponseCache
+from lyricsRAG.chatMemory import make_chat_memory
+from lyricsRAG.ingestionJob import new_progress
 
 # LangChain imports
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationalRetrievalChain
 
 
@@ -23,124 +45,378 @@ import dotenv
 dotenv.load_dotenv()  # Load environment variables from .env file
 
 class LyricsRAG:
-    def __init__(self, pdf_path: str, openai_api_key: str = None):
+    def __init__(self, pdf_path: PdfSource, openai_api_key: str = None, streaming: bool = True,
+                 queue_size: int = 64, embedding_batch_size: int = 256,
+                 chunk_size: int = 500, chunk_overlap: int = 50,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 embedding_cache_path: Optional[str] = DEFAULT_EMBEDDING_CACHE_PATH,
+                 embedding_cache_size: int = 500_000, deduplicate_chunks: bool = True,
+                 chunker: str = "recursive", persist_directory: Optional[str] = None,
+                 vector_store: str = "chroma", faiss_index_type: str = "auto",
+                 numpy_dtype: str = "float32", response_cache: bool = False,
+                 response_cache_size: int = 1000, response_cache_ttl: Optional[float] = 3600,
+                 response_similarity_threshold: Optional[float] = None, query_cache_size: int = 1024,
+                 chat_memory: str = "buffer", chat_memory_tokens: int = 2000, chat_summary_tokens: int = 256,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 pdf_name: Optional[str] = None, themes: Optional[Dict[str, List[str]]] = DEFAULT_THEMES):
         """
         Initialize the Lyrics RAG system
         
         Args:
-            pdf_path: Path to the PDF file containing lyrics
+            pdf_path: Path to the PDF file containing lyrics, or the PDF itself as
+                      bytes, a memoryview or a binary file object (e.g. an upload),
+                      which is parsed in place without a temporary file
             openai_api_key: OpenAI API key (if not set in environment)
+            streaming: Chunk and embed songs while the PDF is still being parsed
+            queue_size: Maximum number of parsed songs waiting to be embedded
+            embedding_batch_size: Number of chunks embedded and indexed per batch
+            chunk_size: Size of text chunks for splitting
+            chunk_overlap: Overlap between chunks
+            cache_dir: Directory of the on-disk ingestion cache (None disables it)
+            embedding_cache_path: SQLite file of the persistent embedding cache (None disables it)
+            embedding_cache_size: Maximum number of vectors kept in the embedding cache
+            deduplicate_chunks: Index repeated chunks (choruses, hooks) only once
+            chunker: "recursive" for the generic character splitter, or "stanza" to cut
+                     on blank lines and section markers (only useful for PDFs
+                     that keep them; the bundled corpora have neither)
+            persist_directory: Directory of the persistent vector index; an index
+                               built earlier for the same corpus is opened instead
+                               of rebuilt (None keeps the index in memory)
+            vector_store: "chroma", "faiss", or "numpy" for exact in-process search
+            faiss_index_type: "flat", "hnsw", "ivf" or "auto" to choose by corpus size
+            numpy_dtype: Matrix dtype of the NumPy index, "float32" or "float16"
+            response_cache: Answer repeated generation and chat prompts from a cache
+                            instead of the model
+            response_cache_size: Maximum number of cached responses
+            response_cache_ttl: Seconds a cached response stays valid (None keeps it until evicted)
+            response_similarity_threshold: Also answer prompts at least this cosine-similar
+                                           to a cached one (None only reuses exact repeats)
+            query_cache_size: Number of query embeddings kept in memory for every
+                              retrieval path to share (0 disables the cache)
+            chat_memory: "buffer" keeps the whole chat history, "summary" keeps the
+                         recent turns verbatim and a running summary of older ones
+                         within chat_memory_tokens, so long chats do not slow down
+            chat_memory_tokens: Token budget of the chat history in "summary" mode
+            chat_summary_tokens: Largest size of the running summary in tokens
+            progress_callback: Called with the ingestion counters (stage, pages parsed,
+                               songs, chunks created, chunks embedded, vectors indexed)
+                               whenever they change during construction; page events
+                               come from the parsing thread
+            pdf_name: Name of the PDF in logs and chunk metadata (defaults to the
+                      path, or the file object's name)
+            themes: Theme labels and describing phrases the Themes analytics sort chunks
+                    into, by similarity of their stored vectors (None skips it)
         """
         if openai_api_key:
             os.environ["OPENAI_API_KEY"] = openai_api_key
         elif "OPENAI_API_KEY" not in os.environ:
             raise ValueError("OpenAI API key must be provided or set as OPENAI_API_KEY environment variable")
         
-        self.pdf_path = pdf_path
+        self.pdf_path = rereadable_pdf_source(pdf_path)
+        self.pdf_name = pdf_name or pdf_name_of(pdf_path)
+        self.themes = themes
         self.lyrics_by_song = {}
         self.lyrics_chunks = []
+        self.lyrics_metadatas = []
         self.vectorstore = None
+        self.keyword_index = None
+        self.song_metrics = None
+        self.song_themes = None
         self.qa_chain = None
         self.conversation_chain = None
+        self.streaming = streaming
+        self.queue_size = queue_size
+        self.embedding_batch_size = embedding_batch_size
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.deduplicate_chunks = deduplicate_chunks
+        self.chunker = chunker
+        self.persist_directory = persist_directory
+        self.vector_store = vector_store
+        self.faiss_index_type = faiss_index_type
+        self.numpy_dtype = numpy_dtype
+        self.chat_memory = chat_memory
+        self.chat_memory_tokens = chat_memory_tokens
+        self.chat_summary_tokens = chat_summary_tokens
+        self.fingerprint = None
+        self.last_stream_stats = {}
+        self.progress = new_progress()
+        self.progress_callback = progress_callback
         
-        # Load and process the PDF
-        self._extract_lyrics_from_pdf()
-        self._create_vector_store()
+        # Chunk vectors are looked up in the persistent embedding cache before
+        # anything is sent to the embedding API
+        base_embeddings = OpenAIEmbeddings()
+        self.embedding_cache = None
+        if embedding_cache_path:
+            self.embedding_cache = EmbeddingCache(embedding_cache_path, max_entries=embedding_cache_size)
+            base_embeddings = CachedEmbeddings(base_embeddings, self.embedding_cache)
+        
+        # Search and both chains embed their queries through this one object,
+        # so a query is only sent to the embedding API once
+        self.query_embedding_cache = None
+        if query_cache_size:
+            self.query_embedding_cache = QueryEmbeddingCache(base_embeddings, max_entries=query_cache_size)
+            base_embeddings = self.query_embedding_cache
+        self.embeddings = PrecomputedEmbeddings(base_embeddings)
+        self.ingestion_cache = IngestionCache(cache_dir) if cache_dir else None
+        self.response_cache = ResponseCache(
+            max_entries=response_cache_size,
+            ttl_seconds=response_cache_ttl,
+            embeddings=self.embeddings,
+            similarity_threshold=response_similarity_threshold
+        ) if response_cache else None
+        index_options = {
+            "faiss": {"index_type": faiss_index_type},
+            "numpy": {"dtype": numpy_dtype}
+        }.get(vector_store, {})
+        self.index = make_index(vector_store, self._corpus_fingerprint(), persist_directory, **index_options)
+        
+        # Open the persisted index of this corpus, or rebuild it from the
+        # ingestion cache, or process the PDF from scratch
+        self._report(stage="opening_index")
+        if not self._open_persisted_index():
+            if not self._load_from_cache():
+                self._report(stage="parsing")
+                if self.streaming:
+                    self._create_vector_store(self.iter_songs())
+                else:
+                    self._extract_lyrics_from_pdf()
+                    self._create_vector_store()
+                self._save_to_cache()
+        # The index holds every chunk vector now; keeping a second copy would
+        # grow the engine (and every fork of it) with the corpus
+        self.embeddings.clear()
+        self._report(stage="keyword_index")
+        self.keyword_index = BM25Index(self.lyrics_chunks, self.lyrics_metadatas)
+        # Computed once here so the analytics pages only read tables
+        self._report(stage="analytics")
+        self.song_metrics = song_metrics(self.lyrics_by_song)
+        if self.themes:
+            self.song_themes = self._analyze_themes()
         self._setup_rag_chains()
+        self._report(stage="ready")
+        # The callback belongs to whoever built the engine, not to the sessions forked from it
+        self.progress_callback = None
     
-    def _extract_lyrics_from_pdf(self):
-        """Extract lyrics from the PDF, organizing by song and artist"""
-        print(f"Extracting lyrics from {self.pdf_path}...")
+    def _analyze_themes(self):
+        """Theme table of the corpus, read from next to the persisted index or computed from its vectors"""
+        key = theme_key(self.themes, self.embeddings.model)
+        table = load_song_themes(self.index.themes_path, key)
+        if table is None:
+            vectors = self.index.vectors(self.lyrics_metadatas)
+            table = analyze_themes(self.embeddings.base, vectors, self.lyrics_metadatas, self.themes)
+            save_song_themes(self.index.themes_path, key, table)
+        return table
+    
+    def _report(self, **changes):
+        """Update the ingestion counters and pass them to the progress callback"""
+        self.progress.update(changes)
+        if self.progress_callback:
+            self.progress_callback(dict(self.progress))
+    
+    def _corpus_fingerprint(self) -> str:
+        """Fingerprint of this PDF and its chunking/embedding settings"""
+        if self.fingerprint is None:
+            self.fingerprint = corpus_fingerprint(
+                pdf_sha256(self.pdf_path),
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                embedding_model=self.embeddings.model,
+                deduplicate_chunks=self.deduplicate_chunks,
+                chunker=self.chunker
+            )
+        return self.fingerprint
+    
+    def _open_persisted_index(self) -> bool:
+        """
+        Open the vector index persisted by an earlier run over the same corpus
         
-        if not os.path.exists(self.pdf_path):
-            raise FileNotFoundError(f"PDF file not found: {self.pdf_path}")
+        Returns:
+            True if the index was opened without parsing or embedding anything
+        """
+        opened = self.index.open_existing(self.embeddings)
+        if opened is None:
+            return False
         
-        # Open the PDF
-        doc = fitz.open(self.pdf_path)
-        current_song = "Unknown Song"
-        current_artist = "Unknown Artist"
-        current_lyrics = []
+        self.vectorstore, manifest = opened
+        self.lyrics_by_song = manifest["songs"]
+        self.lyrics_chunks = manifest["texts"]
+        self.lyrics_metadatas = manifest["metadatas"]
+        self._report(
+            songs=len(self.lyrics_by_song),
+            chunks_created=len(self.lyrics_chunks),
+            chunks_embedded=len(self.lyrics_chunks),
+            vectors_indexed=len(self.lyrics_chunks)
+        )
         
-        # Skip the title page (first page)
-        for page_num in range(1, len(doc)):
-            page = doc.load_page(page_num)
-            text = page.get_text()
-            
-            # Try to extract song title and artist
-            lines = text.split('\n')
-            if len(lines) >= 2:
-                # First line is typically the song title
-                song_title = lines[0].strip()
-                
-                # Second line typically starts with "by" for the artist
-                artist_line = lines[1].strip()
-                if artist_line.startswith("by "):
-                    artist = artist_line[3:].strip()
-                    
-                    # Store previous song if we have one
-                    if current_lyrics and current_song != song_title:
-                        self.lyrics_by_song[current_song] = {
-                            "artist": current_artist,
-                            "lyrics": "\n".join(current_lyrics)
-                        }
-                        current_lyrics = []
-                    
-                    # Update current song and artist
-                    current_song = song_title
-                    current_artist = artist
-                    
-                    # Get lyrics (everything after the second line)
-                    if len(lines) > 2:
-                        current_lyrics = lines[2:]
-        
-        # Store the last song
-        if current_lyrics:
-            self.lyrics_by_song[current_song] = {
-                "artist": current_artist,
-                "lyrics": "\n".join(current_lyrics)
+        print(f"Opened persisted vector store {self.index.name} with {len(self.lyrics_chunks)} chunks "
+              f"from {len(self.lyrics_by_song)} songs")
+        return True
+    
+    def _load_from_cache(self) -> bool:
+        """
+        Restore songs, chunks and embeddings from the ingestion cache
+        
+        Returns:
+            True if the vector store was built from a cache entry
+        """
+        if not self.ingestion_cache:
+            return False
+        
+        entry = self.ingestion_cache.load(self._corpus_fingerprint())
+        if entry is None:
+            return False
+        
+        print(f"Loading {self.pdf_name} from the ingestion cache...")
+        self.lyrics_by_song = entry["songs"]
+        self._report(stage="loading_cache", songs=len(self.lyrics_by_song), chunks_created=len(entry["texts"]))
+        self.embeddings = PrecomputedEmbeddings(self.embeddings.base, entry["texts"], entry["embeddings"])
+        self.index.begin(self.embeddings)
+        self.lyrics_chunks = []
+        self.lyrics_metadatas = []
+        
+        # Stored vectors are served by the embeddings table, so no API calls are made
+        texts = entry["texts"]
+        metadatas = [dict(metadata, source=self.pdf_name) for metadata in entry["metadatas"]]
+        for start in range(0, len(texts), self.embedding_batch_size):
+            stop = start + self.embedding_batch_size
+            self._index_chunks(texts[start:stop], metadatas[start:stop])
+        self._report(stage="indexing")
+        self.vectorstore = self.index.finish(self.lyrics_by_song, self.lyrics_chunks, self.lyrics_metadatas)
+        self._report(vectors_indexed=len(self.lyrics_chunks))
+        
+        print(f"Created vector store with {len(self.lyrics_chunks)} chunks from {len(self.lyrics_by_song)} songs")
+        return True
+    
+    def _save_to_cache(self):
+        """Store the parsed songs, chunks and their embeddings in the ingestion cache"""
+        if not self.ingestion_cache:
+            return
+        
+        self.ingestion_cache.save(
+            self._corpus_fingerprint(),
+            songs=self.lyrics_by_song,
+            texts=self.lyrics_chunks,
+            metadatas=self.lyrics_metadatas,
+            embeddings=self.embeddings.matrix(self.lyrics_chunks)
+        )
+    
+    def iter_songs(self) -> Iterator[SongRecord]:
+        """
+        Parse the PDF lazily, yielding each song as soon as it is complete
+        
+        Yields:
+            (song, artist, lyrics) records in page order
+        """
+        print(f"Extracting lyrics from {self.pdf_name}...")
+        
+        check_pdf_source(self.pdf_path)
+        
+        yield from iter_pdf_songs(
+            self.pdf_path, on_page=lambda parsed, total: self._report(pages_parsed=parsed, pages_total=total)
+        )
+    
+    def _extract_lyrics_from_pdf(self):
+        """Extract lyrics from the PDF, organizing by song and artist"""
+        for song, artist, lyrics in self.iter_songs():
+            self.lyrics_by_song[song] = {
+                "artist": artist,
+                "lyrics": lyrics
             }
+            self._report(songs=len(self.lyrics_by_song))
         
         print(f"Extracted lyrics for {len(self.lyrics_by_song)} songs")
     
-    def _create_vector_store(self):
-        """Create text chunks and embeddings for the lyrics"""
+    def _create_vector_store(self, songs: Optional[Iterable[SongRecord]] = None):
+        """
+        Create text chunks and embeddings for the lyrics
+        
+        Args:
+            songs: Stream of (song, artist, lyrics) records to consume through a
+                   bounded queue; defaults to the already extracted songs
+        """
         print("Creating vector store for lyrics...")
         
-        # Create a text splitter for chunking the lyrics
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        # Create the chunker that splits each song into tagged chunks
+        chunker = make_chunker(self.chunker, self.chunk_size, self.chunk_overlap)
+        
+        if songs is None:
+            songs = (
+                (song, data["artist"], data["lyrics"])
+                for song, data in self.lyrics_by_song.items()
+            )
+        
+        # Embeddings are computed batch by batch as songs arrive, so parsing,
+        # chunking and embedding overlap instead of running phase by phase
+        self.index.begin(self.embeddings)
+        self.lyrics_chunks = []
+        self.lyrics_metadatas = []
+        
+        # Repeated chunks are embedded once and remember every song they appear in
+        deduplicator = ChunkDeduplicator() if self.deduplicate_chunks else None
         
         # Prepare texts with metadata
         texts = []
         metadatas = []
         
-        for song, data in self.lyrics_by_song.items():
-            # Split lyrics into chunks
-            song_chunks = text_splitter.split_text(data["lyrics"])
-            texts.extend(song_chunks)
+        for song, artist, lyrics in iter_prefetched(songs, self.queue_size):
+            self.lyrics_by_song[song] = {
+                "artist": artist,
+                "lyrics": lyrics
+            }
             
-            # Add metadata for each chunk
-            for _ in song_chunks:
-                metadatas.append({
+            # Split lyrics into chunks and add metadata for each chunk
+            for chunk in chunker.split_song(lyrics):
+                metadata = {
                     "song": song,
-                    "artist": data["artist"],
-                    "source": self.pdf_path
-                })
-        
-        self.lyrics_chunks = texts
-        
-        # Create embeddings and vector store
-        embeddings = OpenAIEmbeddings()
-        self.vectorstore = Chroma.from_texts(
-            texts=texts,
-            embedding=embeddings,
-            metadatas=metadatas
-        )
+                    "artist": artist,
+                    "source": self.pdf_name,
+                    "section": chunk.section,
+                    "chunk_index": chunk.index
+                }
+                
+                if deduplicator:
+                    key = deduplicator.add(chunk.text, metadata)
+                    if key is None:
+                        continue
+                    metadata["chunk_id"] = key
+                
+                texts.append(chunk.text)
+                metadatas.append(metadata)
+            
+            # Repeated chunks are not counted, they are never embedded
+            self._report(songs=len(self.lyrics_by_song), chunks_created=len(self.lyrics_chunks) + len(texts))
+            
+            if len(texts) >= self.embedding_batch_size:
+                self._index_chunks(texts, metadatas)
+                texts = []
+                metadatas = []
+        
+        if texts:
+            self._index_chunks(texts, metadatas)
+        
+        if deduplicator:
+            # Attach the full source list to chunks that were repeated after being indexed
+            ids, documents = deduplicator.merge_sources(self.lyrics_chunks, self.lyrics_metadatas)
+            if ids:
+                self.index.update(ids, documents)
+            print(f"Collapsed {deduplicator.duplicates} duplicate chunks into {len(ids)} shared entries")
         
-        print(f"Created vector store with {len(texts)} chunks")
+        self._report(stage="indexing")
+        self.vectorstore = self.index.finish(self.lyrics_by_song, self.lyrics_chunks, self.lyrics_metadatas)
+        self._report(vectors_indexed=len(self.lyrics_chunks))
+        print(f"Created vector store with {len(self.lyrics_chunks)} chunks from {len(self.lyrics_by_song)} songs")
+        
+        if self.embedding_cache:
+            stats = self.embedding_cache.stats()
+            print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses")
+    
+    def _index_chunks(self, texts: List[str], metadatas: List[Dict[str, Any]]):
+        """Embed a batch of chunks and add it to the vector store"""
+        self.index.add(texts, metadatas, chunk_ids(metadatas, len(self.lyrics_chunks)))
+        self.lyrics_chunks.extend(texts)
+        self.lyrics_metadatas.extend(metadatas)
+        self._report(chunks_embedded=len(self.lyrics_chunks))
     
     def _setup_rag_chains(self):
         """Set up the RAG chains for lyric generation"""
@@ -174,10 +450,18 @@ class LyricsRAG:
             chain_type_kwargs={"prompt": lyric_prompt}
         )
         
-        # Set up the conversational chain with memory
-        memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
+        self._setup_conversation_chain()
+        
+        print("RAG pipelines set up successfully")
+    
+    def _setup_conversation_chain(self):
+        """Set up the conversational chain with its own memory"""
+        memory = make_chat_memory(
+            self.chat_memory,
+            llm=ChatOpenAI(temperature=0, model="gpt-4o-mini", max_tokens=self.chat_summary_tokens),
+            model_name="gpt-4o-mini",
+            max_tokens=self.chat_memory_tokens,
+            summary_tokens=self.chat_summary_tokens
         )
         
         self.conversation_chain = ConversationalRetrievalChain.from_llm(
@@ -185,8 +469,23 @@ class LyricsRAG:
             retriever=self.vectorstore.as_retriever(search_kwargs={"k": 5}),
             memory=memory
         )
+    
+    def fork(self) -> "LyricsRAG":
+        """
+        Per-session view of this engine
         
-        print("RAG pipelines set up successfully")
+        The fork shares the index, the generation chain and the caches with
+        this engine but has its own conversation memory and stream stats, so
+        several users can chat over one corpus without seeing each other's
+        history.
+        
+        Returns:
+            The fork
+        """
+        session = copy.copy(self)
+        session.last_stream_stats = {}
+        session._setup_conversation_chain()
+        return session
     
     def generate_lyrics(self, prompt: str) -> str:
         """
@@ -199,8 +498,12 @@ class LyricsRAG:
         Returns:
             Generated lyrics
         """
-        result = self.qa_chain.invoke({"query": prompt})
-        return result["result"]
+        if self.response_cache is None:
+            result = self.qa_chain.invoke({"query": prompt})
+            return result["result"]
+        
+        docs = self.qa_chain.retriever.invoke(prompt)
+        return self._cached_answer("lyrics", prompt, docs, self.qa_chain.combine_documents_chain)
     
     def chat(self, message: str) -> str:
         """
@@ -212,28 +515,162 @@ class LyricsRAG:
         Returns:
             Response from the model
         """
-        result = self.conversation_chain.invoke({"question": message})
-        return result["answer"]
+        if self.response_cache is None:
+            result = self.conversation_chain.invoke({"question": message})
+            return result["answer"]
+        
+        # The answer only depends on the standalone question and its chunks, not on the history
+        chain = self.conversation_chain
+        question = condense_question(chain, message)
+        docs = chain.retriever.invoke(question)
+        answer = self._cached_answer("chat", question, docs, chain.combine_docs_chain)
+        remember_exchange(chain, message, answer)
+        return answer
+    
+    def _cached_answer(self, kind: str, question: str, docs, chain) -> str:
+        """Run a "stuff" chain's LLM on retrieved documents unless the response cache has the answer"""
+        answer, key = self.response_cache.lookup(kind, question, docs, chain.llm_chain.llm)
+        if answer is None:
+            answer = chain.llm_chain.llm.invoke(stuff_messages(chain, docs, question)).content
+            self.response_cache.store(key, answer)
+        return answer
+    
+    def stream_lyrics(self, prompt: str, use_cache: bool = True) -> Iterator[str]:
+        """
+        Generate lyrics like generate_lyrics, yielding tokens as they arrive
+        
+        Retrieval happens before the first token; its duration, the time to
+        first token and the total time are kept in self.last_stream_stats.
+        
+        Args:
+            prompt: Instructions for generating the lyrics
+            use_cache: Answer from the response cache if it has this prompt;
+                       False always asks the model and caches the new lyrics
+        
+        Yields:
+            Pieces of the generated lyrics
+        """
+        started = time.perf_counter()
+        self.last_stream_stats = stats = new_stream_stats()
+        
+        docs = self.qa_chain.retriever.invoke(prompt)
+        chain = self.qa_chain.combine_documents_chain
+        messages = stuff_messages(chain, docs, prompt)
+        stats["retrieval_ms"] = (time.perf_counter() - started) * 1000
+        
+        if self.response_cache is not None:
+            cached, key = self.response_cache.lookup(
+                "lyrics", prompt, docs, chain.llm_chain.llm, refresh=not use_cache
+            )
+            if cached is not None:
+                yield from cached_tokens(cached, stats, started)
+                return
+        
+        lyrics = []
+        for token in timed_tokens(chain.llm_chain.llm.stream(messages), stats, started):
+            lyrics.append(token)
+            yield token
+        if self.response_cache is not None:
+            self.response_cache.store(key, "".join(lyrics))
+    
+    def stream_chat(self, message: str) -> Iterator[str]:
+        """
+        Chat like chat(), yielding the answer tokens as they arrive
+        
+        The exchange is added to the conversation memory once the answer is
+        complete; timings are kept in self.last_stream_stats.
+        
+        Args:
+            message: User message about lyrics
+        
+        Yields:
+            Pieces of the response
+        """
+        started = time.perf_counter()
+        self.last_stream_stats = stats = new_stream_stats()
+        
+        chain = self.conversation_chain
+        question = condense_question(chain, message)
+        docs = chain.retriever.invoke(question)
+        messages = stuff_messages(chain.combine_docs_chain, docs, question)
+        stats["retrieval_ms"] = (time.perf_counter() - started) * 1000
+        
+        if self.response_cache is not None:
+            cached, key = self.response_cache.lookup("chat", question, docs, chain.combine_docs_chain.llm_chain.llm)
+            if cached is not None:
+                yield from cached_tokens(cached, stats, started)
+                remember_exchange(chain, message, cached)
+                return
+        
+        answer = []
+        for token in timed_tokens(chain.combine_docs_chain.llm_chain.llm.stream(messages), stats, started):
+            answer.append(token)
+            yield token
+        remember_exchange(chain, message, "".join(answer))
+        if self.response_cache is not None:
+            self.response_cache.store(key, "".join(answer))
     
-    def search_lyrics(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+    def search_lyrics(self, query: str, k: int = 3, search_type: str = "Semantic") -> List[Dict[str, Any]]:
         """
-        Search for lyrics similar to the query
+        Search for lyrics matching the query
         
         Args:
             query: Search query
             k: Number of results to return
+            search_type: "Semantic" for vector similarity, "Keyword" for BM25
+                         over chunk words and song titles (no embedding call),
+                         "Combined" to fuse both rankings by reciprocal rank
             
         Returns:
             List of matching lyrics with metadata
         """
-        results = self.vectorstore.similarity_search(query, k=k)
+        search_type = search_type.lower()
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"Unknown search type: {search_type}. Expected one of {SEARCH_TYPES}")
+        
+        if search_type == "keyword":
+            results = self.keyword_index.search(query, k=k)
+        elif search_type == "combined":
+            # Fuse deeper candidate lists so chunks ranked well by both retrievers surface
+            fetch_k = max(4 * k, 20)
+            results = reciprocal_rank_fusion(
+                [self.vectorstore.similarity_search(query, k=fetch_k), self.keyword_index.search(query, k=fetch_k)],
+                k=k
+            )
+        else:
+            results = self.vectorstore.similarity_search(query, k=k)
+        return self._format_results(results)
+    
+    def search_lyrics_batch(self, queries: List[str], k: int = 3) -> List[List[Dict[str, Any]]]:
+        """
+        Search for lyrics similar to each of several queries
+        
+        The NumPy index answers the whole batch with one matrix multiply;
+        other vector stores are queried one by one.
+        
+        Args:
+            queries: Search queries
+            k: Number of results per query
+            
+        Returns:
+            One list of matching lyrics per query
+        """
+        if hasattr(self.vectorstore, "batch_similarity_search"):
+            batches = self.vectorstore.batch_similarity_search(queries, k=k)
+        else:
+            batches = [self.vectorstore.similarity_search(query, k=k) for query in queries]
+        return [self._format_results(results) for results in batches]
+    
+    def _format_results(self, results) -> List[Dict[str, Any]]:
+        """Turn retrieved documents into search results with their metadata"""
         formatted_results = []
         
         for doc in results:
             formatted_results.append({
                 "content": doc.page_content,
                 "song": doc.metadata.get("song", "Unknown"),
-                "artist": doc.metadata.get("artist", "Unknown")
+                "artist": doc.metadata.get("artist", "Unknown"),
+                "sources": chunk_sources(doc.metadata)
             })
             
         return formatted_results
@@ -249,6 +686,26 @@ class LyricsRAG:
             {"song": song, "artist": data["artist"]}
             for song, data in self.lyrics_by_song.items()
         ]
+    
+    def response_cache_stats(self) -> Dict[str, Any]:
+        """
+        Response cache hit rate and size
+        
+        Returns:
+            Dict with exact and similarity hits, misses, hit_rate, entries and
+            evictions, empty if the response cache is disabled
+        """
+        return self.response_cache.stats() if self.response_cache else {}
+    
+    def query_cache_stats(self) -> Dict[str, Any]:
+        """
+        Query embedding cache counters
+        
+        Returns:
+            Dict with hits, misses, coalesced lookups, hit_rate and entries,
+            empty if the query cache is disabled
+        """
+        return self.query_embedding_cache.stats() if self.query_embedding_cache else {}
 
 
 def main():
@@ -268,7 +725,7 @@ def main():
     
     try:
         # Initialize the RAG system
-        lyrics_rag = LyricsRAG(pdf_path, openai_api_key=api_key)
+        lyrics_rag = LyricsRAG(pdf_path, openai_api_key=api_key, persist_directory=DEFAULT_PERSIST_DIRECTORY)
         
         print("\nInteractive Lyrics Generator")
         print("============================")
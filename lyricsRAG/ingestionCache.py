@@ -0,0 +1,173 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+# Default location of the on-disk ingestion cache
+DEFAULT_CACHE_DIR = os.path.join(".lyrics_cache", "ingestion")
+
+# Bump when the layout of a cache entry or the parsing/chunking logic changes
+CACHE_FORMAT_VERSION = 1
+
+
+def corpus_fingerprint(pdf_sha256: str, **params) -> str:
+    """
+    Identify a PDF together with its ingestion settings
+
+    Args:
+        pdf_sha256: Hash of the PDF bytes
+        **params: Chunking and embedding settings (chunk_size, model, ...)
+
+    Returns:
+        Hex digest that changes whenever the PDF or any setting changes
+    """
+    payload = {"format": CACHE_FORMAT_VERSION, "pdf_sha256": pdf_sha256, **params}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    Embeddings that answer document lookups from a table of known vectors
+
+    Texts missing from the table are embedded by the wrapped model and
+    remembered, so after ingestion the table holds the vector of every chunk.
+    Queries always go to the wrapped model.
+    """
+
+    def __init__(self, base: Embeddings, texts: Iterable[str] = (), vectors: Optional[np.ndarray] = None):
+        """
+        Args:
+            base: Embedding model used for queries and unknown texts
+            texts: Texts whose vectors are already known
+            vectors: Matrix of known vectors, one row per text
+        """
+        self.base = base
+        self.vectors = {}
+        if vectors is not None:
+            for text, vector in zip(texts, vectors):
+                self.vectors[text] = vector
+
+    @property
+    def model(self) -> str:
+        """Name of the wrapped embedding model"""
+        return getattr(self.base, "model", type(self.base).__name__)
+
+    def embed_documents(self, texts: List[str]) -> List[np.ndarray]:
+        missing = [text for text in dict.fromkeys(texts) if text not in self.vectors]
+        if missing:
+            for text, vector in zip(missing, self.base.embed_documents(missing)):
+                self.vectors[text] = np.asarray(vector, dtype=np.float32)
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.base.aembed_query(text)
+
+    def matrix(self, texts: List[str]) -> np.ndarray:
+        """
+        Stack the known vectors of the given texts into a float32 matrix
+
+        Args:
+            texts: Texts that have already been embedded
+
+        Returns:
+            Matrix with one row per text
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack([self.vectors[text] for text in texts]).astype(np.float32, copy=False)
+
+    def clear(self) -> None:
+        """Forget the known vectors once the index (and the ingestion cache) hold them"""
+        self.vectors = {}
+
+
+class IngestionCache:
+    """
+    On-disk cache of parsed songs, chunks and chunk embeddings
+
+    Entries are keyed by the corpus fingerprint: the SHA-256 of the PDF bytes
+    together with every parameter that influences chunking or embedding, so an identical upload
+    skips parsing and embedding entirely. Each entry is a directory holding
+    songs.json, chunks.json and an embeddings.npy matrix.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        Args:
+            cache_dir: Directory holding the cache entries
+        """
+        self.cache_dir = cache_dir
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a cache entry
+
+        Args:
+            key: Corpus fingerprint from corpus_fingerprint
+
+        Returns:
+            Dict with songs, texts, metadatas and embeddings, or None on a miss
+        """
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, "songs.json"), "r", encoding="utf-8") as f:
+                songs = json.load(f)
+            with open(os.path.join(entry_dir, "chunks.json"), "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            embeddings = np.load(os.path.join(entry_dir, "embeddings.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+        if len(chunks["texts"]) != len(embeddings):
+            return None
+
+        return {
+            "songs": songs,
+            "texts": chunks["texts"],
+            "metadatas": chunks["metadatas"],
+            "embeddings": embeddings
+        }
+
+    def save(self, key: str, songs: Dict[str, Dict[str, str]], texts: List[str],
+             metadatas: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+        """
+        Store a cache entry
+
+        The entry is written to a temporary directory first and moved into
+        place, so readers never see a partially written entry.
+
+        Args:
+            key: Corpus fingerprint from corpus_fingerprint
+            songs: Parsed songs as {song: {"artist": ..., "lyrics": ...}}
+            texts: Chunk texts
+            metadatas: Chunk metadata, one dict per chunk
+            embeddings: Chunk embeddings, one row per chunk
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key[:12]}-", dir=self.cache_dir)
+        try:
+            with open(os.path.join(tmp_dir, "songs.json"), "w", encoding="utf-8") as f:
+                json.dump(songs, f)
+            with open(os.path.join(tmp_dir, "chunks.json"), "w", encoding="utf-8") as f:
+                json.dump({"texts": texts, "metadatas": metadatas}, f)
+            np.save(os.path.join(tmp_dir, "embeddings.npy"), np.asarray(embeddings, dtype=np.float32))
+
+            entry_dir = self._entry_dir(key)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        except OSError as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            print(f"Could not write ingestion cache entry: {e}")
@@ -0,0 +1,131 @@
+import time
+import uuid
+import weakref
+import threading
+from typing import Dict, Any, Callable, Optional
+
+# Ingestion stages in the order they are reported
+STAGES = ("starting", "waiting_for_shared_build", "opening_index", "loading_cache", "parsing", "indexing", "keyword_index", "analytics", "ready")
+
+# Jobs by id for as long as something else keeps them alive
+_jobs = weakref.WeakValueDictionary()
+
+
+def new_progress() -> Dict[str, Any]:
+    """Counters of one ingestion, updated as it runs"""
+    return {
+        "stage": "starting",
+        "pages_parsed": 0,
+        "pages_total": None,
+        "songs": 0,
+        "chunks_created": 0,
+        "chunks_embedded": 0,
+        "vectors_indexed": 0
+    }
+
+
+def progress_fraction(progress: Dict[str, Any]) -> float:
+    """
+    Rough share of an ingestion that is done, for a progress bar
+
+    Parsing and embedding overlap, so each counts for a little under half;
+    the rest is building the final index.
+    """
+    if progress["stage"] == "ready":
+        return 1.0
+    if progress["pages_total"]:
+        parsed = progress["pages_parsed"] / progress["pages_total"]
+    else:
+        # Loaded from the ingestion cache, nothing to parse
+        parsed = 1.0 if progress["chunks_created"] else 0.0
+    embedded = progress["chunks_embedded"] / progress["chunks_created"] if progress["chunks_created"] else 0.0
+    indexed = 1.0 if progress["vectors_indexed"] else 0.0
+    return min(1.0, 0.45 * parsed + 0.45 * embedded + 0.1 * indexed)
+
+
+class IngestionJob:
+    """
+    Build an engine on a background thread and keep its latest progress
+
+    The build function receives a progress callback to pass on to the
+    engine (see LyricsRAG's progress_callback) and returns the engine. A
+    UI thread polls snapshot() instead of blocking on the build.
+    """
+
+    def __init__(self, build: Callable[[Callable[[Dict[str, Any]], None]], Any]):
+        """
+        Args:
+            build: Called on the job's thread with the progress callback;
+                   its return value becomes the job's result
+        """
+        self.job_id = uuid.uuid4().hex[:12]
+        self.build = build
+        self.status = "pending"
+        self.progress = new_progress()
+        self.events = 0
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"lyrics-ingest-{self.job_id}", daemon=True)
+        _jobs[self.job_id] = self
+
+    def start(self) -> "IngestionJob":
+        """Start the build and return the job"""
+        self.started = time.perf_counter()
+        self.status = "running"
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            self.result = self.build(self._on_progress)
+            self.status = "done"
+        except Exception as e:
+            self.error = e
+            self.status = "failed"
+        finally:
+            self.finished = time.perf_counter()
+
+    def _on_progress(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self.progress = dict(event)
+            self.events += 1
+
+    @property
+    def done(self) -> bool:
+        """Whether the build finished, successfully or not"""
+        return self.status in ("done", "failed")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the build finishes; False if the timeout expired first"""
+        self._thread.join(timeout)
+        return self.done
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current state of the job
+
+        Returns:
+            Dict with job_id, status, elapsed_s, error, number of progress
+            events, fraction done and the latest progress counters
+        """
+        with self._lock:
+            progress = dict(self.progress)
+            events = self.events
+        end = self.finished or time.perf_counter()
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "elapsed_s": end - self.started if self.started else 0.0,
+            "error": str(self.error) if self.error else None,
+            "events": events,
+            "fraction": 1.0 if self.status == "done" else progress_fraction(progress),
+            **progress
+        }
+
+
+def get_job(job_id: str) -> Optional[IngestionJob]:
+    """Job with this id, if it is still referenced somewhere"""
+    return _jobs.get(job_id)
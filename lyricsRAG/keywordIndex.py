@@ -0,0 +1,148 @@
+import re
+from collections import Counter
+from typing import List, Dict, Any, Tuple, Hashable
+
+import numpy as np
+from langchain_core.documents import Document
+
+from lyricsRAG.chunkDedup import chunk_sources
+
+
+# Words with inner apostrophes ("don't", "rock'n'roll") are kept whole
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+
+# Rank offset of reciprocal-rank fusion; 60 is the value from the original paper
+RRF_K = 60
+
+SEARCH_TYPES = ("semantic", "keyword", "combined")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a text"""
+    return _TOKEN.findall(text.lower().replace("’", "'"))
+
+
+def document_key(doc: Document) -> Tuple[str, str, int]:
+    """Identity of a retrieved chunk, the same whichever index returned it"""
+    return doc.page_content, doc.metadata.get("song"), doc.metadata.get("chunk_index")
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int = RRF_K) -> List[Document]:
+    """
+    Merge ranked result lists by reciprocal-rank fusion
+
+    Every document scores sum(1 / (rrf_k + rank)) over the lists it appears
+    in, so documents ranked well by several retrievers rise to the top
+    without having to compare their raw scores.
+
+    Args:
+        rankings: Result lists, best match first
+        k: Number of documents to return
+        rrf_k: Rank offset that damps the weight of the very first ranks
+
+    Returns:
+        The k best documents of the fused ranking
+    """
+    scores: Dict[Hashable, float] = {}
+    documents: Dict[Hashable, Document] = {}
+
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+
+    fused = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in fused]
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over lyric chunks and their song titles
+
+    Each chunk is indexed with its own words plus the titles of every song
+    it appears in (counted title_weight times). The BM25 weight of every
+    posting is computed at build time, so a query only sums a few
+    precomputed arrays and never touches the embedding API.
+    """
+
+    def __init__(self, texts: List[str], metadatas: List[Dict[str, Any]],
+                 k1: float = 1.5, b: float = 0.75, title_weight: int = 2):
+        """
+        Args:
+            texts: Chunk texts
+            metadatas: Chunk metadata, one dict per chunk
+            k1: Term frequency saturation
+            b: Strength of the document length normalization
+            title_weight: How many times a title word counts towards a chunk
+        """
+        self.texts = texts
+        self.metadatas = metadatas
+
+        # Flat (term, chunk, count) triples, one per distinct term of a chunk
+        vocabulary: Dict[str, int] = {}
+        term_ids, positions, counts, lengths = [], [], [], []
+        for position, (text, metadata) in enumerate(zip(texts, metadatas)):
+            chunk_counts = Counter(tokenize(text))
+            for title in {source["song"] for source in chunk_sources(metadata)}:
+                for token in tokenize(title):
+                    chunk_counts[token] += title_weight
+
+            for term, count in chunk_counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                positions.append(position)
+                counts.append(count)
+            lengths.append(sum(chunk_counts.values()))
+
+        term_ids = np.array(term_ids, dtype=np.int64)
+        positions = np.array(positions, dtype=np.int64)
+        counts = np.array(counts, dtype=np.float32)
+        lengths = np.array(lengths, dtype=np.float32)
+
+        # Postings of each term are stored contiguously (CSR layout)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, self.positions, counts = term_ids[order], positions[order], counts[order]
+        doc_freq = np.bincount(term_ids, minlength=len(vocabulary)).astype(np.float32)
+        self.offsets = np.concatenate(([0], np.cumsum(doc_freq))).astype(np.int64)
+        self.vocabulary = vocabulary
+
+        num_docs = len(texts)
+        idf = np.log1p((num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        avg_length = float(lengths.mean()) if num_docs else 1.0
+        length_norm = k1 * (1 - b + b * lengths / avg_length)
+        self.weights = (idf[term_ids] * counts * (k1 + 1) / (counts + length_norm[self.positions])).astype(np.float32)
+
+    def search_with_scores(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """
+        Best chunks for the words of a query
+
+        Args:
+            query: Search query
+            k: Number of results
+
+        Returns:
+            (document, BM25 score) pairs, best match first; chunks sharing no
+            word with the query are never returned
+        """
+        scores = np.zeros(len(self.texts), dtype=np.float32)
+        for term in dict.fromkeys(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+                scores[self.positions[start:stop]] += self.weights[start:stop]
+
+        hits = np.flatnonzero(scores)
+        k = min(k, len(hits))
+        if k <= 0:
+            return []
+
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(page_content=self.texts[i], metadata=self.metadatas[i]), float(scores[i]))
+            for i in top
+        ]
+
+    def search(self, query: str, k: int = 4) -> List[Document]:
+        """Best chunks for the words of a query, best match first"""
+        return [doc for doc, _ in self.search_with_scores(query, k)]
@@ -0,0 +1,231 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+# Explicit section labels such as "[Chorus: Artist]", "Verse 2:" or "(Pre-Chorus)"
+_SECTION_NAMES = r"(verse|pre-?chorus|chorus|hook|refrain|bridge|intro|outro|interlude)"
+SECTION_MARKER = re.compile(
+    rf"^\s*(?:[\[\(]\s*{_SECTION_NAMES}\b[^\]\)]*[\]\)]|{_SECTION_NAMES}(?:\s*\d+)?)\s*:?\s*$",
+    re.IGNORECASE
+)
+
+# Marker lines are short; longer lines are never matched against the pattern
+MAX_MARKER_LENGTH = 40
+
+# Marker spellings folded onto the section types we tag chunks with
+SECTION_ALIASES = {
+    "hook": "chorus",
+    "refrain": "chorus",
+    "prechorus": "pre-chorus",
+}
+
+
+class LyricsChunk(NamedTuple):
+    """A chunk of a song together with its section type and position in the song"""
+    text: str
+    section: str
+    index: int
+
+
+def _section_label(line: str) -> Optional[str]:
+    """Return the section type named by a marker line, or None for a lyric line"""
+    match = SECTION_MARKER.match(line)
+    if not match:
+        return None
+    label = (match.group(1) or match.group(2)).lower().replace("-", "")
+    return SECTION_ALIASES.get(label, label)
+
+
+class StanzaChunker:
+    """
+    Linear-time lyrics chunker that cuts on stanza boundaries
+
+    Stanzas are delimited by blank lines and section markers. A stanza longer
+    than chunk_size is cut at PDF line breaks (and an over-long line at
+    whitespace); stanzas shorter than min_chunk_size are packed together with
+    the next one. Every chunk is tagged with a section type: the explicit
+    marker when there is one, otherwise a guess - stanzas repeated within the
+    song are the chorus, a one-off stanza between the second and the last
+    chorus is the bridge, everything else is a verse.
+
+    Lyrics without blank lines or marker lines, such as the reflowed text
+    of the bundled PDFs, come out as one long verse cut at line breaks, so
+    the engines default to the recursive splitter.
+    """
+
+    def __init__(self, chunk_size: int = 500, min_chunk_size: int = 40):
+        """
+        Args:
+            chunk_size: Maximum number of characters per chunk
+            min_chunk_size: Stanzas shorter than this are merged with the next one
+        """
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+
+    def _split_stanzas(self, lyrics: str) -> List[Tuple[Optional[str], List[str]]]:
+        """Group lines into (explicit section label, lines) stanzas"""
+        stanzas = []
+        label = None
+        lines = []
+
+        for raw_line in lyrics.split("\n"):
+            line = raw_line.strip()
+            marker = _section_label(line) if line and len(line) <= MAX_MARKER_LENGTH else None
+
+            if not line or marker:
+                if lines:
+                    stanzas.append((label, lines))
+                    lines = []
+                    label = None
+                if marker:
+                    label = marker
+                continue
+
+            lines.append(line)
+
+        if lines:
+            stanzas.append((label, lines))
+        return stanzas
+
+    def _split_long(self, lines: List[str]) -> List[str]:
+        """Cut an over-long stanza into pieces of at most chunk_size characters"""
+        text = "\n".join(lines)
+        if len(text) <= self.chunk_size:
+            return [text]
+
+        pieces = []
+        current = []
+        length = 0
+
+        for line in lines:
+            # Hard-wrap a single line that does not fit on its own
+            while len(line) > self.chunk_size:
+                cut = line.rfind(" ", 0, self.chunk_size + 1)
+                if cut <= 0:
+                    cut = self.chunk_size
+                if current:
+                    pieces.append("\n".join(current))
+                    current = []
+                    length = 0
+                pieces.append(line[:cut].rstrip())
+                line = line[cut:].lstrip()
+
+            if not line:
+                continue
+
+            added = len(line) + (1 if current else 0)
+            if current and length + added > self.chunk_size:
+                pieces.append("\n".join(current))
+                current = []
+                length = 0
+                added = len(line)
+
+            current.append(line)
+            length += added
+
+        if current:
+            pieces.append("\n".join(current))
+        return pieces
+
+    def split_song(self, lyrics: str) -> List[LyricsChunk]:
+        """
+        Split the lyrics of one song into tagged chunks
+
+        Args:
+            lyrics: Full lyrics of the song
+
+        Returns:
+            Chunks in song order, each with its section type and index
+        """
+        stanzas = self._split_stanzas(lyrics)
+
+        # Count repeats to tell choruses from verses (lines are already stripped)
+        keys = [tuple(lines) for _, lines in stanzas]
+        counts = {}
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+
+        guessed = [
+            label or ("chorus" if counts[key] > 1 else "verse")
+            for (label, _), key in zip(stanzas, keys)
+        ]
+        chorus_positions = [i for i, section in enumerate(guessed) if section == "chorus"]
+        if len(chorus_positions) >= 2:
+            second_chorus, last_chorus = chorus_positions[1], chorus_positions[-1]
+            for i in range(second_chorus + 1, last_chorus):
+                if stanzas[i][0] is None and guessed[i] == "verse":
+                    guessed[i] = "bridge"
+
+        chunks = []
+        pending_text = None
+        pending_section = None
+
+        for (_, lines), stanza_section in zip(stanzas, guessed):
+            for piece in self._split_long(lines):
+                section = stanza_section
+                if pending_text is not None:
+                    merged = f"{pending_text}\n\n{piece}"
+                    if len(merged) <= self.chunk_size:
+                        piece, section = merged, pending_section
+                    else:
+                        chunks.append(LyricsChunk(pending_text, pending_section, len(chunks)))
+                    pending_text = None
+
+                if len(piece) < self.min_chunk_size:
+                    pending_text, pending_section = piece, section
+                else:
+                    chunks.append(LyricsChunk(piece, section, len(chunks)))
+
+        if pending_text is not None:
+            chunks.append(LyricsChunk(pending_text, pending_section, len(chunks)))
+        return chunks
+
+    def split_text(self, lyrics: str) -> List[str]:
+        """Split lyrics into chunk texts (drop-in for LangChain text splitters)"""
+        return [chunk.text for chunk in self.split_song(lyrics)]
+
+
+class RecursiveChunker:
+    """The generic character splitter behind the same interface as StanzaChunker"""
+
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+        """
+        Args:
+            chunk_size: Size of text chunks for splitting
+            chunk_overlap: Overlap between chunks
+        """
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", ". ", " ", ""]
+        )
+
+    def split_song(self, lyrics: str) -> List[LyricsChunk]:
+        return [
+            LyricsChunk(text, "unknown", index)
+            for index, text in enumerate(self.text_splitter.split_text(lyrics))
+        ]
+
+    def split_text(self, lyrics: str) -> List[str]:
+        return self.text_splitter.split_text(lyrics)
+
+
+def make_chunker(kind: str, chunk_size: int = 500, chunk_overlap: int = 50):
+    """
+    Create the chunker used for ingestion
+
+    Args:
+        kind: "stanza" for StanzaChunker, "recursive" for the character splitter
+        chunk_size: Maximum chunk size in characters
+        chunk_overlap: Overlap between chunks (recursive splitter only)
+
+    Returns:
+        An object with split_song() and split_text()
+    """
+    if kind == "stanza":
+        return StanzaChunker(chunk_size=chunk_size)
+    if kind == "recursive":
+        return RecursiveChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    raise ValueError(f"Unknown chunker: {kind}. Expected 'stanza' or 'recursive'")
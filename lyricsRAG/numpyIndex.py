@@ -0,0 +1,347 @@
+import os
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from lyricsRAG.persistentIndex import PersistentIndex, chunk_ids
+
+
+# Rows of a float16 matrix upcast to float32 per matrix multiply
+_UPCAST_BLOCK_ROWS = 16_384
+
+DTYPES = ("float32", "float16")
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a float32 matrix in place"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact cosine-similarity search over an in-process NumPy matrix
+
+    Chunk vectors are kept L2-normalized in one contiguous float32 (or
+    float16) matrix, so a search is a single matrix multiply followed by
+    argpartition - for one query or for a whole batch of them. Metadata
+    filters become boolean row masks, cached per (field, value).
+    """
+
+    def __init__(self, embedding: Embeddings, texts: List[str], metadatas: List[Dict[str, Any]],
+                 ids: List[str], vectors: np.ndarray, dtype: str = "float32", normalized: bool = False):
+        """
+        Args:
+            embedding: Embedding function used for queries
+            texts: Chunk texts
+            metadatas: Chunk metadata, one dict per chunk
+            ids: Chunk ids
+            vectors: Chunk embeddings, one row per chunk
+            dtype: "float32", or "float16" to halve the memory of the matrix; every
+                   search then upcasts the matrix, so float16 pays off for batches
+            normalized: The rows of vectors already have unit length
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype: {dtype}. Expected one of {DTYPES}")
+        self.embedding = embedding
+        self.texts = list(texts)
+        self.metadatas = list(metadatas)
+        self.ids = list(ids)
+        self.positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.dtype = np.dtype(dtype)
+        # A normalized matrix of the right dtype (e.g. memory-mapped) is used as is
+        if normalized and getattr(vectors, "dtype", None) == self.dtype:
+            self.matrix = vectors
+        elif normalized:
+            self.matrix = np.ascontiguousarray(vectors, dtype=self.dtype)
+        else:
+            self.matrix = self._prepare(vectors)
+        self._masks = {}
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    def _prepare(self, vectors: Any) -> np.ndarray:
+        """Normalize raw embeddings into a contiguous matrix of the store dtype"""
+        if not len(vectors):
+            # ndmin=2 would turn no vectors into one empty row
+            return np.zeros((0, 0), dtype=self.dtype)
+        matrix = _normalize_rows(np.array(vectors, dtype=np.float32, ndmin=2))
+        return np.ascontiguousarray(matrix, dtype=self.dtype)
+
+    def _field_mask(self, field: str, value: Any) -> np.ndarray:
+        """Rows whose metadata field equals value (or is one of a list of values)"""
+        key = (field, tuple(value) if isinstance(value, (list, tuple, set)) else value)
+        mask = self._masks.get(key)
+        if mask is None:
+            accepted = set(key[1]) if isinstance(key[1], tuple) else {key[1]}
+            mask = np.fromiter(
+                (metadata.get(field) in accepted for metadata in self.metadatas),
+                dtype=bool, count=len(self.metadatas)
+            )
+            self._masks[key] = mask
+        return mask
+
+    def mask(self, filter: Optional[Dict[str, Any]] = None) -> Optional[np.ndarray]:
+        """
+        Boolean row mask of a metadata filter
+
+        Args:
+            filter: {field: value} pairs that must all match; a list value
+                    matches any of its elements
+
+        Returns:
+            Mask over the rows, or None when nothing is filtered
+        """
+        if not filter:
+            return None
+        mask = None
+        for field, value in filter.items():
+            field_mask = self._field_mask(field, value)
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Cosine similarity of every query with every (selected) row"""
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if matrix.dtype == np.float32:
+            return queries @ matrix.T
+
+        # NumPy has no fast float16 matmul, so upcast the matrix block by block
+        scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), _UPCAST_BLOCK_ROWS):
+            block = matrix[start:start + _UPCAST_BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores
+
+    def search_by_vectors(self, queries: Any, k: int = 4,
+                          filter: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows for a batch of query vectors
+
+        Args:
+            queries: Query embeddings, one row per query
+            k: Number of results per query
+            filter: Metadata filter, see mask()
+
+        Returns:
+            (positions, scores), each of shape (queries, k') with k' <= k,
+            best match first
+        """
+        queries = _normalize_rows(np.array(queries, dtype=np.float32, ndmin=2))
+        mask = self.mask(filter)
+        rows = None if mask is None else np.flatnonzero(mask)
+
+        num_rows = len(self.matrix) if rows is None else len(rows)
+        k = min(k, num_rows)
+        if k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        scores = self._scores(queries, rows)
+        if k < num_rows:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(num_rows), (len(queries), num_rows))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        positions = top if rows is None else rows[top]
+        return positions, top_scores
+
+    def _document(self, position: int) -> Document:
+        return Document(
+            id=self.ids[position],
+            page_content=self.texts[position],
+            metadata=self.metadatas[position]
+        )
+
+    def similarity_search_with_score_by_vectors(self, embeddings: Any, k: int = 4,
+                                                filter: Optional[Dict[str, Any]] = None
+                                                ) -> List[List[Tuple[Document, float]]]:
+        """Documents and cosine similarities of the top-k rows for each query vector"""
+        positions, scores = self.search_by_vectors(embeddings, k, filter)
+        return [
+            [(self._document(int(position)), float(score)) for position, score in zip(row, row_scores)]
+            for row, row_scores in zip(positions, scores)
+        ]
+
+    def batch_similarity_search(self, queries: List[str], k: int = 4,
+                                filter: Optional[Dict[str, Any]] = None) -> List[List[Document]]:
+        """
+        Search many queries with a single matrix multiply
+
+        Args:
+            queries: Query texts
+            k: Number of results per query
+            filter: Metadata filter, see mask()
+
+        Returns:
+            One list of documents per query
+        """
+        vectors = [self.embedding.embed_query(query) for query in queries]
+        return [
+            [doc for doc, _ in results]
+            for results in self.similarity_search_with_score_by_vectors(vectors, k, filter)
+        ]
+
+    async def abatch_similarity_search(self, queries: List[str], k: int = 4,
+                                       filter: Optional[Dict[str, Any]] = None) -> List[List[Document]]:
+        """Async version of batch_similarity_search; the queries are embedded concurrently"""
+        vectors = await asyncio.gather(*(self.embedding.aembed_query(query) for query in queries))
+        return [
+            [doc for doc, _ in results]
+            for results in self.similarity_search_with_score_by_vectors(vectors, k, filter)
+        ]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vectors([embedding], k, filter)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4,
+                          filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Map cosine similarity from [-1, 1] onto [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(len(self.ids) + i) for i in range(len(texts))]
+        vectors = self._prepare(self.embedding.embed_documents(texts))
+
+        for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+            position = self.positions.get(doc_id)
+            if position is None:
+                self.positions[doc_id] = len(self.ids)
+                self.ids.append(doc_id)
+                self.texts.append(text)
+                self.metadatas.append(metadata)
+                self.matrix = np.vstack([self.matrix, vector[None, :]]) if len(self.matrix) else vector[None, :]
+            else:
+                self.texts[position] = text
+                self.metadatas[position] = metadata
+                self.matrix[position] = vector
+        self._masks.clear()
+        return ids
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        return [self._document(self.positions[doc_id]) for doc_id in ids if doc_id in self.positions]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, *,
+                   ids: Optional[List[str]] = None, **kwargs: Any) -> "NumpyVectorStore":
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(i) for i in range(len(texts))]
+        return cls(embedding, texts, metadatas, ids, embedding.embed_documents(texts), **kwargs)
+
+
+class NumpyIndex(PersistentIndex):
+    """
+    NumPy exact-search index of a corpus, saved as a memory-mapped .npy matrix
+
+    Like the FAISS index, chunks are embedded while they stream in and the
+    matrix is assembled once by finish(); the manifest holds the documents.
+    """
+
+    backend = "numpy"
+    manifest_suffix = ".numpy.json"
+
+    def __init__(self, fingerprint: str, persist_directory: Optional[str] = None, dtype: str = "float32"):
+        """
+        Args:
+            fingerprint: Corpus fingerprint from corpus_fingerprint
+            persist_directory: Directory of the saved indexes (None keeps the index in memory)
+            dtype: "float32", or "float16" to halve the memory of the matrix
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype: {dtype}. Expected one of {DTYPES}")
+        super().__init__(fingerprint, persist_directory)
+        self.dtype = dtype
+        self.embeddings = None
+        self.ids = []
+
+    @property
+    def matrix_path(self) -> Optional[str]:
+        if not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, f"{self.name}.{self.dtype}.npy")
+
+    def open_existing(self, embeddings: Embeddings) -> Optional[Tuple[VectorStore, Dict[str, Any]]]:
+        manifest = self.load_manifest()
+        if manifest is None:
+            return None
+
+        try:
+            # Copy-on-write: rows are paged in on demand, and an update of the reopened
+            # store copies only the pages it touches instead of writing to the file
+            matrix = np.load(self.matrix_path, mmap_mode="c")
+        except (OSError, ValueError) as e:
+            print(f"Could not open saved matrix {self.matrix_path}: {e}")
+            return None
+
+        if len(matrix) != len(manifest["texts"]):
+            return None
+
+        texts, metadatas = manifest["texts"], manifest["metadatas"]
+        self.vectorstore = NumpyVectorStore(
+            embeddings, texts, metadatas, chunk_ids(metadatas), matrix, dtype=self.dtype, normalized=True
+        )
+        return self.vectorstore, manifest
+
+    def begin(self, embeddings: Embeddings) -> None:
+        self.embeddings = embeddings
+        self.ids = []
+        if self.persist_directory and os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+    def add(self, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> None:
+        # Vectors are kept by the (precomputed) embeddings until finish() builds the matrix
+        self.embeddings.embed_documents(texts)
+        self.ids.extend(ids)
+
+    def update(self, ids: List[str], documents: List[Document]) -> None:
+        # Nothing is stored before finish(), which reads the final metadata
+        pass
+
+    def vectors(self, metadatas: List[Dict[str, Any]]) -> np.ndarray:
+        # The matrix rows are already in corpus order
+        return np.asarray(self.vectorstore.matrix, dtype=np.float32)
+
+    def finish(self, songs: Dict[str, Dict[str, str]], texts: List[str],
+               metadatas: List[Dict[str, Any]]) -> VectorStore:
+        self.vectorstore = NumpyVectorStore(
+            self.embeddings, texts, metadatas, self.ids,
+            self.embeddings.embed_documents(texts), dtype=self.dtype
+        )
+        print(f"Built {self.dtype} NumPy index over {len(texts)} chunks")
+
+        if self.persist_directory:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            tmp_path = f"{self.matrix_path}.tmp.npy"
+            np.save(tmp_path, self.vectorstore.matrix)
+            os.replace(tmp_path, self.matrix_path)
+            self.save_manifest(songs, texts, metadatas, dtype=self.dtype)
+        return self.vectorstore
@@ -0,0 +1,410 @@
+import io
+import os
+import mmap
+import queue
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import AsyncIterator, BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+# PDF extraction
+import fitz  # PyMuPDF
+
+
+# A lyrics PDF: a path, its bytes (bytes, bytearray, memoryview) or a binary file object
+PdfSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+# A song header page as (title, artist, lyric lines after the header)
+SongHeader = Tuple[str, str, List[str]]
+
+# A complete song as (song, artist, lyrics)
+SongRecord = Tuple[str, str, str]
+
+# Marks the end of a prefetched stream
+_END_OF_STREAM = object()
+
+
+def is_pdf_path(source: PdfSource) -> bool:
+    """Whether a PDF source is a path on disk rather than data in memory"""
+    return isinstance(source, (str, os.PathLike))
+
+
+def pdf_name(source: PdfSource) -> str:
+    """Name of a PDF source for logs and chunk metadata"""
+    if is_pdf_path(source):
+        return os.fspath(source)
+    # Files opened from a descriptor (e.g. pipes) are named by its number
+    name = getattr(source, "name", None)
+    return name if isinstance(name, str) and name else "in-memory PDF"
+
+
+def check_pdf_source(source: PdfSource) -> None:
+    """Raise FileNotFoundError if a path source does not exist"""
+    if is_pdf_path(source) and not os.path.exists(source):
+        raise FileNotFoundError(f"PDF file not found: {os.fspath(source)}")
+
+
+def rereadable_pdf_source(source: PdfSource) -> PdfSource:
+    """
+    The source itself, or its bytes if it is a stream that can only be read once
+
+    The engines read a source several times (hash, page count, parsing), so
+    a non-seekable file object such as a pipe is read into memory up front.
+    """
+    if is_pdf_path(source) or isinstance(source, (bytes, bytearray, memoryview)) or source.seekable():
+        return source
+    return source.read()
+
+
+@contextmanager
+def pdf_buffer(source: PdfSource) -> Iterator[memoryview]:
+    """
+    Read-only view of the bytes of a PDF source, copied only when unavoidable
+
+    Bytes-like sources are viewed in place, BytesIO objects (including
+    Streamlit uploads) through getbuffer() and files on disk, by path or
+    open file object, are memory-mapped, so the OS pages them in on demand
+    instead of reading them into the heap. Other file objects are read once.
+
+    Args:
+        source: PDF path, bytes or binary file object
+
+    Yields:
+        Memoryview of the PDF bytes, released when the block exits
+    """
+    mapped = None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+    elif isinstance(source, io.BytesIO):
+        view = source.getbuffer()
+    elif is_pdf_path(source) or hasattr(source, "fileno"):
+        try:
+            if is_pdf_path(source):
+                with open(source, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped)
+        except (ValueError, OSError, io.UnsupportedOperation):
+            # Empty files and pipes cannot be mapped
+            if is_pdf_path(source):
+                with open(source, "rb") as f:
+                    view = memoryview(f.read())
+            else:
+                view = memoryview(_read_all(source))
+    else:
+        view = memoryview(_read_all(source))
+
+    try:
+        yield view
+    finally:
+        view.release()
+        if mapped is not None:
+            mapped.close()
+
+
+def _read_all(f: BinaryIO) -> bytes:
+    """Whole content of a file object, from its start when it can seek"""
+    if f.seekable():
+        f.seek(0)
+    return f.read()
+
+
+@contextmanager
+def open_pdf(source: PdfSource) -> Iterator[fitz.Document]:
+    """
+    Open a PDF source with PyMuPDF straight from its bytes (see pdf_buffer)
+
+    Args:
+        source: PDF path, bytes or binary file object
+
+    Yields:
+        The open document, closed when the block exits
+    """
+    check_pdf_source(source)
+    with pdf_buffer(source) as view:
+        if not len(view):
+            raise ValueError(f"PDF is empty: {pdf_name(source)}")
+        doc = fitz.open(stream=view, filetype="pdf")
+        try:
+            yield doc
+        finally:
+            doc.close()
+
+
+def pdf_sha256(source: PdfSource) -> str:
+    """Hex digest of the SHA-256 of a PDF source's bytes"""
+    check_pdf_source(source)
+    with pdf_buffer(source) as view:
+        return hashlib.sha256(view).hexdigest()
+
+
+def pdf_page_count(source: PdfSource) -> int:
+    """Number of pages of a PDF source"""
+    with open_pdf(source) as doc:
+        return len(doc)
+
+
+def parse_song_header(text: str) -> Optional[SongHeader]:
+    """
+    Parse the title/artist header at the top of a PDF page
+
+    Args:
+        text: Raw text of a single page
+
+    Returns:
+        (title, artist, lyric lines) if the page starts a song, otherwise None
+    """
+    lines = text.split('\n')
+    if len(lines) >= 2:
+        # First line is typically the song title, second line starts with "by"
+        artist_line = lines[1].strip()
+        if artist_line.startswith("by "):
+            return lines[0].strip(), artist_line[3:].strip(), lines[2:]
+    return None
+
+
+def extract_page_headers(pdf_path: str, start: int, stop: int) -> List[SongHeader]:
+    """
+    Parse the song headers of a contiguous range of pages
+
+    Runs inside a worker process, so the document is opened per call; it is
+    memory-mapped, so every worker shares the OS page cache of the file.
+
+    Args:
+        pdf_path: Path to the PDF file
+        start: First page number (inclusive)
+        stop: Last page number (exclusive)
+
+    Returns:
+        Song headers found in the range, in page order
+    """
+    with open_pdf(pdf_path) as doc:
+        headers = []
+        for page_num in range(start, stop):
+            header = parse_song_header(doc.load_page(page_num).get_text())
+            if header:
+                headers.append(header)
+        return headers
+
+
+def shard_page_ranges(page_count: int, num_shards: int, first_page: int = 1) -> List[Tuple[int, int]]:
+    """
+    Split the pages of a document into contiguous, ordered ranges
+
+    Args:
+        page_count: Total number of pages in the document
+        num_shards: Desired number of ranges
+        first_page: First page to include (the title page is skipped by default)
+
+    Returns:
+        List of (start, stop) page ranges covering first_page..page_count
+    """
+    total = max(0, page_count - first_page)
+    num_shards = max(1, min(num_shards, total))
+    size, remainder = divmod(total, num_shards)
+
+    ranges = []
+    start = first_page
+    for shard in range(num_shards):
+        stop = start + size + (1 if shard < remainder else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+class SongAssembler:
+    """
+    Turns song header pages, fed in page order, into complete songs
+
+    A song stays open until a header with a different title arrives, so the
+    boundary of a song is only known once the next one starts. Feeding the
+    headers of every shard through one assembler in shard order therefore
+    gives exactly the songs of a single serial pass, including songs whose
+    pages straddle a shard edge.
+    """
+
+    def __init__(self):
+        self.current_song = "Unknown Song"
+        self.current_artist = "Unknown Artist"
+        self.current_lyrics = []
+
+    def feed(self, header: SongHeader) -> Optional[SongRecord]:
+        """
+        Consume one song header page
+
+        Args:
+            header: (title, artist, lyric lines) as returned by parse_song_header
+
+        Returns:
+            (song, artist, lyrics) for the song closed by this page, if any
+        """
+        song_title, artist, lyric_lines = header
+        completed = None
+
+        # Store previous song if we have one
+        if self.current_lyrics and self.current_song != song_title:
+            completed = (self.current_song, self.current_artist, "\n".join(self.current_lyrics))
+            self.current_lyrics = []
+
+        # Update current song and artist
+        self.current_song = song_title
+        self.current_artist = artist
+
+        # Get lyrics (everything after the second line)
+        if lyric_lines:
+            self.current_lyrics = lyric_lines
+
+        return completed
+
+    def finish(self) -> Optional[SongRecord]:
+        """
+        Close the last open song
+
+        Returns:
+            (song, artist, lyrics) for the last song, if it has lyrics
+        """
+        if self.current_lyrics:
+            completed = (self.current_song, self.current_artist, "\n".join(self.current_lyrics))
+            self.current_lyrics = []
+            return completed
+        return None
+
+
+def iter_pdf_songs(pdf_path: PdfSource, on_page: Optional[Callable[[int, int], None]] = None) -> Iterator[SongRecord]:
+    """
+    Yield songs from a lyrics PDF as soon as each one is complete
+
+    Args:
+        pdf_path: Path to the PDF file, or its bytes or file object (see pdf_buffer)
+        on_page: Called with (pages parsed, pages to parse) after each page
+
+    Yields:
+        (song, artist, lyrics) records in page order
+    """
+    with open_pdf(pdf_path) as doc:
+        assembler = SongAssembler()
+
+        # Skip the title page (first page)
+        for page_num in range(1, len(doc)):
+            header = parse_song_header(doc.load_page(page_num).get_text())
+            if on_page:
+                on_page(page_num, len(doc) - 1)
+            if header:
+                completed = assembler.feed(header)
+                if completed:
+                    yield completed
+
+        # Store the last song
+        completed = assembler.finish()
+        if completed:
+            yield completed
+
+
+def iter_prefetched(items: Iterable, maxsize: int) -> Iterator:
+    """
+    Produce items on a background thread while the caller consumes them
+
+    At most maxsize items are buffered, so a slow consumer throttles the
+    producer instead of letting the whole stream pile up in memory.
+
+    Args:
+        items: Iterable to drain on the background thread
+        maxsize: Capacity of the queue between producer and consumer
+
+    Yields:
+        The items of the iterable, in order
+    """
+    buffer = queue.Queue(maxsize=max(1, maxsize))
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:  # Re-raised on the consumer side
+            put((_END_OF_STREAM, e))
+            return
+        put((_END_OF_STREAM, None))
+
+    producer = threading.Thread(target=produce, name="lyrics-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if isinstance(item, tuple) and len(item) == 2 and item[0] is _END_OF_STREAM:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            yield item
+    finally:
+        # Release the producer if the consumer stops early
+        stopped.set()
+
+
+async def aiter_prefetched(items: Iterable, maxsize: int) -> AsyncIterator:
+    """
+    Async counterpart of iter_prefetched
+
+    The blocking iterable is drained on a background thread and handed to
+    the event loop through a bounded asyncio queue.
+
+    Args:
+        items: Iterable to drain on the background thread
+        maxsize: Capacity of the queue between producer and consumer
+
+    Yields:
+        The items of the iterable, in order
+    """
+    loop = asyncio.get_running_loop()
+    buffer = asyncio.Queue()
+    # Free slots in the buffer; released by the consumer after each item
+    slots = threading.Semaphore(max(1, maxsize))
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            if slots.acquire(timeout=0.1):
+                try:
+                    loop.call_soon_threadsafe(buffer.put_nowait, item)
+                except RuntimeError:  # Event loop already closed
+                    return False
+                return True
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:  # Re-raised on the consumer side
+            put((_END_OF_STREAM, e))
+            return
+        put((_END_OF_STREAM, None))
+
+    producer = threading.Thread(target=produce, name="lyrics-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = await buffer.get()
+            slots.release()
+            if isinstance(item, tuple) and len(item) == 2 and item[0] is _END_OF_STREAM:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            yield item
+    finally:
+        # Release the producer if the consumer stops early
+        stopped.set()
@@ -0,0 +1,246 @@
+import os
+import json
+import tempfile
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_chroma import Chroma
+
+
+# Default location of the persistent vector indexes
+DEFAULT_PERSIST_DIRECTORY = os.path.join(".lyrics_cache", "index")
+
+
+def collection_name(fingerprint: str) -> str:
+    """Chroma collection name of a corpus (3-512 characters of [a-zA-Z0-9._-])"""
+    return f"lyrics-{fingerprint[:48]}"
+
+
+def chunk_ids(metadatas: List[Dict[str, Any]], start: int = 0) -> List[str]:
+    """
+    Deterministic ids of a batch of chunks
+
+    Deduplicated chunks are identified by their chunk id, others by their
+    position in the corpus, so re-indexing the same corpus is an idempotent upsert.
+
+    Args:
+        metadatas: Metadata of the chunks in the batch
+        start: Position of the first chunk of the batch in the corpus
+
+    Returns:
+        One id per chunk
+    """
+    return [metadata.get("chunk_id", str(start + i)) for i, metadata in enumerate(metadatas)]
+
+
+def make_index(backend: str, fingerprint: str, persist_directory: Optional[str] = None, **options):
+    """
+    Create the vector index of a corpus
+
+    Args:
+        backend: "chroma", "faiss" or "numpy"
+        fingerprint: Corpus fingerprint from corpus_fingerprint
+        persist_directory: Directory of the on-disk indexes (None keeps the index in memory)
+        **options: Backend specific settings (index_type for FAISS, dtype for NumPy)
+
+    Returns:
+        A PersistentIndex
+    """
+    if backend == "chroma":
+        return PersistentIndex(fingerprint, persist_directory)
+    if backend == "faiss":
+        # Imported lazily so Chroma-only installs do not need faiss
+        from lyricsRAG.faissIndex import FaissIndex
+        return FaissIndex(fingerprint, persist_directory, **options)
+    if backend == "numpy":
+        from lyricsRAG.numpyIndex import NumpyIndex
+        return NumpyIndex(fingerprint, persist_directory, **options)
+    raise ValueError(f"Unknown vector store: {backend}. Expected 'chroma', 'faiss' or 'numpy'")
+
+
+class PersistentIndex:
+    """
+    Chroma collection named after the corpus fingerprint
+
+    Every corpus gets its own collection instead of the shared default one,
+    so engines over different PDFs never see each other's chunks. With a
+    persist_directory the collection lives on disk next to a manifest holding
+    the parsed songs and chunk list. The manifest is only written once a build
+    has finished, so its presence marks the collection as complete and a later
+    run with the same fingerprint can open it without parsing or embedding.
+
+    A build goes through begin(), add() for every batch of chunks, update()
+    for chunks whose metadata changed afterwards, and finish().
+    """
+
+    backend = "chroma"
+    manifest_suffix = ".json"
+
+    def __init__(self, fingerprint: str, persist_directory: Optional[str] = None):
+        """
+        Args:
+            fingerprint: Corpus fingerprint from corpus_fingerprint
+            persist_directory: Directory of the on-disk collections (None keeps
+                               the collection in memory)
+        """
+        self.fingerprint = fingerprint
+        self.persist_directory = persist_directory
+        self.name = collection_name(fingerprint)
+        self.vectorstore = None
+
+    @property
+    def manifest_path(self) -> Optional[str]:
+        if not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, f"{self.name}{self.manifest_suffix}")
+
+    @property
+    def themes_path(self) -> Optional[str]:
+        """Theme table of this corpus, saved next to the manifest (see themeAnalytics)"""
+        if not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, f"{self.name}.themes.json")
+
+    def _chroma(self, embeddings: Embeddings, create: bool = True) -> Chroma:
+        return Chroma(
+            collection_name=self.name,
+            embedding_function=embeddings,
+            persist_directory=self.persist_directory,
+            collection_metadata={"fingerprint": self.fingerprint},
+            create_collection_if_not_exists=create
+        )
+
+    def open_existing(self, embeddings: Embeddings) -> Optional[Tuple[VectorStore, Dict[str, Any]]]:
+        """
+        Open a completed index of this corpus
+
+        Args:
+            embeddings: Embedding function used for queries
+
+        Returns:
+            (vector store, manifest) where the manifest holds songs, texts and
+            metadatas, or None if there is no complete index on disk
+        """
+        manifest = self.load_manifest()
+        if manifest is None:
+            return None
+
+        try:
+            vectorstore = self._chroma(embeddings, create=False)
+            indexed = len(vectorstore.get(include=[])["ids"])
+        except Exception as e:
+            print(f"Could not open persisted collection {self.name}: {e}")
+            return None
+
+        if indexed != len(manifest["texts"]):
+            return None
+        self.vectorstore = vectorstore
+        return vectorstore, manifest
+
+    def begin(self, embeddings: Embeddings) -> None:
+        """
+        Start building the index into an empty collection
+
+        Leftovers of an interrupted build are cleared first. In-memory
+        collections are kept as they are: chunk ids are deterministic, so
+        rebuilding the same corpus upserts the same entries.
+
+        Args:
+            embeddings: Embedding function used for documents and queries
+        """
+        self.vectorstore = self._chroma(embeddings)
+        if self.persist_directory:
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+            self.vectorstore.reset_collection()
+
+    def add(self, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> None:
+        """Embed a batch of chunks and add it to the index"""
+        self.vectorstore.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+
+    def update(self, ids: List[str], documents: List[Document]) -> None:
+        """Replace the stored metadata of chunks that were already added"""
+        self.vectorstore.update_documents(ids=ids, documents=documents)
+
+    def finish(self, songs: Dict[str, Dict[str, str]], texts: List[str],
+               metadatas: List[Dict[str, Any]]) -> VectorStore:
+        """
+        Complete the build and mark it as reusable
+
+        Args:
+            songs: Parsed songs as {song: {"artist": ..., "lyrics": ...}}
+            texts: Indexed chunk texts
+            metadatas: Metadata of the indexed chunks
+
+        Returns:
+            The vector store to retrieve from
+        """
+        self.save_manifest(songs, texts, metadatas)
+        return self.vectorstore
+
+    def vectors(self, metadatas: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Stored vectors of the indexed chunks, read back without embedding anything
+
+        Args:
+            metadatas: Metadata of the indexed chunks, in corpus order
+
+        Returns:
+            float32 matrix with one row per chunk, in corpus order
+        """
+        stored = self.vectorstore.get(include=["embeddings"])
+        rows = {chunk: i for i, chunk in enumerate(stored["ids"])}
+        matrix = np.asarray(stored["embeddings"], dtype=np.float32)
+        return matrix[[rows[chunk] for chunk in chunk_ids(metadatas)]]
+
+    def load_manifest(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the songs and chunks of a completed build
+
+        Returns:
+            Dict with songs, texts and metadatas, or None if there is none
+        """
+        if not self.manifest_path:
+            return None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("fingerprint") != self.fingerprint:
+            return None
+        return manifest
+
+    def save_manifest(self, songs: Dict[str, Dict[str, str]], texts: List[str],
+                      metadatas: List[Dict[str, Any]], **extra) -> None:
+        """
+        Mark the index as complete by writing its manifest
+
+        Args:
+            songs: Parsed songs as {song: {"artist": ..., "lyrics": ...}}
+            texts: Indexed chunk texts
+            metadatas: Metadata of the indexed chunks
+            **extra: Backend specific fields stored alongside
+        """
+        if not self.manifest_path:
+            return
+
+        os.makedirs(self.persist_directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{self.name}-", dir=self.persist_directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({
+                    "fingerprint": self.fingerprint,
+                    **extra,
+                    "songs": songs,
+                    "texts": texts,
+                    "metadatas": metadatas
+                }, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            print(f"Could not write index manifest: {e}")
@@ -0,0 +1,269 @@
+import math
+import time
+import asyncio
+import threading
+import statistics
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+from typing import List, Dict, Any, Optional, Tuple
+
+from pydantic import ConfigDict
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+
+from lyricsRAG.chunkDedup import chunk_id
+from lyricsRAG.asyncSearch import asimilarity_search
+
+
+# Cross-encoder used in experiments/FlashRankReranker-RAG.ipynb
+DEFAULT_RERANK_MODEL = "ms-marco-MiniLM-L-12-v2"
+
+# Rankers loaded in this process, one per (model, cache dir)
+_RANKERS = {}
+
+
+def _get_ranker(model_name: str, cache_dir: Optional[str] = None):
+    """Load a FlashRank model once per process"""
+    key = (model_name, cache_dir)
+    ranker = _RANKERS.get(key)
+    if ranker is None:
+        # Imported lazily so flashrank is only needed when reranking is enabled
+        from flashrank import Ranker
+        kwargs = {"cache_dir": cache_dir} if cache_dir else {}
+        ranker = _RANKERS[key] = Ranker(model_name=model_name, **kwargs)
+    return ranker
+
+
+def warm_up(model_name: str, cache_dir: Optional[str] = None) -> None:
+    """Load the model in a worker ahead of the first query"""
+    _get_ranker(model_name, cache_dir)
+
+
+def score_passages(model_name: str, query: str, texts: List[str], cache_dir: Optional[str] = None) -> List[float]:
+    """
+    Cross-encoder relevance of each passage to the query
+
+    Runs in a process pool worker, so it only takes and returns plain values.
+
+    Args:
+        model_name: FlashRank model name
+        query: Search query
+        texts: Passages to score
+        cache_dir: Directory the model is downloaded to
+
+    Returns:
+        One score per passage, in input order
+    """
+    from flashrank import RerankRequest
+    ranker = _get_ranker(model_name, cache_dir)
+    results = ranker.rerank(RerankRequest(
+        query=query,
+        passages=[{"id": i, "text": text} for i, text in enumerate(texts)]
+    ))
+
+    scores = [0.0] * len(texts)
+    for result in results:
+        scores[result["id"]] = float(result["score"])
+    return scores
+
+
+class RerankScoreCache:
+    """Thread-safe LRU cache of reranker scores keyed by (query, chunk id)"""
+
+    def __init__(self, max_entries: int = 10_000):
+        """
+        Args:
+            max_entries: Maximum number of scores kept before evicting
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, query: str, keys: List[str]) -> List[Optional[float]]:
+        """Cached score of each chunk for the query, None where unknown"""
+        scores = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get((query, key))
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._scores.move_to_end((query, key))
+                    self.hits += 1
+                scores.append(score)
+        return scores
+
+    def put_many(self, query: str, keys: List[str], scores: List[float]) -> None:
+        """Remember the scores of several chunks for the query"""
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._scores[(query, key)] = score
+                self._scores.move_to_end((query, key))
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+
+class FlashRankReranker:
+    """
+    Second retrieval stage that reorders candidates with a FlashRank cross-encoder
+
+    Candidates whose score for the query is not cached are split into
+    batches and scored in parallel on the given executor (normally the
+    engine's process pool). Every call records how much latency the
+    reranking added.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, model_name: str = DEFAULT_RERANK_MODEL,
+                 top_n: int = 5, score_threshold: float = 0.0, batch_size: int = 10,
+                 cache_size: int = 10_000, cache_dir: Optional[str] = None, history_size: int = 1000):
+        """
+        Args:
+            executor: Pool the scoring batches run on (None scores in the calling thread)
+            model_name: FlashRank model name
+            top_n: Number of documents kept after reranking
+            score_threshold: Documents scoring below this are dropped (the
+                             best one is always kept so the prompt has context)
+            batch_size: Passages scored per worker task
+            cache_size: Maximum number of cached (query, chunk) scores
+            cache_dir: Directory the model is downloaded to
+            history_size: Number of per-query timings kept for stats()
+        """
+        self.executor = executor
+        self.model_name = model_name
+        self.top_n = top_n
+        self.score_threshold = score_threshold
+        self.batch_size = batch_size
+        self.cache_dir = cache_dir
+        self.cache = RerankScoreCache(cache_size)
+        self.history = deque(maxlen=history_size)
+
+    def _score(self, query: str, texts: List[str]) -> List[float]:
+        """Score passages, fanning batches out over the executor"""
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if self.executor is None:
+            return [score for batch in batches for score in score_passages(self.model_name, query, batch, self.cache_dir)]
+
+        futures = [
+            self.executor.submit(score_passages, self.model_name, query, batch, self.cache_dir)
+            for batch in batches
+        ]
+        return [score for future in futures for score in future.result()]
+
+    async def _ascore(self, query: str, texts: List[str]) -> List[float]:
+        """Score passages without blocking the event loop on the executor"""
+        if self.executor is None:
+            return self._score(query, texts)
+
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(
+            asyncio.wrap_future(self.executor.submit(score_passages, self.model_name, query, batch, self.cache_dir))
+            for batch in batches
+        ))
+        return [score for batch_scores in results for score in batch_scores]
+
+    def _cached_scores(self, query: str, documents: List[Document]) -> Tuple[List[str], List[Optional[float]], List[int]]:
+        """Cache keys, cached scores and positions of the documents still to be scored"""
+        keys = [doc.metadata.get("chunk_id") or chunk_id(doc.page_content) for doc in documents]
+        scores = self.cache.get_many(query, keys)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        return keys, scores, missing
+
+    def _select(self, query: str, documents: List[Document], keys: List[str], scores: List[Optional[float]],
+                missing: List[int], fresh: List[float], start: float) -> List[Tuple[Document, float]]:
+        """Cache fresh scores, keep the best documents and record the timing"""
+        if missing:
+            self.cache.put_many(query, [keys[i] for i in missing], fresh)
+            for i, score in zip(missing, fresh):
+                scores[i] = score
+
+        ranked = sorted(zip(documents, scores), key=lambda pair: pair[1], reverse=True)
+        kept = [pair for pair in ranked[:self.top_n] if pair[1] >= self.score_threshold] or ranked[:1]
+
+        self.history.append({
+            "candidates": len(documents),
+            "scored": len(missing),
+            "cached": len(documents) - len(missing),
+            "kept": len(kept),
+            "rerank_ms": (time.perf_counter() - start) * 1000
+        })
+
+        return [
+            (Document(page_content=doc.page_content, metadata=dict(doc.metadata, rerank_score=score)), score)
+            for doc, score in kept
+        ]
+
+    def rerank_with_scores(self, query: str, documents: List[Document]) -> List[Tuple[Document, float]]:
+        """
+        Reorder retrieved documents by cross-encoder relevance
+
+        Args:
+            query: Search query
+            documents: First-stage candidates
+
+        Returns:
+            Up to top_n (document, score) pairs, best first; each document is
+            a copy with its score under metadata["rerank_score"]
+        """
+        start = time.perf_counter()
+        keys, scores, missing = self._cached_scores(query, documents)
+        fresh = self._score(query, [documents[i].page_content for i in missing]) if missing else []
+        return self._select(query, documents, keys, scores, missing, fresh, start)
+
+    async def arerank_with_scores(self, query: str, documents: List[Document]) -> List[Tuple[Document, float]]:
+        """Async version of rerank_with_scores that awaits the scoring batches"""
+        start = time.perf_counter()
+        keys, scores, missing = self._cached_scores(query, documents)
+        fresh = await self._ascore(query, [documents[i].page_content for i in missing]) if missing else []
+        return self._select(query, documents, keys, scores, missing, fresh, start)
+
+    def rerank(self, query: str, documents: List[Document]) -> List[Document]:
+        """Reorder retrieved documents by cross-encoder relevance, keeping top_n"""
+        return [doc for doc, _ in self.rerank_with_scores(query, documents)]
+
+    async def arerank(self, query: str, documents: List[Document]) -> List[Document]:
+        """Async version of rerank"""
+        return [doc for doc, _ in await self.arerank_with_scores(query, documents)]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Latency added by reranking and score cache counters
+
+        Returns:
+            Dict with queries, p50_ms, p95_ms, mean_ms, cache hits, misses and hit_rate
+        """
+        timings = sorted(entry["rerank_ms"] for entry in self.history)
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            "queries": len(timings),
+            "p50_ms": statistics.median(timings) if timings else 0.0,
+            "p95_ms": timings[max(0, math.ceil(0.95 * len(timings)) - 1)] if timings else 0.0,
+            "mean_ms": statistics.fmean(timings) if timings else 0.0,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_hit_rate": self.cache.hits / lookups if lookups else 0.0
+        }
+
+
+class RerankingRetriever(BaseRetriever):
+    """Retriever that over-fetches from a vector store and reranks the candidates"""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: VectorStore
+    reranker: FlashRankReranker
+    fetch_k: int = 40
+    executor: Optional[Executor] = None
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        candidates = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        return self.reranker.rerank(query, candidates)
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        candidates = await asimilarity_search(self.vectorstore, query, k=self.fetch_k, executor=self.executor)
+        return await self.reranker.arerank(query, candidates)
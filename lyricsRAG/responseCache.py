@@ -0,0 +1,178 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from lyricsRAG.chunkDedup import chunk_id
+
+
+class ResponseKey(NamedTuple):
+    """Where a response is cached: exact key, model namespace and the prompt's embedding"""
+
+    key: str
+    namespace: str
+    embedding: Optional[np.ndarray]
+
+
+def llm_namespace(kind: str, llm) -> str:
+    """Responses are only shared between calls of the same kind, model and temperature"""
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    return f"{kind}:{model}:{getattr(llm, 'temperature', None)}"
+
+
+def response_key(namespace: str, question: str, docs: List[Document]) -> str:
+    """Exact-match key of a prompt answered from these retrieved chunks"""
+    ids = [doc.metadata.get("chunk_id") or chunk_id(doc.page_content) for doc in docs]
+    return hashlib.sha256(json.dumps([namespace, question, ids]).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of model responses with a time to live
+
+    The exact tier answers a prompt that was sent before with the same
+    retrieved chunks to the same model at the same temperature. The
+    optional similarity tier also answers a prompt whose embedding is at
+    least similarity_threshold cosine-similar to a cached one of the same
+    namespace, whatever chunks it retrieved; it costs a scan of the cached
+    embeddings and a query embedding, which the engines' query embedding
+    cache already holds from retrieval.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = 3600,
+                 embeddings: Optional[Embeddings] = None, similarity_threshold: Optional[float] = None):
+        """
+        Args:
+            max_entries: Maximum number of responses kept before evicting the least recently used
+            ttl_seconds: Seconds a response stays valid (None keeps it until evicted)
+            embeddings: Embeddings of the similarity tier
+            similarity_threshold: Smallest cosine similarity of a similarity hit
+                                  (None disables the tier)
+        """
+        if similarity_threshold is not None and embeddings is None:
+            raise ValueError("The similarity tier needs embeddings")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embedding(self, vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _get(self, entry_key: ResponseKey) -> Optional[str]:
+        """Cached response of the key, or of the most similar prompt above the threshold"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(entry_key.key)
+            if entry is not None and entry["expires"] is not None and entry["expires"] <= now:
+                del self._entries[entry_key.key]
+                self.expired += 1
+            elif entry is not None:
+                self._entries.move_to_end(entry_key.key)
+                self.hits += 1
+                return entry["response"]
+
+            if entry_key.embedding is not None:
+                best_key, best_score = None, self.similarity_threshold
+                for key, entry in self._entries.items():
+                    if entry["namespace"] != entry_key.namespace or entry["embedding"] is None:
+                        continue
+                    if entry["expires"] is not None and entry["expires"] <= now:
+                        continue
+                    score = float(entry["embedding"] @ entry_key.embedding)
+                    if score >= best_score:
+                        best_key, best_score = key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.similar_hits += 1
+                    return self._entries[best_key]["response"]
+
+            self.misses += 1
+            return None
+
+    def lookup(self, kind: str, question: str, docs: List[Document], llm,
+                   refresh: bool = False) -> Tuple[Optional[str], ResponseKey]:
+        """
+        Cached response of a prompt about to be sent
+
+        Args:
+            kind: Kind of call, e.g. "lyrics" or "chat"
+            question: Prompt or standalone question filled into the template
+            docs: Chunks retrieved for it
+            llm: Chat model that would answer it
+            refresh: Skip the lookup, only build the key to store a new response under
+
+        Returns:
+            The cached response or None, and the key to store the fresh response under
+        """
+        namespace = llm_namespace(kind, llm)
+        embedding = None
+        if self.similarity_threshold is not None:
+            embedding = self._embedding(self.embeddings.embed_query(question))
+        entry_key = ResponseKey(response_key(namespace, question, docs), namespace, embedding)
+        return (None if refresh else self._get(entry_key)), entry_key
+
+    async def alookup(self, kind: str, question: str, docs: List[Document], llm,
+                          refresh: bool = False) -> Tuple[Optional[str], ResponseKey]:
+        """Async version of lookup, awaiting the embeddings' aembed_query"""
+        namespace = llm_namespace(kind, llm)
+        embedding = None
+        if self.similarity_threshold is not None:
+            embedding = self._embedding(await self.embeddings.aembed_query(question))
+        entry_key = ResponseKey(response_key(namespace, question, docs), namespace, embedding)
+        return (None if refresh else self._get(entry_key)), entry_key
+
+    def store(self, entry_key: ResponseKey, response: str) -> None:
+        """Cache a fresh response under the key returned by lookup"""
+        if not response:
+            return
+        expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._entries[entry_key.key] = {
+                "response": response,
+                "namespace": entry_key.namespace,
+                "embedding": entry_key.embedding,
+                "expires": expires
+            }
+            self._entries.move_to_end(entry_key.key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit and eviction counters
+
+        Returns:
+            Dict with exact hits, similarity hits, misses, hit_rate, entries,
+            evictions (LRU) and expired (TTL) counts
+        """
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "expired": self.expired
+        }
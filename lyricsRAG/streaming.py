@@ -0,0 +1,116 @@
+import time
+from typing import List, Dict, Any, Iterator, AsyncIterator
+
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import format_document
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+
+
+def stuff_messages(chain, docs: List[Document], question: str) -> List[BaseMessage]:
+    """
+    Prompt messages a "stuff" documents chain would send for these documents
+
+    Args:
+        chain: StuffDocumentsChain of a RetrievalQA or ConversationalRetrievalChain
+        docs: Retrieved documents
+        question: Question or instructions filled into the prompt
+
+    Returns:
+        Chat messages ready to be streamed from the chain's LLM
+    """
+    context = chain.document_separator.join(format_document(doc, chain.document_prompt) for doc in docs)
+    return chain.llm_chain.prompt.format_prompt(
+        **{chain.document_variable_name: context, "question": question}
+    ).to_messages()
+
+
+def has_chat_history(conversation_chain) -> bool:
+    """Whether the chain's memory holds earlier exchanges, i.e. whether a message needs condensing"""
+    return bool(conversation_chain.memory.load_memory_variables({})[conversation_chain.memory.memory_key])
+
+
+def condense_question(conversation_chain, message: str) -> str:
+    """
+    Standalone question a ConversationalRetrievalChain retrieves for
+
+    Follow-up messages are rewritten with the chat history first, exactly
+    as the chain does; the first message of a conversation is used as is.
+    """
+    history = conversation_chain.memory.load_memory_variables({})[conversation_chain.memory.memory_key]
+    if not history:
+        return message
+    get_chat_history = conversation_chain.get_chat_history or _get_chat_history
+    result = conversation_chain.question_generator.invoke({
+        "question": message,
+        "chat_history": get_chat_history(history)
+    })
+    return result[conversation_chain.question_generator.output_key]
+
+
+async def acondense_question(conversation_chain, message: str) -> str:
+    """Async version of condense_question"""
+    history = conversation_chain.memory.load_memory_variables({})[conversation_chain.memory.memory_key]
+    if not history:
+        return message
+    get_chat_history = conversation_chain.get_chat_history or _get_chat_history
+    result = await conversation_chain.question_generator.ainvoke({
+        "question": message,
+        "chat_history": get_chat_history(history)
+    })
+    return result[conversation_chain.question_generator.output_key]
+
+
+def remember_exchange(conversation_chain, message: str, answer: str) -> None:
+    """Store a streamed exchange in the chain's memory as invoke() would"""
+    conversation_chain.memory.save_context({"question": message}, {"answer": answer})
+
+
+async def aremember_exchange(conversation_chain, message: str, answer: str) -> None:
+    """Async version of remember_exchange, so a summary memory summarizes without blocking the event loop"""
+    await conversation_chain.memory.asave_context({"question": message}, {"answer": answer})
+
+
+def new_stream_stats() -> Dict[str, Any]:
+    """Timings of one streamed completion, filled in while it streams"""
+    return {"retrieval_ms": 0.0, "ttft_ms": None, "total_ms": None, "chunks": 0, "cached": False}
+
+
+def timed_tokens(chunks: Iterator, stats: Dict[str, Any], started: float) -> Iterator[str]:
+    """
+    Text of streamed message chunks, recording time to first token
+
+    Args:
+        chunks: Message chunks from llm.stream()
+        stats: Dict from new_stream_stats, updated in place
+        started: perf_counter() value the request started at
+
+    Yields:
+        Non-empty text pieces as they arrive
+    """
+    for chunk in chunks:
+        if chunk.content:
+            if stats["ttft_ms"] is None:
+                stats["ttft_ms"] = (time.perf_counter() - started) * 1000
+            stats["chunks"] += 1
+            yield chunk.content
+    stats["total_ms"] = (time.perf_counter() - started) * 1000
+
+
+def cached_tokens(text: str, stats: Dict[str, Any], started: float) -> Iterator[str]:
+    """Yield a response served from the response cache as a single piece, timed like a stream"""
+    stats["cached"] = True
+    stats["ttft_ms"] = stats["total_ms"] = (time.perf_counter() - started) * 1000
+    stats["chunks"] = 1
+    yield text
+
+
+async def atimed_tokens(chunks: AsyncIterator, stats: Dict[str, Any], started: float) -> AsyncIterator[str]:
+    """Async version of timed_tokens for llm.astream()"""
+    async for chunk in chunks:
+        if chunk.content:
+            if stats["ttft_ms"] is None:
+                stats["ttft_ms"] = (time.perf_counter() - started) * 1000
+            stats["chunks"] += 1
+            yield chunk.content
+    stats["total_ms"] = (time.perf_counter() - started) * 1000
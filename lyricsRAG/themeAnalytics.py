@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import tempfile
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+from langchain_core.embeddings import Embeddings
+
+from lyricsRAG.chunkDedup import chunk_sources
+
+# Themes as {label: phrases describing it}; a theme's centroid is the mean of its phrase embeddings
+DEFAULT_THEMES = {
+    "Love": ["falling in love", "romance and devotion to someone", "I love you, I want you by my side"],
+    "Heartbreak": ["a painful breakup", "heartbreak and loss of a lover", "you left me and my heart is broken"],
+    "Hope": ["hope for a better tomorrow", "optimism and faith", "things will get better, keep believing"],
+    "Nostalgia": ["memories of the past", "nostalgia for younger days", "I remember how it used to be"],
+    "Resilience": ["staying strong through hard times", "resilience and self-empowerment", "I will rise again"],
+    "Freedom": ["freedom and independence", "breaking free from the rules", "running wild with nothing holding me back"]
+}
+
+
+# Version of the classification rule, so tables saved by an older rule are recomputed
+_CLASSIFIER_VERSION = 2
+
+
+def theme_key(themes: Dict[str, List[str]], embedding_model: str) -> str:
+    """Key of a theme set, its embedding model and the classification rule; other keys' saved results are ignored"""
+    return hashlib.sha256(
+        json.dumps([_CLASSIFIER_VERSION, embedding_model, themes], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def theme_centroids(embeddings: Embeddings, themes: Dict[str, List[str]]) -> np.ndarray:
+    """
+    Embed the phrases of every theme in one call and average them per theme
+
+    Args:
+        embeddings: Document embeddings of the corpus (phrases land in its caches)
+        themes: {label: phrases}
+
+    Returns:
+        Normalized float32 matrix with one centroid row per theme, in label order
+    """
+    phrases = [phrase for label_phrases in themes.values() for phrase in label_phrases]
+    vectors = _normalize_rows(np.asarray(embeddings.embed_documents(phrases), dtype=np.float32))
+    bounds = np.cumsum([0] + [len(label_phrases) for label_phrases in themes.values()])
+    centroids = np.vstack([vectors[start:stop].mean(axis=0) for start, stop in zip(bounds[:-1], bounds[1:])])
+    return _normalize_rows(centroids)
+
+
+def classify_chunks(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Theme of every chunk from one matrix product against the centroids
+
+    Each chunk takes the theme of its most cosine-similar centroid, so a
+    corpus that is mostly about one theme is classified as such.
+
+    Args:
+        vectors: Chunk embeddings, one row per chunk
+        centroids: Theme centroids from theme_centroids
+
+    Returns:
+        Index of the theme of each chunk
+    """
+    if not len(vectors):
+        return np.zeros(0, dtype=np.int64)
+    scores = _normalize_rows(np.asarray(vectors, dtype=np.float32)) @ centroids.T
+    return np.argmax(scores, axis=1)
+
+
+def song_themes(metadatas: List[Dict[str, Any]], chunk_themes: np.ndarray, labels: List[str]) -> pd.DataFrame:
+    """
+    Share of each song's chunks per theme
+
+    A deduplicated chunk counts for every song it appears in.
+
+    Args:
+        metadatas: Metadata of the indexed chunks
+        chunk_themes: Theme index of each chunk from classify_chunks
+        labels: Theme labels, in centroid order
+
+    Returns:
+        DataFrame with song, artist, its dominant theme and one share column per label
+    """
+    occurrences = pd.DataFrame(
+        [(source["song"], source["artist"], theme)
+         for metadata, theme in zip(metadatas, chunk_themes.tolist())
+         for source in chunk_sources(metadata)],
+        columns=["song", "artist", "theme"]
+    )
+    if occurrences.empty:
+        return pd.DataFrame(columns=["song", "artist", "theme", *labels])
+
+    counts = pd.crosstab([occurrences["song"], occurrences["artist"]], occurrences["theme"])
+    counts = counts.reindex(columns=range(len(labels)), fill_value=0)
+    shares = counts.div(counts.sum(axis=1), axis=0)
+    shares.columns = labels
+
+    table = shares.reset_index()
+    table.insert(2, "theme", [labels[i] for i in np.argmax(counts.to_numpy(), axis=1)])
+    return table
+
+
+def theme_prevalence(themes_by_song: pd.DataFrame) -> pd.DataFrame:
+    """Number of songs whose dominant theme is each label, as (theme, songs) rows"""
+    return themes_by_song.groupby("theme").size().rename("songs").reset_index().sort_values("songs", ascending=False)
+
+
+def artist_themes(themes_by_song: pd.DataFrame) -> pd.DataFrame:
+    """Number of songs of each artist per dominant theme, as (artist, theme, songs) rows"""
+    return themes_by_song.groupby(["artist", "theme"]).size().rename("songs").reset_index()
+
+
+def load_song_themes(path: Optional[str], key: str) -> Optional[pd.DataFrame]:
+    """
+    Read the theme table saved next to an index
+
+    Returns:
+        The table, or None if there is none for this key
+    """
+    if not path:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get("key") != key:
+        return None
+    return pd.DataFrame(saved["rows"], columns=saved["columns"])
+
+
+def save_song_themes(path: Optional[str], key: str, table: pd.DataFrame) -> None:
+    """Save a theme table next to its index, replacing any older one atomically"""
+    if not path:
+        return
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".themes-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "columns": list(table.columns), "rows": table.values.tolist()}, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def analyze_themes(embeddings: Embeddings, vectors: np.ndarray, metadatas: List[Dict[str, Any]],
+                   themes: Dict[str, List[str]] = DEFAULT_THEMES) -> pd.DataFrame:
+    """
+    Classify every indexed chunk and aggregate the themes per song
+
+    The only model call embeds the theme phrases; the chunks are scored
+    with the vectors already stored in the index.
+
+    Args:
+        embeddings: Document embeddings of the corpus
+        vectors: Stored chunk vectors, one row per entry of metadatas
+        metadatas: Metadata of the indexed chunks
+        themes: {label: phrases}
+
+    Returns:
+        song_themes' table
+    """
+    centroids = theme_centroids(embeddings, themes)
+    return song_themes(metadatas, classify_chunks(vectors, centroids), list(themes))